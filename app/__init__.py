@@ -66,13 +66,17 @@ def init_extensions(app: Flask):
     参数:
         app: Flask应用实例
     """
-    # TODO: 初始化数据库
-    # from app.common.database import db
-    # db.init_app(app)
+    # 初始化数据库（注册请求级工作单元）
+    from app.common import database
+    database.init_app(app)
     
-    # TODO: 初始化缓存
-    # from app.common.cache import cache
-    # cache.init_app(app)
+    # 初始化请求截止时间（需在数据库之后注册）
+    from app.common import deadline
+    deadline.init_app(app)
+    
+    # 初始化对象缓存
+    from app.common.cache import cache
+    cache.init_app(app)
     
     # TODO: 初始化CORS
     # from flask_cors import CORS
@@ -0,0 +1,142 @@
+"""
+数据库后端模块
+把数据库模块中与具体数据库相关的部分（建立连接、错误识别、语句长度上限、
+执行计划估算等）抽象为后端接口，get_db_connection和Database通过后端访问数据库
+"""
+from typing import Optional
+import pymysql
+from pymysql.cursors import DictCursor
+from app.config import config
+from app.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Backend:
+    """
+    数据库后端接口
+
+    子类需要实现connect()，返回的连接要兼容PyMySQL的用法：
+    cursor()返回字典行游标，支持commit/rollback/close/ping，游标支持mogrify
+    """
+
+    # 后端名称
+    name = 'base'
+
+    # 是否支持只读副本
+    supports_replicas = False
+
+    # EXPLAIN结果是否包含行数估算（select_page的total='approx'模式使用）
+    explain_estimates = False
+
+    def prepare(self) -> None:
+        """初始化后端（创建连接池之前调用一次）"""
+
+    def connect(self, host: Optional[str] = None, port: Optional[int] = None):
+        """
+        创建一个新的数据库连接
+
+        Args:
+            host: 数据库地址，默认使用主库地址
+            port: 数据库端口，默认使用主库端口
+
+        Returns:
+            数据库连接
+        """
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        """
+        获取后端描述（用于日志）
+
+        Returns:
+            str: 后端描述
+        """
+        return self.name
+
+    def retry_reason(self, e: BaseException) -> Optional[str]:
+        """
+        判断异常是否可以通过重试事务解决
+
+        Args:
+            e: 异常
+
+        Returns:
+            str: 可重试时返回原因（deadlocks/lock_timeouts），否则返回None
+        """
+        return None
+
+    def max_statement_bytes(self, cursor) -> int:
+        """
+        获取单条语句允许的最大字节数
+
+        Args:
+            cursor: 数据库游标
+
+        Returns:
+            int: 最大字节数
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """释放后端持有的资源（关闭连接池之后调用）"""
+
+
+class MySQLBackend(Backend):
+    """
+    MySQL后端
+    使用PyMySQL连接，支持只读副本和EXPLAIN行数估算
+    """
+
+    name = 'mysql'
+    supports_replicas = True
+    explain_estimates = True
+
+    # 可重试的MySQL错误码：1213死锁（事务已被InnoDB回滚），1205锁等待超时
+    RETRYABLE_ERRORS = {1213: 'deadlocks', 1205: 'lock_timeouts'}
+
+    def connect(self, host: Optional[str] = None, port: Optional[int] = None):
+        return pymysql.connect(
+            host=host or config.DB_HOST,
+            port=port or config.DB_PORT,
+            user=config.DB_USER,
+            password=config.DB_PASSWORD,
+            database=config.DB_NAME,
+            charset=config.DB_CHARSET,
+            cursorclass=DictCursor,            # 返回字典格式的结果
+            autocommit=False                    # 关闭自动提交
+        )
+
+    def describe(self) -> str:
+        return f"mysql://{config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME}"
+
+    def retry_reason(self, e: BaseException) -> Optional[str]:
+        if isinstance(e, pymysql.err.MySQLError) and e.args:
+            return self.RETRYABLE_ERRORS.get(e.args[0])
+        return None
+
+    def max_statement_bytes(self, cursor) -> int:
+        cursor.execute("SELECT @@max_allowed_packet AS max_packet")
+        return int(cursor.fetchone()['max_packet'])
+
+
+def create_backend(name: Optional[str] = None) -> Backend:
+    """
+    按名称创建数据库后端
+
+    Args:
+        name: 后端名称（mysql/sqlite），默认使用配置DB_BACKEND
+
+    Returns:
+        Backend: 数据库后端
+
+    Raises:
+        ValueError: 不支持的后端名称
+    """
+    name = (name or config.DB_BACKEND).lower()
+    if name == 'mysql':
+        return MySQLBackend()
+    if name == 'sqlite':
+        from app.common.sqlite_backend import SQLiteBackend
+        return SQLiteBackend(config.DB_SQLITE_PATH)
+    raise ValueError(f"不支持的数据库后端: {name}")
@@ -0,0 +1,362 @@
+"""
+对象缓存模块
+为读多写少的对象（如组装好的Prompt详情）提供读穿透缓存：
+
+- 两级缓存：进程内LRU一级缓存 + 可选的Redis共享二级缓存（多个gunicorn worker共享）
+- 失效采用代数（generation）：每个键有一个代数计数器，失效时加一，
+  缓存值记录写入时的代数，读取时代数不一致即视为失效，
+  因此失效前开始、失效后才完成的加载不会把旧数据写回缓存
+- 防击穿：同一进程内同一个键只有一个线程执行加载，其余线程等待结果；
+  使用Redis时再用SET NX锁保证多个进程之间也只有一个加载
+"""
+import time
+import uuid
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.config import config
+from app.common.logger import get_logger
+
+try:
+    import redis
+except ImportError:  # redis为可选依赖，未安装时只使用进程内缓存
+    redis = None
+
+logger = get_logger(__name__)
+
+# 只在锁持有者释放自己的锁（避免锁过期后删除别人的锁）
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _Flight:
+    """一次进行中的加载，等待者从这里取结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.blob: Optional[bytes] = None
+        self.done = False
+
+
+class Cache:
+    """
+    读穿透对象缓存
+
+    缓存的值序列化后保存，每次读取都得到独立的副本，调用方修改返回值不会影响缓存
+    """
+
+    def __init__(self, ttl: int = 300, local_ttl: int = 5, max_entries: int = 10000,
+                 lock_timeout_ms: int = 3000):
+        """
+        初始化缓存（只使用进程内缓存，调用init_app后按配置连接Redis）
+
+        Args:
+            ttl: 缓存有效期（秒）
+            local_ttl: 使用Redis时进程内一级缓存的有效期（秒）
+            max_entries: 进程内缓存最多条目数
+            lock_timeout_ms: 防击穿加载锁的有效期（毫秒），也是等待其他加载者的最长时间
+        """
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.max_entries = max_entries
+        self.lock_timeout_ms = lock_timeout_ms
+        self._redis = None
+        self._release_lock = None
+        self._local: 'OrderedDict[str, Tuple[float, int, bytes]]' = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.stats_counters = {
+            'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'loads': 0,
+            'coalesced': 0, 'invalidations': 0, 'errors': 0
+        }
+
+    def init_app(self, app) -> None:
+        """
+        按配置初始化缓存，CACHE_BACKEND为redis时连接Redis，连接失败时退回进程内缓存；
+        只有进程内缓存而WORKERS大于1时，失效无法通知其他worker，缓存有效期缩短为CACHE_LOCAL_TTL
+
+        Args:
+            app: Flask应用实例
+        """
+        self.ttl = config.CACHE_TIMEOUT
+        self.local_ttl = config.CACHE_LOCAL_TTL
+        self.max_entries = config.CACHE_LOCAL_MAX_ENTRIES
+        self.lock_timeout_ms = config.CACHE_LOCK_TIMEOUT_MS
+        app.extensions['cache'] = self
+
+        if config.CACHE_BACKEND == 'redis':
+            self._connect_redis()
+        if not self.shared and config.WORKERS > 1:
+            self.ttl = min(self.ttl, self.local_ttl)
+            logger.warning(f"WORKERS={config.WORKERS}但对象缓存只在进程内，修改后其他worker最多"
+                           f"{self.ttl}秒内仍返回旧数据；多worker部署请设置CACHE_BACKEND=redis")
+
+    def _connect_redis(self) -> None:
+        """连接Redis作为共享缓存，未安装redis包或连接失败时只使用进程内缓存"""
+        if redis is None:
+            logger.warning("未安装redis包，对象缓存只使用进程内缓存")
+            return
+        try:
+            client = redis.Redis(
+                host=config.REDIS_HOST,
+                port=config.REDIS_PORT,
+                password=config.REDIS_PASSWORD or None,
+                db=config.REDIS_DB,
+                socket_timeout=1,
+                socket_connect_timeout=1
+            )
+            client.ping()
+            self.use_redis(client)
+            logger.info(f"对象缓存使用Redis: {config.REDIS_HOST}:{config.REDIS_PORT}/{config.REDIS_DB}")
+        except Exception as e:
+            logger.warning(f"连接Redis失败，对象缓存只使用进程内缓存: {str(e)}")
+
+    def use_redis(self, client) -> None:
+        """
+        使用Redis作为共享缓存
+
+        Args:
+            client: Redis客户端
+        """
+        self._redis = client
+        self._release_lock = client.register_script(_RELEASE_LOCK_SCRIPT)
+
+    @property
+    def shared(self) -> bool:
+        """是否启用了共享缓存"""
+        return self._redis is not None
+
+    def _count(self, name: str) -> None:
+        """累加统计计数"""
+        with self._lock:
+            self.stats_counters[name] += 1
+
+    # ============== 进程内缓存 ==============
+
+    def _local_get(self, key: str) -> Optional[bytes]:
+        """读取进程内缓存，过期或代数不一致时返回None"""
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, generation, blob = entry
+            if expires_at < time.monotonic() or generation != self._generations.get(key, 0):
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return blob
+
+    def _local_set(self, key: str, blob: bytes, generation: int) -> None:
+        """写入进程内缓存（加载期间键被失效时不写入）"""
+        ttl = self.local_ttl if self.shared else self.ttl
+        with self._lock:
+            if generation != self._generations.get(key, 0):
+                return
+            self._local[key] = (time.monotonic() + ttl, generation, blob)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    # ============== 共享缓存 ==============
+
+    def _shared_get(self, key: str) -> Tuple[Optional[bytes], int]:
+        """
+        读取共享缓存
+
+        Returns:
+            tuple: (缓存值，失效时为None, 当前代数)
+        """
+        value, generation = self._redis.mget(key, f"{key}:gen")
+        generation = int(generation or 0)
+        if value is None:
+            return None, generation
+        stored, _, blob = value.partition(b':')
+        if int(stored) != generation:
+            return None, generation
+        return blob, generation
+
+    def _shared_set(self, key: str, blob: bytes, generation: int) -> None:
+        """写入共享缓存，值带上加载前读取的代数"""
+        self._redis.set(key, str(generation).encode() + b':' + blob, ex=self.ttl)
+
+    def _wait_for_shared(self, key: str) -> Optional[bytes]:
+        """等待其他进程加载完成，超时返回None"""
+        deadline = time.monotonic() + self.lock_timeout_ms / 1000
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            blob, _ = self._shared_get(key)
+            if blob is not None:
+                return blob
+        return None
+
+    # ============== 读穿透 ==============
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        读取缓存，未命中时调用loader加载并写入缓存
+
+        Args:
+            key: 缓存键
+            loader: 加载函数，返回None表示数据不存在（不缓存）
+
+        Returns:
+            缓存或加载的值
+        """
+        blob = self._local_get(key)
+        if blob is not None:
+            self._count('local_hits')
+            return pickle.loads(blob)
+
+        blob = self._single_flight(key, loader)
+        return pickle.loads(blob) if blob is not None else None
+
+    def _single_flight(self, key: str, loader: Callable[[], Any]) -> Optional[bytes]:
+        """同一进程内同一个键只由一个线程加载，其余线程等待结果"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            self._count('coalesced')
+            flight.event.wait(self.lock_timeout_ms / 1000)
+            if flight.done:
+                return flight.blob
+            # 加载者超时或失败，自行加载
+            return self._load(key, loader)
+
+        try:
+            flight.blob = self._load(key, loader)
+            flight.done = True
+            return flight.blob
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.event.set()
+
+    def _load(self, key: str, loader: Callable[[], Any]) -> Optional[bytes]:
+        """
+        从共享缓存读取或调用loader加载
+
+        Returns:
+            bytes: 序列化后的值，数据不存在时返回None
+        """
+        with self._lock:
+            local_generation = self._generations.get(key, 0)
+
+        if not self.shared:
+            self._count('misses')
+            return self._call_loader(key, loader, local_generation)
+
+        token = None
+        try:
+            blob, generation = self._shared_get(key)
+            if blob is not None:
+                self._count('shared_hits')
+                self._local_set(key, blob, local_generation)
+                return blob
+
+            self._count('misses')
+            token = uuid.uuid4().hex
+            if not self._redis.set(f"{key}:lock", token, nx=True, px=self.lock_timeout_ms):
+                token = None
+                self._count('coalesced')
+                blob = self._wait_for_shared(key)
+                if blob is not None:
+                    self._local_set(key, blob, local_generation)
+                    return blob
+        except Exception as e:
+            # 共享缓存不可用时直接加载，缓存故障不影响读取
+            self._count('errors')
+            logger.warning(f"读取共享缓存失败: {key}, {str(e)}")
+            return self._call_loader(key, loader, local_generation)
+
+        try:
+            blob = self._call_loader(key, loader, local_generation)
+            if blob is not None:
+                try:
+                    self._shared_set(key, blob, generation)
+                except Exception as e:
+                    self._count('errors')
+                    logger.warning(f"写入共享缓存失败: {key}, {str(e)}")
+            return blob
+        finally:
+            if token is not None:
+                try:
+                    self._release_lock(keys=[f"{key}:lock"], args=[token])
+                except Exception:
+                    pass
+
+    def _call_loader(self, key: str, loader: Callable[[], Any], generation: int) -> Optional[bytes]:
+        """调用loader并写入进程内缓存"""
+        self._count('loads')
+        value = loader()
+        if value is None:
+            return None
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._local_set(key, blob, generation)
+        return blob
+
+    def invalidate(self, *keys: str) -> None:
+        """
+        使缓存键失效（应在数据库事务提交之后调用）
+
+        Args:
+            *keys: 缓存键
+        """
+        with self._lock:
+            for key in keys:
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self._local.pop(key, None)
+                # 失效前开始的加载可能读到旧数据，之后的读取不再等待它的结果
+                self._flights.pop(key, None)
+                self.stats_counters['invalidations'] += 1
+
+        if self.shared and keys:
+            try:
+                pipe = self._redis.pipeline()
+                for key in keys:
+                    pipe.incr(f"{key}:gen")
+                    pipe.expire(f"{key}:gen", self.ttl * 2)
+                    pipe.delete(key)
+                pipe.execute()
+            except Exception as e:
+                self._count('errors')
+                logger.error(f"共享缓存失效失败，最多{self.ttl}秒内可能读到旧数据: {keys}, {str(e)}")
+
+    def clear(self) -> None:
+        """清空进程内缓存"""
+        with self._lock:
+            self._local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            dict: 各级命中、加载、合并等待和失效次数
+        """
+        with self._lock:
+            result = dict(self.stats_counters)
+            result['local_entries'] = len(self._local)
+        lookups = result['local_hits'] + result['shared_hits'] + result['misses']
+        result['hit_rate'] = round((lookups - result['misses']) / lookups, 4) if lookups else 0.0
+        result['backend'] = 'redis' if self.shared else 'local'
+        return result
+
+
+# 全局对象缓存
+cache = Cache(
+    ttl=config.CACHE_TIMEOUT,
+    local_ttl=config.CACHE_LOCAL_TTL,
+    max_entries=config.CACHE_LOCAL_MAX_ENTRIES,
+    lock_timeout_ms=config.CACHE_LOCK_TIMEOUT_MS
+)
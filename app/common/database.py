@@ -1,58 +1,203 @@
 """
 数据库连接管理模块
-提供MySQL数据库连接池和基础操作封装
+提供数据库连接池、读写分离、请求级工作单元和基础操作封装，
+具体数据库由后端提供（MySQL，或用于基准测试和单机部署的内嵌SQLite）
 """
+import time
+import random
+import functools
+import threading
 import pymysql
-from pymysql.cursors import DictCursor
+from pymysql.cursors import SSCursor, SSDictCursor
 from contextlib import contextmanager
-from dbutils.pooled_db import PooledDB
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Callable, Iterable, Iterator, List, Sequence, Tuple, Union
+from flask import g, session, current_app, has_app_context, has_request_context
 from app.config import config
 from app.common.logger import get_logger
+from app.common.pool import ConnectionPool, PoolTimeoutError
+from app.common.backend import Backend, create_backend
+from app.common.replica import ReplicaSet, parse_endpoints
+from app.common.query_cache import QueryCache, MISS, normalize_sql, read_tables, written_table
+from app.common.query_stats import QueryStats, SlowQueryLog, InstrumentedCursor
+from app.common import deadline
+from app.common.pagination import (
+    TotalCache, encode_cursor, decode_cursor, build_keyset_condition, build_order_by
+)
 
 logger = get_logger(__name__)
 
+# 数据库后端（按配置DB_BACKEND在首次使用时创建）
+_backend: Optional[Backend] = None
+
 # 数据库连接池实例
-_db_pool: Optional[PooledDB] = None
+_db_pool: Optional[ConnectionPool] = None
+
+# 只读副本集合（未配置DB_REPLICAS时为None，所有读写都走主库）
+_replica_set: Optional[ReplicaSet] = None
+
+
+def _create_query_cache() -> Optional[QueryCache]:
+    """
+    按配置创建查询结果缓存
+    缓存只在进程内，写表时的失效不能通知其他worker，WORKERS大于1时有效期缩短为QUERY_CACHE_MULTI_WORKER_TTL
+    
+    Returns:
+        QueryCache: 查询结果缓存，QUERY_CACHE_ENABLED关闭时返回None
+    """
+    if not config.QUERY_CACHE_ENABLED:
+        return None
+    ttl = config.QUERY_CACHE_TTL
+    if config.WORKERS > 1 and ttl > config.QUERY_CACHE_MULTI_WORKER_TTL:
+        ttl = config.QUERY_CACHE_MULTI_WORKER_TTL
+        logger.warning(f"WORKERS={config.WORKERS}但查询结果缓存只在进程内，有效期缩短为{ttl}秒，"
+                       f"修改后其他worker最多{ttl}秒内仍返回旧数据")
+    return QueryCache(ttl=ttl, max_bytes=config.QUERY_CACHE_MAX_MB * 1024 * 1024)
+
+
+# 查询结果缓存（QUERY_CACHE_ENABLED关闭时为None）
+_query_cache: Optional[QueryCache] = _create_query_cache()
+
+# SQL执行统计和慢查询日志
+_query_stats = QueryStats()
+_slow_query_log = SlowQueryLog(
+    threshold_ms=config.SLOW_QUERY_THRESHOLD_MS,
+    per_minute=config.SLOW_QUERY_LOG_PER_MINUTE,
+    explain=config.SLOW_QUERY_EXPLAIN
+)
+
+# 分页总数缓存（select_page的total='cached'模式使用）
+_total_cache = TotalCache(ttl=config.PAGE_TOTAL_CACHE_TTL)
+
+# 会话中记录"读请求固定走主库截止时间"的键
+_STICKY_SESSION_KEY = 'db_primary_until'
+
+
+def get_backend() -> Backend:
+    """
+    获取数据库后端
+    
+    Returns:
+        Backend: 按配置DB_BACKEND创建的后端
+    """
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+def _create_connection(host: str = None, port: int = None):
+    """
+    通过数据库后端创建一个新的连接
+    
+    Args:
+        host: 数据库地址，默认使用主库地址
+        port: 数据库端口，默认使用主库端口
+    
+    Returns:
+        数据库连接（MySQL后端为pymysql.Connection）
+    """
+    return get_backend().connect(host, port)
+
+
+def _wrap_cursor(cursor):
+    """
+    包装连接池取出的游标：带上请求截止时间，开启SQL统计时再加上计时和慢查询日志
+    
+    Args:
+        cursor: 原游标
+        
+    Returns:
+        游标代理
+    """
+    wrapped = deadline.DeadlineCursor(cursor)
+    if config.QUERY_STATS_ENABLED:
+        wrapped = InstrumentedCursor(wrapped, _query_stats, _slow_query_log,
+                                     buffered=not isinstance(cursor, SSCursor))
+    return wrapped
+
+
+def get_query_stats(limit: int = 20, order_by: str = 'total_ms') -> Dict[str, Any]:
+    """
+    获取SQL执行统计
+    
+    Args:
+        limit: 返回的指纹条数
+        order_by: 排序字段（total_ms/count/p99_ms/max_ms/rows）
+        
+    Returns:
+        dict: 按指纹聚合的统计排行和慢查询日志统计
+    """
+    return {
+        'enabled': config.QUERY_STATS_ENABLED,
+        'slow_log': _slow_query_log.stats(),
+        'fingerprints': _query_stats.top(limit, order_by)
+    }
+
+
+def _create_pool(name: str, host: str = None, port: int = None) -> ConnectionPool:
+    """
+    按连接池配置创建连接池
+    
+    Args:
+        name: 连接池名称
+        host: 数据库地址
+        port: 数据库端口
+        
+    Returns:
+        ConnectionPool: 连接池
+    """
+    return ConnectionPool(
+        creator=lambda: _create_connection(host, port),
+        pool_size=config.DB_POOL_SIZE,          # 连接池中保留的空闲连接数
+        max_overflow=config.DB_MAX_OVERFLOW,    # 允许超出pool_size的溢出连接数
+        timeout=config.DB_POOL_TIMEOUT,         # 获取连接的最长等待时间，超时抛出PoolTimeoutError
+        recycle=config.DB_POOL_RECYCLE,         # 连接最长存活时间，超过后关闭重建
+        ping_interval=config.DB_POOL_PING_INTERVAL,  # 空闲超过该时间的连接取出前先ping
+        name=name,
+        cursor_wrapper=_wrap_cursor
+    )
 
 
 def init_db_pool():
     """
     初始化数据库连接池
+    配置了DB_REPLICAS时同时为每个只读副本创建独立的连接池
     """
-    global _db_pool
+    global _db_pool, _replica_set
     
     try:
-        _db_pool = PooledDB(
-            creator=pymysql,                    # 使用pymysql
-            maxconnections=6,                   # 连接池允许的最大连接数
-            mincached=2,                        # 初始化时创建的空闲连接数
-            maxcached=config.DB_POOL_SIZE,     # 连接池中最多空闲的连接数
-            maxusage=None,                      # 单个连接的最大重复使用次数
-            blocking=True,                      # 连接池中如果没有可用连接是否阻塞等待
-            setsession=[],                      # 开始会话前执行的SQL列表
-            ping=0,                            # ping MySQL服务端，检查连接是否可用
-            host=config.DB_HOST,
-            port=config.DB_PORT,
-            user=config.DB_USER,
-            password=config.DB_PASSWORD,
-            database=config.DB_NAME,
-            charset=config.DB_CHARSET,
-            cursorclass=DictCursor,            # 返回字典格式的结果
-            autocommit=False                    # 关闭自动提交
+        backend = get_backend()
+        backend.prepare()
+        _db_pool = _create_pool('primary')
+        logger.info(
+            f"数据库连接池初始化成功: {backend.describe()}, "
+            f"pool_size={config.DB_POOL_SIZE}, max_overflow={config.DB_MAX_OVERFLOW}"
         )
-        logger.info(f"数据库连接池初始化成功: {config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME}")
+        
+        endpoints = parse_endpoints(config.DB_REPLICAS, config.DB_PORT)
+        if endpoints and not backend.supports_replicas:
+            logger.warning(f"{backend.name}后端不支持只读副本，忽略DB_REPLICAS配置")
+        elif endpoints:
+            _replica_set = ReplicaSet(
+                pool_factory=lambda host, port: _create_pool(f"replica:{host}:{port}", host, port),
+                endpoints=endpoints,
+                evict_seconds=config.DB_REPLICA_EVICT_SECONDS,
+                max_lag=config.DB_REPLICA_MAX_LAG,
+                check_interval=config.DB_REPLICA_CHECK_INTERVAL,
+                checkout_timeout=config.DB_REPLICA_CHECKOUT_TIMEOUT
+            )
+            logger.info(f"只读副本连接池初始化成功: {', '.join(f'{h}:{p}' for h, p in endpoints)}")
     except Exception as e:
         logger.error(f"数据库连接池初始化失败: {str(e)}", exc_info=True)
         raise
 
 
-def get_db_pool() -> PooledDB:
+def get_db_pool() -> ConnectionPool:
     """
     获取数据库连接池实例
     
     Returns:
-        PooledDB: 数据库连接池
+        ConnectionPool: 数据库连接池
     """
     global _db_pool
     if _db_pool is None:
@@ -60,33 +205,543 @@ def get_db_pool() -> PooledDB:
     return _db_pool
 
 
+def get_pool_status() -> Dict[str, Any]:
+    """
+    获取连接池实时状态
+    
+    Returns:
+        dict: 使用中/空闲/等待中的连接数、获取连接等待耗时直方图、回收次数等，
+              配置了只读副本时包含每个副本的健康状态
+    """
+    if _db_pool is None:
+        return {'initialized': False}
+    status = _db_pool.status()
+    status['initialized'] = True
+    if _replica_set is not None:
+        status['replicas'] = _replica_set.status()
+    return status
+
+
+def _checkout(readonly: bool = False):
+    """
+    从连接池取出连接
+    只读请求优先取副本连接，没有健康副本时回退到主库
+    
+    Args:
+        readonly: 是否只读
+        
+    Returns:
+        PooledConnection: 数据库连接
+    """
+    if readonly and _replica_set is not None:
+        conn = _replica_set.connection()
+        if conn is not None:
+            return conn
+    return _checkout_primary()
+
+
+def _checkout_primary():
+    """
+    从主库连接池取出连接，等待时间不超过请求剩余时间
+    
+    Returns:
+        PooledConnection: 主库连接
+    """
+    pool = get_db_pool()
+    return pool.connection(timeout=deadline.checkout_timeout(pool.timeout))
+
+
+def _reads_pinned_to_primary() -> bool:
+    """
+    判断当前会话的读请求是否需要固定走主库（写后读一致性）
+    
+    Returns:
+        bool: 会话在粘滞期内时返回True
+    """
+    if not has_request_context():
+        return False
+    return session.get(_STICKY_SESSION_KEY, 0) > time.time()
+
+
+class UnitOfWork:
+    """
+    请求级工作单元
+    在一次请求内首次访问数据库时从连接池取出一个连接，之后该请求内的所有
+    服务调用共享这个连接，请求结束时统一提交或回滚并归还连接
+    
+    配置了只读副本时，读操作另外共享一个副本连接；一旦请求中发生写操作
+    （或会话处于写后粘滞期），后续读操作改走主库连接，保证读到自己的写入
+    """
+    
+    def __init__(self):
+        self.conn = None
+        self.replica_conn = None
+        self.checkouts = 0
+        self.wrote = False
+        self.written_tables = set()
+    
+    def connection(self, readonly: bool = False):
+        """
+        获取工作单元的连接，首次调用时才从连接池取出
+        
+        Args:
+            readonly: 是否只读
+        
+        Returns:
+            PooledConnection: 数据库连接
+        """
+        if not readonly:
+            self.wrote = True
+        
+        if readonly and _replica_set is not None and not self.wrote \
+                and not _reads_pinned_to_primary():
+            if self.replica_conn is None:
+                self.replica_conn = _checkout(readonly=True)
+                self.checkouts += 1
+            return self.replica_conn
+        
+        if self.conn is None:
+            self.conn = _checkout_primary()
+            self.checkouts += 1
+        return self.conn
+    
+    def discard(self, conn=None) -> None:
+        """
+        丢弃连接（连接出错后调用），下次访问时重新取出
+        
+        Args:
+            conn: 要丢弃的连接，默认丢弃全部连接
+        """
+        if self.conn is not None and conn in (None, self.conn):
+            primary, self.conn = self.conn, None
+            primary.close()
+        if self.replica_conn is not None and conn in (None, self.replica_conn):
+            replica, self.replica_conn = self.replica_conn, None
+            replica.close()
+    
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """
+        结束工作单元：无异常时提交，有异常时回滚，然后归还连接
+        
+        Args:
+            error: 请求处理过程中未捕获的异常
+        """
+        if self.conn is None:
+            self.discard()
+            return
+        try:
+            if error is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        except Exception as e:
+            logger.error(f"工作单元结束时{'提交' if error is None else '回滚'}失败: {str(e)}", exc_info=True)
+        finally:
+            self.discard()
+            # 提交后再次失效写过的表，清除提交前被其他请求读入缓存的旧数据
+            if self.written_tables and _query_cache is not None:
+                _query_cache.invalidate(self.written_tables)
+
+
+# 请求级数据库访问统计（进程内累计）
+_request_stats = {'requests': 0, 'checkouts': 0, 'max_checkouts': 0}
+
+
+def _get_unit_of_work() -> Optional[UnitOfWork]:
+    """
+    获取当前请求的工作单元
+    只有在应用上下文中并且应用调用过init_app时才启用
+    
+    Returns:
+        UnitOfWork: 当前请求的工作单元，不在请求中时返回None
+    """
+    if not has_app_context() or 'database' not in current_app.extensions:
+        return None
+    uow = g.get('db_uow')
+    if uow is None:
+        uow = UnitOfWork()
+        g.db_uow = uow
+    return uow
+
+
+def init_app(app) -> None:
+    """
+    在Flask应用上注册请求级工作单元
+    
+    Args:
+        app: Flask应用实例
+    """
+    app.extensions['database'] = True
+    
+    @app.after_request
+    def record_db_checkouts(response):
+        """在响应头中返回本次请求的连接取出次数，发生写操作时开启会话的主库粘滞期"""
+        uow = g.get('db_uow')
+        checkouts = uow.checkouts if uow else 0
+        _request_stats['requests'] += 1
+        _request_stats['checkouts'] += checkouts
+        _request_stats['max_checkouts'] = max(_request_stats['max_checkouts'], checkouts)
+        response.headers['X-DB-Checkouts'] = str(checkouts)
+        
+        if uow is not None and uow.wrote and _replica_set is not None \
+                and config.DB_REPLICA_STICKY_SECONDS > 0:
+            session[_STICKY_SESSION_KEY] = time.time() + config.DB_REPLICA_STICKY_SECONDS
+        return response
+    
+    @app.teardown_appcontext
+    def finish_unit_of_work(error):
+        """请求结束时提交或回滚工作单元并归还连接"""
+        uow = g.pop('db_uow', None)
+        if uow is not None:
+            uow.finish(error)
+
+
+def get_request_stats() -> Dict[str, Any]:
+    """
+    获取请求级数据库访问统计
+    
+    Returns:
+        dict: 请求数、连接取出总数、平均和最大单请求取出次数
+    """
+    requests = _request_stats['requests']
+    return {
+        'requests': requests,
+        'checkouts': _request_stats['checkouts'],
+        'avg_checkouts_per_request': round(_request_stats['checkouts'] / requests, 3) if requests else 0.0,
+        'max_checkouts_per_request': _request_stats['max_checkouts']
+    }
+
+
 @contextmanager
-def get_db_connection():
+def get_db_connection(readonly: bool = False):
     """
     获取数据库连接上下文管理器
     使用with语句自动管理连接的获取和释放
+    在请求中使用时返回请求级工作单元共享的连接，连接在请求结束时才归还
+    
+    Args:
+        readonly: 是否只读。只读连接在配置了副本时路由到副本，其余走主库
     
     Example:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             with conn.cursor() as cursor:
                 cursor.execute("SELECT * FROM users")
                 result = cursor.fetchall()
     """
+    uow = _get_unit_of_work()
     conn = None
     try:
-        pool = get_db_pool()
-        conn = pool.connection()
+        if uow is not None:
+            conn = uow.connection(readonly)
+        else:
+            conn = _checkout(readonly)
         yield conn
+    except PoolTimeoutError as e:
+        logger.error(f"获取数据库连接超时: {str(e)}")
+        deadline.fail(503, '数据库繁忙，请稍后重试')
+        raise
+    except deadline.DeadlineExceeded:
+        # 请求已超时，不再回滚重试，工作单元在请求结束时统一回滚
+        raise
     except Exception as e:
         if conn:
-            conn.rollback()
+            if isinstance(e, pymysql.OperationalError) and _replica_set is not None \
+                    and _replica_set.owns(conn._pool):
+                _replica_set.evict_pool(conn._pool, f"查询时连接异常: {str(e)}")
+            try:
+                conn.rollback()
+            except Exception:
+                # 回滚失败说明连接已不可用，工作单元中的连接需要丢弃
+                if uow is not None:
+                    uow.discard(conn)
+                    conn = None
         logger.error(f"数据库操作失败: {str(e)}", exc_info=True)
         raise
     finally:
-        if conn:
+        if conn and uow is None:
             conn.close()
 
 
+# 可重试错误的原因说明
+_RETRY_REASONS = {'deadlocks': '死锁', 'lock_timeouts': '锁等待超时'}
+
+# 事务重试统计（进程内累计）
+_tx_stats = {'transactions': 0, 'retries': 0, 'deadlocks': 0, 'lock_timeouts': 0, 'exhausted': 0}
+_tx_stats_lock = threading.Lock()
+
+
+def _retry_backoff(attempt: int) -> float:
+    """
+    计算第attempt次重试前的等待时间（秒）
+    在指数退避上限内均匀随机取值，避免冲突的事务同时重试再次冲突
+    
+    Args:
+        attempt: 重试次数（从1开始）
+        
+    Returns:
+        float: 等待秒数
+    """
+    cap = min(config.DB_TX_RETRY_MAX_BACKOFF_MS, config.DB_TX_RETRY_BACKOFF_MS * 2 ** (attempt - 1))
+    return random.uniform(cap / 2, cap) / 1000
+
+
+def run_transaction(func: Callable[..., Any], *args, max_retries: Optional[int] = None, **kwargs) -> Any:
+    """
+    在事务中执行函数，遇到死锁或锁等待超时时回滚并重试
+    
+    func的第一个参数是数据库连接，func返回后提交事务。func可能被执行多次，
+    因此不应在其中产生事务之外的副作用（如失效缓存、发送通知），这些操作应在本函数返回后进行
+    
+    Args:
+        func: 事务函数 func(conn, *args, **kwargs)
+        *args: 传给func的位置参数
+        max_retries: 最多重试次数，默认使用配置DB_TX_MAX_RETRIES
+        **kwargs: 传给func的关键字参数
+        
+    Returns:
+        func的返回值
+        
+    Example:
+        def _transfer(conn, from_id, to_id, amount):
+            with conn.cursor() as cursor:
+                cursor.execute("UPDATE accounts SET balance = balance - %s WHERE id = %s", (amount, from_id))
+                cursor.execute("UPDATE accounts SET balance = balance + %s WHERE id = %s", (amount, to_id))
+        
+        run_transaction(_transfer, 1, 2, 100)
+    """
+    if max_retries is None:
+        max_retries = config.DB_TX_MAX_RETRIES
+    with _tx_stats_lock:
+        _tx_stats['transactions'] += 1
+    
+    attempt = 0
+    while True:
+        error = None
+        with get_db_connection() as conn:
+            try:
+                result = func(conn, *args, **kwargs)
+                conn.commit()
+                return result
+            except Exception as e:
+                reason = get_backend().retry_reason(e)
+                if reason is None:
+                    raise
+                error = e
+                # 在连接上下文内回滚，可重试的错误不作为数据库操作失败记录
+                conn.rollback()
+        
+        with _tx_stats_lock:
+            _tx_stats[reason] += 1
+            if attempt >= max_retries:
+                _tx_stats['exhausted'] += 1
+            else:
+                _tx_stats['retries'] += 1
+        if attempt >= max_retries:
+            logger.error(f"事务重试{attempt}次后仍失败: {str(error)}")
+            raise error
+        
+        attempt += 1
+        delay = _retry_backoff(attempt)
+        left = deadline.remaining()
+        if left is not None and left <= delay:
+            # 请求剩余时间不足以再等待一次，直接失败
+            raise error
+        logger.warning(f"事务遇到{_RETRY_REASONS[reason]}，"
+                       f"{delay * 1000:.0f}ms后第{attempt}次重试: {getattr(func, '__name__', func)}")
+        time.sleep(delay)
+
+
+def get_transaction_stats() -> Dict[str, Any]:
+    """
+    获取事务重试统计
+    
+    Returns:
+        dict: 事务数、重试次数、死锁和锁等待超时次数、重试耗尽次数
+    """
+    with _tx_stats_lock:
+        return dict(_tx_stats)
+
+
+# 服务端max_allowed_packet缓存（首次批量插入时查询）
+_max_packet: Optional[int] = None
+
+# 批量插入语句为max_allowed_packet预留的余量（字节）
+_PACKET_HEADROOM = 1024
+
+
+def _get_max_statement_bytes(cursor) -> int:
+    """
+    获取单条批量插入语句允许的最大字节数
+    优先使用配置DB_BULK_MAX_PACKET，未配置时由数据库后端给出（MySQL为服务端的max_allowed_packet）
+    
+    Args:
+        cursor: 数据库游标
+        
+    Returns:
+        int: 语句最大字节数
+    """
+    global _max_packet
+    if config.DB_BULK_MAX_PACKET > 0:
+        return config.DB_BULK_MAX_PACKET
+    if _max_packet is None:
+        _max_packet = get_backend().max_statement_bytes(cursor)
+    return max(_max_packet - _PACKET_HEADROOM, _PACKET_HEADROOM)
+
+
+def _bulk_insert(cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                 ignore: bool, on_duplicate: Optional[Union[Sequence[str], Dict[str, str]]],
+                 max_rows: Optional[int]) -> List[int]:
+    """
+    在给定游标上分批执行多行INSERT
+    
+    每行先用游标转义成 (v1,v2,...) 字面量，按字节数和行数累积成批，
+    凑满一批立即执行，因此rows可以是生成器，内存只与批大小有关
+    
+    Args:
+        cursor: 数据库游标
+        table: 表名
+        columns: 列名列表
+        rows: 行数据
+        ignore: 是否使用 INSERT IGNORE
+        on_duplicate: 冲突时要更新的列，或 {列名: 更新表达式}
+        max_rows: 每批最多行数
+        
+    Returns:
+        list: 每批语句的影响行数
+    """
+    max_rows = max_rows or config.DB_BULK_MAX_ROWS
+    column_sql = ', '.join(f"`{c}`" for c in columns)
+    head = f"INSERT {'IGNORE ' if ignore else ''}INTO `{table}` ({column_sql}) VALUES "
+    tail = ''
+    if isinstance(on_duplicate, dict):
+        tail = ' ON DUPLICATE KEY UPDATE ' + ', '.join(f"`{c}` = {expr}" for c, expr in on_duplicate.items())
+    elif on_duplicate:
+        tail = ' ON DUPLICATE KEY UPDATE ' + ', '.join(f"`{c}` = VALUES(`{c}`)" for c in on_duplicate)
+    
+    placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    max_bytes = None
+    fixed_bytes = len(head.encode('utf-8')) + len(tail.encode('utf-8'))
+    
+    counts: List[int] = []
+    values: List[str] = []
+    size = fixed_bytes
+    
+    def flush():
+        cursor.execute(head + ','.join(values) + tail)
+        counts.append(cursor.rowcount)
+    
+    for row in rows:
+        if max_bytes is None:
+            max_bytes = _get_max_statement_bytes(cursor)
+        literal = cursor.mogrify(placeholder, tuple(row))
+        literal_bytes = len(literal.encode('utf-8')) + 1
+        if values and (len(values) >= max_rows or size + literal_bytes > max_bytes):
+            flush()
+            values = []
+            size = fixed_bytes
+        values.append(literal)
+        size += literal_bytes
+    
+    if values:
+        flush()
+    return counts
+
+
+def _query(kind: str, sql: str, params: Optional[tuple], readonly: bool) -> Tuple[Any, bool]:
+    """
+    执行查询
+    
+    Args:
+        kind: one(单条)/all(多条)
+        sql: SELECT SQL语句
+        params: 参数元组
+        readonly: 是否允许路由到只读副本
+        
+    Returns:
+        tuple: (查询结果, 是否由只读副本执行)
+    """
+    with get_db_connection(readonly) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            result = cursor.fetchone() if kind == 'one' else cursor.fetchall()
+        return result, _replica_set is not None and _replica_set.owns(conn._pool)
+
+
+def _cached_select(kind: str, sql: str, params: Optional[tuple], readonly: bool, cache: bool) -> Any:
+    """
+    带结果缓存的查询
+    
+    以下情况不使用缓存，直接查询数据库：
+    - 未启用缓存、调用方关闭缓存或要求读主库
+    - 当前请求已经写过数据（可能读到未提交的数据，不能放入缓存）
+    - 会话处于写后粘滞期（其他进程的缓存可能还未失效）
+    
+    由只读副本执行的查询结果不放入缓存：副本可能有复制延迟，
+    失效后立即从副本读到的旧数据会在缓存中保留整个有效期
+    
+    Args:
+        kind: one(单条)/all(多条)
+        sql: SELECT SQL语句
+        params: 参数元组
+        readonly: 是否允许路由到只读副本
+        cache: 是否使用缓存
+        
+    Returns:
+        查询结果（缓存命中时返回副本，调用方修改结果不会影响缓存）
+    """
+    if _query_cache is None or not cache or not readonly:
+        return _query(kind, sql, params, readonly)[0]
+    
+    uow = g.get('db_uow') if has_app_context() else None
+    if uow is not None and uow.wrote or _reads_pinned_to_primary():
+        return _query(kind, sql, params, readonly)[0]
+    
+    key = (kind, normalize_sql(sql), repr(params))
+    value = _query_cache.get(key)
+    if value is MISS:
+        versions = _query_cache.snapshot(read_tables(sql))
+        value, from_replica = _query(kind, sql, params, readonly)
+        if not from_replica:
+            _query_cache.set(key, value, versions)
+    
+    if kind == 'one':
+        return dict(value) if value is not None else None
+    return [dict(row) for row in value]
+
+
+def invalidate_tables(*tables: Optional[str]) -> None:
+    """
+    使引用了指定表的查询缓存失效
+    
+    服务层用游标直接执行写语句后需要调用此函数。在请求中调用时，
+    还会在请求结束提交后再失效一次，避免提交前被其他请求读入缓存的旧数据残留
+    
+    Args:
+        *tables: 被写入的表名（None会被忽略）
+    """
+    tables = {t for t in tables if t}
+    if _query_cache is None or not tables:
+        return
+    _query_cache.invalidate(tables)
+    uow = g.get('db_uow') if has_app_context() else None
+    if uow is not None:
+        uow.written_tables.update(tables)
+
+
+def get_query_cache_stats() -> Dict[str, Any]:
+    """
+    获取查询结果缓存统计
+    
+    Returns:
+        dict: 命中率、条目数、内存占用等
+    """
+    if _query_cache is None:
+        return {'enabled': False}
+    stats = _query_cache.stats()
+    stats['enabled'] = True
+    return stats
+
+
 class Database:
     """
     数据库操作封装类
@@ -111,6 +766,7 @@ class Database:
                 cursor.execute(sql, params)
                 if commit:
                     conn.commit()
+                invalidate_tables(written_table(sql))
                 return cursor.rowcount
     
     @staticmethod
@@ -125,14 +781,60 @@ class Database:
             
         Returns:
             int: 影响的总行数
+            
+        Note:
+            批量插入请使用bulk_insert，它会按max_allowed_packet拆分多行INSERT并返回每批的影响行数
         """
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.executemany(sql, params_list)
                 if commit:
                     conn.commit()
+                invalidate_tables(written_table(sql))
                 return cursor.rowcount
     
+    @staticmethod
+    def bulk_insert(table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                    ignore: bool = False,
+                    on_duplicate: Optional[Union[Sequence[str], Dict[str, str]]] = None,
+                    cursor=None, commit: bool = True,
+                    max_rows: Optional[int] = None) -> List[int]:
+        """
+        批量插入
+        把多行数据改写为 INSERT ... VALUES (...),(...) 多行语句分批执行，
+        每批的行数不超过max_rows，语句长度不超过max_allowed_packet
+        
+        Args:
+            table: 表名
+            columns: 列名列表
+            rows: 行数据（每行是与columns对应的值序列），可以是生成器
+            ignore: 是否使用 INSERT IGNORE
+            on_duplicate: 主键/唯一键冲突时要更新的列，生成 ON DUPLICATE KEY UPDATE col = VALUES(col)；
+                传入 {列名: 表达式} 时使用给定的表达式，如 {'hits': 'hits + VALUES(hits)'}
+            cursor: 已有的游标（在调用方的事务中执行时传入，此时不提交）
+            commit: 未传入cursor时是否提交事务
+            max_rows: 每批最多行数，默认使用配置DB_BULK_MAX_ROWS
+            
+        Returns:
+            list: 每批语句的影响行数
+            
+        Example:
+            Database.bulk_insert('prompt_tags', ['prompt_id', 'tag_id'],
+                                 [(1, 3), (1, 5)], ignore=True)
+        """
+        if cursor is not None:
+            counts = _bulk_insert(cursor, table, columns, rows, ignore, on_duplicate, max_rows)
+            invalidate_tables(table)
+            return counts
+        
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                counts = _bulk_insert(cursor, table, columns, rows, ignore, on_duplicate, max_rows)
+                if commit:
+                    conn.commit()
+                invalidate_tables(table)
+                return counts
+    
     @staticmethod
     def insert(sql: str, params: tuple = None) -> int:
         """
@@ -149,68 +851,133 @@ class Database:
             with conn.cursor() as cursor:
                 cursor.execute(sql, params)
                 conn.commit()
+                invalidate_tables(written_table(sql))
                 return cursor.lastrowid
     
     @staticmethod
-    def select_one(sql: str, params: tuple = None) -> Optional[Dict[str, Any]]:
+    def select_one(sql: str, params: tuple = None, readonly: bool = True,
+                   cache: bool = True) -> Optional[Dict[str, Any]]:
         """
         查询单条记录
         
         Args:
             sql: SELECT SQL语句
             params: 参数元组
+            readonly: 是否允许路由到只读副本（读后立即写的场景传False读主库）
+            cache: 是否使用查询结果缓存（readonly为False时不使用）
             
         Returns:
             dict: 查询结果，如果没有则返回None
         """
-        with get_db_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(sql, params)
-                return cursor.fetchone()
+        return _cached_select('one', sql, params, readonly, cache)
     
     @staticmethod
-    def select_all(sql: str, params: tuple = None) -> List[Dict[str, Any]]:
+    def select_all(sql: str, params: tuple = None, readonly: bool = True,
+                   cache: bool = True) -> List[Dict[str, Any]]:
         """
         查询多条记录
         
         Args:
             sql: SELECT SQL语句
             params: 参数元组
+            readonly: 是否允许路由到只读副本（读后立即写的场景传False读主库）
+            cache: 是否使用查询结果缓存（readonly为False时不使用）
             
         Returns:
             list: 查询结果列表
         """
-        with get_db_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(sql, params)
-                return cursor.fetchall()
+        return _cached_select('all', sql, params, readonly, cache)
+    
+    @staticmethod
+    def stream(sql: str, params: tuple = None,
+               batch_size: Optional[int] = None, readonly: bool = True) -> Iterator[Any]:
+        """
+        流式查询大结果集
+        使用非缓冲的服务端游标逐行读取，内存占用与结果集大小无关
+        
+        流式读取会独占一个连接直到结果集读完，因此不使用请求级工作单元的连接，
+        而是单独从连接池取出。调用方提前停止迭代（break、异常或生成器被回收）时，
+        连接会被直接关闭而不是读完剩余数据，避免为丢弃的行付出网络开销
+        
+        Args:
+            sql: SELECT SQL语句
+            params: 参数元组
+            batch_size: 为None时逐行返回；否则每次返回最多batch_size行组成的列表
+            readonly: 是否允许路由到只读副本
+            
+        Yields:
+            dict 或 list[dict]: 单行或一批行
+            
+        Example:
+            for batch in Database.stream("SELECT * FROM prompts", batch_size=500):
+                write_rows(batch)
+        """
+        uow = _get_unit_of_work()
+        if uow is not None and uow.wrote or _reads_pinned_to_primary():
+            readonly = False
+        conn = _checkout(readonly)
+        finished = False
+        try:
+            cursor = conn.cursor(SSDictCursor)
+            cursor.execute(sql, params)
+            fetch_size = batch_size or config.DB_STREAM_FETCH_SIZE
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                if batch_size:
+                    yield rows
+                else:
+                    yield from rows
+            cursor.close()
+            finished = True
+        finally:
+            if finished:
+                conn.close()
+            else:
+                # 结果集未读完，连接上还有未接收的数据，直接关闭连接
+                conn.invalidate()
     
     @staticmethod
     def select_page(sql: str, params: tuple = None, page: int = 1, 
-                   page_size: int = 20) -> Dict[str, Any]:
+                   page_size: int = 20,
+                   keyset: Optional[List[Tuple[str, str]]] = None,
+                   cursor: Optional[str] = None,
+                   total: str = 'exact', cache: bool = True) -> Dict[str, Any]:
         """
         分页查询
         
+        默认使用 LIMIT/OFFSET 按页码分页；传入keyset时改用键集（seek）分页，
+        按排序键定位边界行，翻页代价与页码深度无关
+        
         Args:
-            sql: SELECT SQL语句（不包含LIMIT）
+            sql: SELECT SQL语句（不包含LIMIT；键集分页时也不包含ORDER BY）
             params: 参数元组
-            page: 页码（从1开始）
+            page: 页码（从1开始），键集分页时忽略
             page_size: 每页大小
+            keyset: 键集分页的排序键，如 [('update_time', 'DESC'), ('id', 'DESC')]，
+                    最后一列必须唯一，且应有对应的复合索引
+            cursor: 键集分页的游标（上一次返回的next_cursor/prev_cursor）
+            total: 总数计算方式：exact(每次COUNT)/cached(缓存COUNT结果)/
+                   approx(EXPLAIN估算)/none(不计算)
+            cache: 数据和总数查询是否使用查询结果缓存
             
         Returns:
             dict: 包含数据和分页信息的字典
         """
+        if keyset:
+            return Database._select_keyset_page(sql, params, keyset, cursor, page_size, total, cache)
+        
         # 计算偏移量
         offset = (page - 1) * page_size
         
         # 查询总数
-        count_sql = f"SELECT COUNT(*) as total FROM ({sql}) as t"
-        total = Database.select_one(count_sql, params)['total']
+        total = Database._count(sql, params, 'exact' if total == 'none' else total, cache)
         
         # 查询数据
         data_sql = f"{sql} LIMIT %s OFFSET %s"
         params = params + (page_size, offset) if params else (page_size, offset)
-        data = Database.select_all(data_sql, params)
+        data = Database.select_all(data_sql, params, cache=cache)
         
         # 计算总页数
         total_pages = (total + page_size - 1) // page_size
@@ -227,11 +994,126 @@ class Database:
             }
         }
     
+    @staticmethod
+    def _select_keyset_page(sql: str, params: Optional[tuple], keyset: List[Tuple[str, str]],
+                            cursor: Optional[str], page_size: int, total: str,
+                            cache: bool = True) -> Dict[str, Any]:
+        """
+        键集分页查询
+        
+        多取一行用于判断当前方向上是否还有数据；向前翻页时反转排序查询后再把结果倒序
+        
+        Args:
+            sql: SELECT SQL语句（不包含ORDER BY和LIMIT）
+            params: 参数元组
+            keyset: 排序键列表
+            cursor: 分页游标
+            page_size: 每页大小
+            total: 总数计算方式
+            cache: 是否使用查询结果缓存
+            
+        Returns:
+            dict: 包含数据、游标和分页信息的字典
+        """
+        direction = 'next'
+        where = ''
+        query_params = list(params or ())
+        
+        if cursor:
+            values, direction = decode_cursor(cursor, len(keyset))
+            condition, condition_params = build_keyset_condition(
+                keyset, values, reverse=direction == 'prev'
+            )
+            where = f" WHERE {condition}"
+            query_params.extend(condition_params)
+        
+        reverse = direction == 'prev'
+        data_sql = (
+            f"SELECT * FROM ({sql}) AS t{where} "
+            f"ORDER BY {build_order_by(keyset, reverse=reverse)} LIMIT %s"
+        )
+        query_params.append(page_size + 1)
+        rows = Database.select_all(data_sql, tuple(query_params), cache=cache)
+        
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+        
+        # 当前方向上是否还有数据由多取的一行判断；反方向上只要是通过游标翻过来的就一定有数据
+        has_next = has_more if direction == 'next' else bool(cursor)
+        has_prev = has_more if direction == 'prev' else bool(cursor)
+        
+        columns = [column for column, _ in keyset]
+        next_cursor = None
+        prev_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor([rows[-1][c] for c in columns], 'next')
+        if rows and has_prev:
+            prev_cursor = encode_cursor([rows[0][c] for c in columns], 'prev')
+        
+        return {
+            'data': rows,
+            'pagination': {
+                'page_size': page_size,
+                'total': Database._count(sql, params, total, cache),
+                'total_mode': total,
+                'has_next': has_next,
+                'has_prev': has_prev,
+                'next_cursor': next_cursor,
+                'prev_cursor': prev_cursor
+            }
+        }
+    
+    @staticmethod
+    def _count(sql: str, params: Optional[tuple], mode: str, cache: bool = True) -> Optional[int]:
+        """
+        计算查询结果总数
+        
+        Args:
+            sql: SELECT SQL语句
+            params: 参数元组
+            mode: exact(COUNT)/cached(缓存的COUNT)/approx(EXPLAIN估算)/none(不计算)
+            cache: 是否使用查询结果缓存
+            
+        Returns:
+            int: 总数，mode为none时返回None
+        """
+        if mode == 'none':
+            return None
+        
+        if mode == 'approx' and not get_backend().explain_estimates:
+            # 后端的执行计划不提供行数估算，退回精确计数
+            mode = 'exact'
+        
+        if mode == 'approx':
+            # EXPLAIN的rows*filtered是优化器对每个表输出行数的估算，连接查询时相乘
+            plan = Database.select_all(f"EXPLAIN {sql}", params, cache=cache)
+            estimate = 1.0
+            for row in plan:
+                if row.get('id') == 1 and row.get('rows') is not None:
+                    estimate *= float(row['rows']) * float(row.get('filtered') or 100) / 100
+            return int(estimate) if plan else 0
+        
+        cache_key = (sql, params)
+        if mode == 'cached':
+            cached = _total_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        count_sql = f"SELECT COUNT(*) as total FROM ({sql}) as t"
+        total = Database.select_one(count_sql, params, cache=cache)['total']
+        
+        if mode == 'cached':
+            _total_cache.set(cache_key, total)
+        return total
+    
     @staticmethod
     def transaction(func):
         """
         事务装饰器
-        被装饰的函数第一个参数必须是conn（数据库连接）
+        被装饰的函数第一个参数必须是conn（数据库连接），调用时不传conn，
+        由装饰器取出连接、提交事务，并在死锁或锁等待超时时重试（见run_transaction）
         
         Example:
             @Database.transaction
@@ -243,17 +1125,12 @@ class Database:
                 # 加款
                 cursor.execute("UPDATE accounts SET balance = balance + %s WHERE id = %s", 
                              (amount, to_id))
+            
+            transfer_money(1, 2, 100)
         """
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            with get_db_connection() as conn:
-                try:
-                    result = func(conn, *args[1:], **kwargs)
-                    conn.commit()
-                    return result
-                except Exception as e:
-                    conn.rollback()
-                    logger.error(f"事务执行失败: {str(e)}", exc_info=True)
-                    raise
+            return run_transaction(func, *args, **kwargs)
         return wrapper
 
 
@@ -286,8 +1163,15 @@ def close_database():
     """
     关闭数据库连接池
     """
-    global _db_pool
+    global _db_pool, _replica_set, _backend, _max_packet
+    if _replica_set:
+        _replica_set.close()
+        _replica_set = None
     if _db_pool:
         _db_pool.close()
         _db_pool = None
-        logger.info("数据库连接池已关闭")
\ No newline at end of file
+        logger.info("数据库连接池已关闭")
+    if _backend:
+        _backend.close()
+        _backend = None
+    _max_packet = None
\ No newline at end of file
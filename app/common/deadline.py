@@ -0,0 +1,215 @@
+"""
+请求截止时间模块
+每个请求在开始时获得一个截止时间（路由单独指定或使用默认值），
+经由数据库模块传递到每条SQL：SELECT语句带上MAX_EXECUTION_TIME提示，
+截止时间已过的请求不再访问数据库，并以503/504 JSON错误快速失败
+"""
+import re
+import time
+import functools
+from typing import Any, Callable, Optional
+import pymysql
+from flask import g, jsonify, request, has_request_context
+from app.config import config
+from app.common.logger import get_logger
+from app.common.pool import PoolTimeoutError
+
+logger = get_logger(__name__)
+
+# MySQL中止超过MAX_EXECUTION_TIME的查询时返回的错误码
+ER_QUERY_TIMEOUT = 3024
+
+# 可以加MAX_EXECUTION_TIME提示的语句（只对顶层SELECT生效）
+_SELECT_RE = re.compile(r'^(\s*SELECT\b)', re.IGNORECASE)
+
+
+class DeadlineExceeded(Exception):
+    """
+    请求截止时间已过异常
+    截止时间已过时继续访问数据库，或查询被MAX_EXECUTION_TIME中止时抛出
+    """
+
+
+def request_deadline(seconds: float) -> Callable:
+    """
+    路由装饰器：为路由单独指定截止时间
+
+    Args:
+        seconds: 截止时间（秒），0表示不限制
+
+    Example:
+        @bp.route('/api/export')
+        @request_deadline(120)
+        def export():
+            ...
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return func(*args, **kwargs)
+        wrapper.request_deadline = seconds
+        return wrapper
+    return decorator
+
+
+def remaining() -> Optional[float]:
+    """
+    获取当前请求剩余的时间
+
+    Returns:
+        float: 剩余秒数（可能为负），不在请求中或没有截止时间时返回None
+    """
+    if not has_request_context():
+        return None
+    deadline = g.get('deadline')
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check() -> Optional[float]:
+    """
+    检查截止时间，已过时记录失败并抛出异常
+
+    Returns:
+        float: 剩余秒数，没有截止时间时返回None
+
+    Raises:
+        DeadlineExceeded: 截止时间已过
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        fail(504, '请求处理超时，请稍后重试')
+        raise DeadlineExceeded('请求截止时间已过')
+    return left
+
+
+def checkout_timeout(pool_timeout: float) -> float:
+    """
+    计算获取连接的等待时间：不超过连接池超时和请求剩余时间
+
+    Args:
+        pool_timeout: 连接池配置的超时时间（秒）
+
+    Returns:
+        float: 等待秒数
+    """
+    left = check()
+    return pool_timeout if left is None else min(pool_timeout, left)
+
+
+def apply_to_statement(sql: str) -> str:
+    """
+    把请求剩余时间带入SQL：SELECT语句加上MAX_EXECUTION_TIME提示
+
+    Args:
+        sql: SQL语句
+
+    Returns:
+        str: 加上提示后的SQL，没有截止时间或不是SELECT时原样返回
+
+    Raises:
+        DeadlineExceeded: 截止时间已过
+    """
+    left = check()
+    if left is None or 'MAX_EXECUTION_TIME' in sql:
+        return sql
+    ms = max(int(left * 1000), 1)
+    return _SELECT_RE.sub(lambda m: f"{m.group(1)} /*+ MAX_EXECUTION_TIME({ms}) */", sql, count=1)
+
+
+def fail(status: int, error: str) -> None:
+    """
+    记录请求因数据库超时或繁忙而失败，API请求的响应会被替换为对应的JSON错误
+    （服务层会捕获异常并返回普通的失败结果，因此需要在请求级别记录）
+
+    Args:
+        status: HTTP状态码（503连接池繁忙，504超时）
+        error: 错误信息
+    """
+    if has_request_context() and 'deadline_failure' not in g:
+        g.deadline_failure = (status, error)
+
+
+class DeadlineCursor:
+    """
+    截止时间游标代理
+    执行前检查截止时间并为SELECT加上MAX_EXECUTION_TIME提示，
+    查询被MySQL按超时中止时转换为DeadlineExceeded，其余属性委托给原游标
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name: str):
+        """委托属性访问给原游标"""
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._cursor.close()
+        return False
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql: str, params: Any = None):
+        """带截止时间执行语句"""
+        sql = apply_to_statement(sql)
+        try:
+            return self._cursor.execute(sql, params)
+        except pymysql.err.OperationalError as e:
+            if e.args and e.args[0] == ER_QUERY_TIMEOUT:
+                fail(504, '请求处理超时，请稍后重试')
+                raise DeadlineExceeded(f'查询超过请求截止时间被中止: {str(e)}') from e
+            raise
+
+    def executemany(self, sql: str, params_list: Any):
+        """检查截止时间后批量执行语句"""
+        check()
+        return self._cursor.executemany(sql, params_list)
+
+
+def _error_response(status: int, error: str):
+    """构造JSON错误响应"""
+    return jsonify({'success': False, 'error': error}), status
+
+
+def init_app(app) -> None:
+    """
+    在Flask应用上注册请求截止时间
+
+    Args:
+        app: Flask应用实例
+    """
+    @app.before_request
+    def start_deadline():
+        """按路由配置或默认值设置本次请求的截止时间"""
+        view = app.view_functions.get(request.endpoint)
+        seconds = getattr(view, 'request_deadline', config.REQUEST_DEADLINE_SECONDS)
+        if seconds and seconds > 0:
+            g.deadline = time.monotonic() + seconds
+
+    @app.after_request
+    def replace_failed_response(response):
+        """API请求因超时或连接池繁忙失败时，把响应替换为503/504 JSON错误"""
+        failure = g.get('deadline_failure')
+        if failure is None or '/api/' not in request.path:
+            return response
+        status, error = failure
+        logger.warning(f"请求快速失败({status}): {request.method} {request.path} {error}")
+        failed = jsonify({'success': False, 'error': error})
+        failed.status_code = status
+        return failed
+
+    @app.errorhandler(DeadlineExceeded)
+    def handle_deadline_exceeded(e):
+        """未被捕获的截止时间异常返回504"""
+        return _error_response(504, '请求处理超时，请稍后重试')
+
+    @app.errorhandler(PoolTimeoutError)
+    def handle_pool_timeout(e):
+        """未被捕获的获取连接超时返回503"""
+        return _error_response(503, '数据库繁忙，请稍后重试')
@@ -0,0 +1,123 @@
+"""
+文本差量模块
+计算两段文本之间的差量并还原，用于版本历史的差量存储
+
+差量编码为JSON数组，元素为 [offset, length]（从基准文本复制一段）
+或字符串（插入的新文本），还原时依次拼接即可
+"""
+import json
+from difflib import SequenceMatcher
+from typing import List, Optional, Union
+
+# 复制片段短于此长度时直接内联文本（[offset, length]本身也要占若干字节）
+_MIN_COPY_CHARS = 8
+
+# 按行比较后，被替换的行块两侧长度乘积不超过此值时再逐字符细化
+_CHAR_DIFF_LIMIT = 4_000_000
+
+Op = Union[List[int], str]
+
+
+def _append_copy(ops: List[Op], base: str, offset: int, length: int) -> None:
+    """追加复制操作，过短的片段内联为文本，相邻的复制合并"""
+    if length <= 0:
+        return
+    if length < _MIN_COPY_CHARS:
+        _append_insert(ops, base[offset:offset + length])
+        return
+    if ops and isinstance(ops[-1], list) and ops[-1][0] + ops[-1][1] == offset:
+        ops[-1][1] += length
+    else:
+        ops.append([offset, length])
+
+
+def _append_insert(ops: List[Op], text: str) -> None:
+    """追加插入操作，相邻的插入合并"""
+    if not text:
+        return
+    if ops and isinstance(ops[-1], str):
+        ops[-1] += text
+    else:
+        ops.append(text)
+
+
+def _diff_chars(ops: List[Op], base: str, offset: int, old: str, new: str) -> None:
+    """逐字符比较一个被替换的块"""
+    if len(old) * len(new) > _CHAR_DIFF_LIMIT:
+        _append_insert(ops, new)
+        return
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            _append_copy(ops, base, offset + i1, i2 - i1)
+        elif tag in ('insert', 'replace'):
+            _append_insert(ops, new[j1:j2])
+
+
+def diff(base: str, target: str) -> str:
+    """
+    计算从base到target的差量
+    先按行比较，再对被替换的行逐字符细化，单行的小改动也能得到紧凑的差量
+
+    Args:
+        base: 基准文本
+        target: 目标文本
+
+    Returns:
+        str: 编码后的差量
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    offsets = [0]
+    for line in base_lines:
+        offsets.append(offsets[-1] + len(line))
+
+    ops: List[Op] = []
+    matcher = SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            _append_copy(ops, base, offsets[i1], offsets[i2] - offsets[i1])
+        elif tag == 'insert':
+            _append_insert(ops, ''.join(target_lines[j1:j2]))
+        elif tag == 'replace':
+            _diff_chars(ops, base, offsets[i1], base[offsets[i1]:offsets[i2]],
+                        ''.join(target_lines[j1:j2]))
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+
+def patch(base: str, delta: str) -> str:
+    """
+    用差量还原目标文本
+
+    Args:
+        base: 基准文本
+        delta: diff()返回的差量
+
+    Returns:
+        str: 目标文本
+    """
+    parts = []
+    for op in json.loads(delta):
+        if isinstance(op, list):
+            parts.append(base[op[0]:op[0] + op[1]])
+        else:
+            parts.append(op)
+    return ''.join(parts)
+
+
+def compact_diff(base: str, target: str, max_ratio: float = 0.5) -> Optional[str]:
+    """
+    计算差量，差量不够紧凑时返回None（此时应保存完整文本）
+
+    Args:
+        base: 基准文本
+        target: 目标文本
+        max_ratio: 差量长度与目标文本长度之比的上限
+
+    Returns:
+        str: 编码后的差量，不划算时返回None
+    """
+    delta = diff(base, target)
+    if len(delta.encode('utf-8')) > len(target.encode('utf-8')) * max_ratio:
+        return None
+    return delta
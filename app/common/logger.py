@@ -104,6 +104,46 @@ class LoggerManager:
         
         return logger
     
+    def get_dedicated_logger(self, name: str, subdir: str) -> logging.Logger:
+        """
+        获取写入独立日志文件的日志器（如慢查询日志）
+        日志只写入 LOG_DIR/<subdir>/<subdir>.YYYY.MM.DD，不输出到控制台和主日志
+        
+        Args:
+            name: 日志器名称
+            subdir: 日志子目录名，同时作为日志文件名前缀
+            
+        Returns:
+            logging.Logger: 配置好的日志器实例
+        """
+        if name in self.loggers:
+            return self.loggers[name]
+        
+        log_dir = self.config.LOG_DIR / subdir
+        log_dir.mkdir(parents=True, exist_ok=True)
+        today = datetime.now().strftime('%Y.%m.%d')
+        
+        handler = TimedRotatingFileHandler(
+            filename=str(log_dir / f"{subdir}.{today}"),
+            when='midnight',
+            interval=1,
+            backupCount=self.config.LOG_RETENTION_DAYS,
+            encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter(
+            fmt='[%(asctime)s] %(message)s\n----------------------------------------',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        ))
+        
+        logger = logging.getLogger(name)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.handlers.clear()
+        logger.addHandler(handler)
+        
+        self.loggers[name] = logger
+        return logger
+    
     def _create_console_handler(self) -> logging.Handler:
         """
         创建控制台处理器
@@ -354,6 +394,20 @@ def get_logger(name: str = 'app') -> logging.Logger:
     return logger_manager.get_logger(name)
 
 
+def get_dedicated_logger(name: str, subdir: str) -> logging.Logger:
+    """
+    获取写入独立日志文件的日志器的便捷函数
+    
+    Args:
+        name: 日志器名称
+        subdir: 日志子目录名
+        
+    Returns:
+        logging.Logger: 配置好的日志器实例
+    """
+    return logger_manager.get_dedicated_logger(name, subdir)
+
+
 def log_function_call(func):
     """
     装饰器：记录函数调用
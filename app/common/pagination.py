@@ -0,0 +1,214 @@
+"""
+分页辅助模块
+提供键集（seek）分页所需的游标编解码、条件构建，以及总数缓存
+"""
+import json
+import time
+import base64
+import threading
+from collections import OrderedDict
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+
+
+class InvalidCursorError(ValueError):
+    """
+    分页游标无效异常
+    游标被篡改或与当前排序键不匹配时抛出
+    """
+
+
+def _encode_value(value: Any) -> Any:
+    """
+    将排序键的值转换为可JSON序列化的形式
+
+    Args:
+        value: 排序键的值
+
+    Returns:
+        可JSON序列化的值
+    """
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    """
+    还原_encode_value编码的值
+
+    Args:
+        value: 编码后的值
+
+    Returns:
+        原始值
+    """
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+        raise InvalidCursorError("无法识别的游标值")
+    return value
+
+
+def encode_cursor(values: Sequence[Any], direction: str) -> str:
+    """
+    生成不透明的分页游标
+
+    Args:
+        values: 边界行的排序键值
+        direction: 翻页方向（next/prev）
+
+    Returns:
+        str: URL安全的游标字符串
+    """
+    payload = {'k': [_encode_value(v) for v in values], 'd': direction}
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, key_count: int) -> Tuple[List[Any], str]:
+    """
+    解析分页游标
+
+    Args:
+        cursor: encode_cursor生成的游标
+        key_count: 排序键的数量
+
+    Returns:
+        tuple: (排序键值列表, 翻页方向)
+
+    Raises:
+        InvalidCursorError: 游标格式错误
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = [_decode_value(v) for v in payload['k']]
+        direction = payload['d']
+    except InvalidCursorError:
+        raise
+    except Exception as e:
+        raise InvalidCursorError(f"分页游标格式错误: {str(e)}")
+
+    if len(values) != key_count or direction not in ('next', 'prev'):
+        raise InvalidCursorError("分页游标与排序键不匹配")
+    return values, direction
+
+
+def build_keyset_condition(keyset: Sequence[Tuple[str, str]], values: Sequence[Any],
+                           reverse: bool = False) -> Tuple[str, List[Any]]:
+    """
+    构建"位于边界行之后"的查询条件
+
+    展开为 (a > x) OR (a = x AND b > y) ... 的形式，
+    支持各列排序方向不同，并且可以利用复合索引做范围扫描
+
+    Args:
+        keyset: 排序键列表，如 [('update_time', 'DESC'), ('id', 'DESC')]
+        values: 边界行的排序键值
+        reverse: 是否反向（向前翻页时使用）
+
+    Returns:
+        tuple: (条件SQL, 参数列表)
+    """
+    clauses = []
+    params: List[Any] = []
+    for i, (column, order) in enumerate(keyset):
+        descending = order.upper() == 'DESC'
+        if reverse:
+            descending = not descending
+        parts = [f"t.{keyset[j][0]} = %s" for j in range(i)]
+        parts.append(f"t.{column} {'<' if descending else '>'} %s")
+        params.extend(values[:i])
+        params.append(values[i])
+        clauses.append(f"({' AND '.join(parts)})")
+    return f"({' OR '.join(clauses)})", params
+
+
+def build_order_by(keyset: Sequence[Tuple[str, str]], reverse: bool = False) -> str:
+    """
+    构建排序子句
+
+    Args:
+        keyset: 排序键列表
+        reverse: 是否反转排序方向
+
+    Returns:
+        str: ORDER BY子句（不含ORDER BY关键字）
+    """
+    orders = []
+    for column, order in keyset:
+        descending = order.upper() == 'DESC'
+        if reverse:
+            descending = not descending
+        orders.append(f"t.{column} {'DESC' if descending else 'ASC'}")
+    return ', '.join(orders)
+
+
+class TotalCache:
+    """
+    分页总数缓存
+    按SQL和参数缓存COUNT结果，在有效期内复用，避免每次翻页都执行COUNT
+    """
+
+    def __init__(self, ttl: int = 60, max_entries: int = 1024):
+        """
+        初始化总数缓存
+
+        Args:
+            ttl: 缓存有效期（秒）
+            max_entries: 最多缓存的条目数
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Any, Tuple[float, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[int]:
+        """
+        读取缓存的总数
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            int: 总数，不存在或已过期时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, total = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return total
+
+    def set(self, key: Any, total: int) -> None:
+        """
+        写入总数
+
+        Args:
+            key: 缓存键
+            total: 总数
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,347 @@
+"""
+数据库连接池模块
+提供支持溢出连接、获取超时、按连接年龄回收和存活检测的连接池，
+并实时统计连接池运行指标
+"""
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+from app.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """
+    获取连接超时异常
+    连接池已满且在超时时间内没有连接被归还时抛出
+    """
+
+
+class PoolStats:
+    """
+    连接池统计信息
+    记录获取连接的等待耗时直方图、回收次数等指标
+    """
+
+    # 等待耗时直方图的桶上界（毫秒），最后一个桶收纳所有更大的值
+    WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.ping_failures = 0
+        self.created = 0
+        self.wait_histogram: List[int] = [0] * (len(self.WAIT_BUCKETS_MS) + 1)
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def record_wait(self, wait_ms: float) -> None:
+        """
+        记录一次获取连接的等待耗时
+
+        Args:
+            wait_ms: 等待耗时（毫秒）
+        """
+        self.checkouts += 1
+        self.wait_total_ms += wait_ms
+        self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+        self.wait_histogram[bisect_left(self.WAIT_BUCKETS_MS, wait_ms)] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为字典
+
+        Returns:
+            dict: 统计信息
+        """
+        labels = [f'<={b}ms' for b in self.WAIT_BUCKETS_MS] + [f'>{self.WAIT_BUCKETS_MS[-1]}ms']
+        return {
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'recycled': self.recycled,
+            'ping_failures': self.ping_failures,
+            'created': self.created,
+            'wait_avg_ms': round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            'wait_max_ms': round(self.wait_max_ms, 3),
+            'wait_histogram': dict(zip(labels, self.wait_histogram))
+        }
+
+
+class PooledConnection:
+    """
+    池化连接代理
+    除cursor()和close()外的所有属性访问都委托给底层连接，close()会把连接归还给连接池
+    """
+
+    def __init__(self, pool: 'ConnectionPool', raw, created_at: float):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._last_used = time.monotonic()
+        self._closed = False
+
+    def __getattr__(self, name: str):
+        """委托属性访问给底层连接"""
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        """
+        创建游标，连接池配置了cursor_wrapper时返回包装后的游标
+        """
+        cursor = self._raw.cursor(*args, **kwargs)
+        if self._pool.cursor_wrapper is not None:
+            cursor = self._pool.cursor_wrapper(cursor)
+        return cursor
+
+    def close(self) -> None:
+        """
+        归还连接到连接池（重复调用是安全的）
+        """
+        if not self._closed:
+            self._closed = True
+            self._pool._release(self)
+
+    def invalidate(self) -> None:
+        """
+        关闭底层连接并释放连接池中的占位，而不是放回空闲队列
+        用于连接状态不可知的场景（例如未读完的流式结果集）
+        """
+        if not self._closed:
+            self._closed = True
+            self._pool._release(self, discard=True)
+
+
+class ConnectionPool:
+    """
+    数据库连接池
+
+    最多同时持有 pool_size + max_overflow 个连接：
+    - 前 pool_size 个连接归还后保留在空闲队列中复用
+    - 溢出的连接归还时如果空闲队列已满则直接关闭
+    - 连接池已满时最多等待 timeout 秒，超时抛出 PoolTimeoutError
+    - 存活超过 recycle 秒的连接在归还或取出时被关闭重建
+    - 空闲超过 ping_interval 秒的连接在取出时先 ping 一次，失效则重建
+    """
+
+    def __init__(self, creator: Callable[[], Any], pool_size: int = 5,
+                 max_overflow: int = 10, timeout: float = 30,
+                 recycle: int = 3600, ping_interval: int = 30,
+                 reset: bool = True, name: str = 'default',
+                 cursor_wrapper: Optional[Callable[[Any], Any]] = None):
+        """
+        初始化连接池
+
+        Args:
+            creator: 创建底层连接的函数
+            pool_size: 空闲连接保留数量
+            max_overflow: 允许超出pool_size的连接数量
+            timeout: 获取连接的最长等待时间（秒）
+            recycle: 连接最长存活时间（秒），小于等于0表示不回收
+            ping_interval: 空闲多久后取出时需要ping（秒），0表示每次都ping，负数表示不ping
+            reset: 归还连接时是否回滚未提交的事务
+            name: 连接池名称，用于日志和统计
+            cursor_wrapper: 包装游标的函数（用于SQL计时等），为None时返回原游标
+        """
+        self.creator = creator
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.max_connections = pool_size + max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self.reset = reset
+        self.name = name
+        self.cursor_wrapper = cursor_wrapper
+
+        self._idle: Deque[PooledConnection] = deque()
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+        self.stats = PoolStats()
+
+    def connection(self, timeout: Optional[float] = None) -> PooledConnection:
+        """
+        获取一个连接
+
+        Args:
+            timeout: 本次获取的最长等待时间（秒），默认使用连接池的timeout
+
+        Returns:
+            PooledConnection: 池化连接，使用完毕后调用close()归还
+
+        Raises:
+            PoolTimeoutError: 在timeout秒内没有可用连接
+        """
+        if timeout is None:
+            timeout = self.timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"连接池 {self.name} 已关闭")
+
+                if self._idle:
+                    conn = self._idle.pop()
+                    self._in_use += 1
+                    break
+
+                if self._in_use < self.max_connections:
+                    # 先占位再在锁外创建连接
+                    conn = None
+                    self._in_use += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats.timeouts += 1
+                    raise PoolTimeoutError(
+                        f"连接池 {self.name} 获取连接超时({timeout:g}秒)，"
+                        f"使用中={self._in_use}, 最大={self.max_connections}"
+                    )
+
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        try:
+            conn = self._prepare(conn)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self.stats.record_wait((time.monotonic() - start) * 1000)
+
+        return conn
+
+    def _prepare(self, conn: Optional[PooledConnection]) -> PooledConnection:
+        """
+        检查取出的连接是否可用，必要时重建
+
+        Args:
+            conn: 空闲队列中取出的连接，None表示需要新建
+
+        Returns:
+            PooledConnection: 可用的连接
+        """
+        now = time.monotonic()
+
+        if conn is not None and self._expired(conn, now):
+            self._discard(conn)
+            with self._cond:
+                self.stats.recycled += 1
+            conn = None
+
+        if conn is not None and self.ping_interval >= 0 \
+                and now - conn._last_used >= self.ping_interval:
+            try:
+                conn._raw.ping(reconnect=False)
+            except Exception as e:
+                logger.warning(f"连接池 {self.name} 连接存活检测失败，重建连接: {str(e)}")
+                self._discard(conn)
+                with self._cond:
+                    self.stats.ping_failures += 1
+                conn = None
+
+        if conn is None:
+            raw = self.creator()
+            with self._cond:
+                self.stats.created += 1
+            conn = PooledConnection(self, raw, now)
+        else:
+            conn = PooledConnection(self, conn._raw, conn._created_at)
+
+        return conn
+
+    def _expired(self, conn: PooledConnection, now: float) -> bool:
+        """判断连接是否超过最长存活时间"""
+        return self.recycle > 0 and now - conn._created_at >= self.recycle
+
+    @staticmethod
+    def _discard(conn: PooledConnection) -> None:
+        """关闭底层连接，忽略关闭时的异常"""
+        try:
+            conn._raw.close()
+        except Exception:
+            pass
+
+    def _release(self, conn: PooledConnection, discard: bool = False) -> None:
+        """
+        归还连接
+
+        Args:
+            conn: 要归还的连接
+            discard: 是否直接关闭连接而不放回空闲队列
+        """
+        keep = not self._closed and not discard
+
+        if keep and self.reset:
+            try:
+                conn._raw.rollback()
+            except Exception as e:
+                logger.warning(f"连接池 {self.name} 归还连接时回滚失败，丢弃连接: {str(e)}")
+                keep = False
+
+        now = time.monotonic()
+        if keep and self._expired(conn, now):
+            keep = False
+            with self._cond:
+                self.stats.recycled += 1
+
+        with self._cond:
+            self._in_use -= 1
+            if keep and len(self._idle) < self.pool_size:
+                conn._last_used = now
+                self._idle.append(conn)
+                keep = True
+            else:
+                keep = False
+            self._cond.notify()
+
+        if not keep:
+            self._discard(conn)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        获取连接池实时状态
+
+        Returns:
+            dict: 使用中、空闲、等待中的连接数及统计信息
+        """
+        with self._cond:
+            result = {
+                'name': self.name,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'max_connections': self.max_connections
+            }
+            result.update(self.stats.to_dict())
+        return result
+
+    def close(self) -> None:
+        """
+        关闭连接池，关闭所有空闲连接
+        使用中的连接在归还时关闭
+        """
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+
+        for conn in idle:
+            self._discard(conn)
@@ -0,0 +1,227 @@
+"""
+查询结果缓存模块
+按规范化SQL和参数缓存查询结果，并按读取的表打标签，写表时按标签失效
+"""
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+# 读语句中引用的表：FROM t / JOIN t（支持反引号和逗号分隔的多表）
+_READ_TABLE_RE = re.compile(r'\b(?:FROM|JOIN)\s+((?:`?\w+`?(?:\s+(?:AS\s+)?\w+)?\s*,\s*)*`?\w+`?)', re.IGNORECASE)
+
+# 写语句修改的表
+_WRITE_TABLE_RE = re.compile(
+    r'^\s*(?:INSERT(?:\s+IGNORE)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+IGNORE)?|DELETE\s+FROM)\s+`?(\w+)`?',
+    re.IGNORECASE
+)
+
+# SQL关键字不会是表名（FROM后紧跟子查询等情况）
+_NOT_TABLES = {'select', 'dual', 'lateral'}
+
+# 缓存未命中的标记
+MISS = object()
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    规范化SQL：合并连续空白，使格式不同但内容相同的SQL命中同一个缓存
+
+    Args:
+        sql: SQL语句
+
+    Returns:
+        str: 规范化后的SQL
+    """
+    return ' '.join(sql.split())
+
+
+def read_tables(sql: str) -> FrozenSet[str]:
+    """
+    提取读语句引用的表名
+
+    Args:
+        sql: SELECT语句
+
+    Returns:
+        frozenset: 表名集合
+    """
+    tables = set()
+    for match in _READ_TABLE_RE.finditer(sql):
+        for part in match.group(1).split(','):
+            name = part.strip().split()[0].strip('`').lower()
+            if name not in _NOT_TABLES:
+                tables.add(name)
+    return frozenset(tables)
+
+
+def written_table(sql: str) -> Optional[str]:
+    """
+    提取写语句修改的表名
+
+    Args:
+        sql: INSERT/UPDATE/DELETE/REPLACE语句
+
+    Returns:
+        str: 表名，不是写语句时返回None
+    """
+    match = _WRITE_TABLE_RE.match(sql)
+    return match.group(1).lower() if match else None
+
+
+def _estimate_size(value: Any) -> int:
+    """
+    粗略估算查询结果占用的内存（字节）
+
+    Args:
+        value: 查询结果（字典、字典列表或None）
+
+    Returns:
+        int: 估算的字节数
+    """
+    rows = value if isinstance(value, list) else [value] if value else []
+    size = 64
+    for row in rows:
+        size += 64
+        for v in row.values():
+            size += 48 + (len(v) if isinstance(v, (str, bytes)) else 8)
+    return size
+
+
+class QueryCache:
+    """
+    查询结果缓存
+
+    - LRU淘汰，总大小不超过max_bytes
+    - 每条缓存有TTL
+    - 标签失效采用版本号：缓存条目记录读取时各表的版本号，
+      写表时把表的版本号加一，读取时版本号不一致即视为失效，失效操作是O(1)的
+    """
+
+    def __init__(self, ttl: int = 30, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 10000):
+        """
+        初始化查询缓存
+
+        Args:
+            ttl: 缓存有效期（秒）
+            max_bytes: 缓存占用内存上限（字节，估算值）
+            max_entries: 最多缓存条目数
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Any, Tuple[float, Tuple[Tuple[str, int], ...], int, Any]]' = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def snapshot(self, tables: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+        """
+        获取表当前的版本号快照，应在执行查询之前获取
+
+        Args:
+            tables: 表名
+
+        Returns:
+            tuple: ((表名, 版本号), ...)
+        """
+        with self._lock:
+            return tuple((t, self._versions.get(t, 0)) for t in sorted(tables))
+
+    def get(self, key: Any) -> Any:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的查询结果，未命中时返回MISS
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, versions, size, value = entry
+                if expires_at >= time.monotonic() and \
+                        all(self._versions.get(t, 0) == v for t, v in versions):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return MISS
+
+    def set(self, key: Any, value: Any, versions: Tuple[Tuple[str, int], ...]) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 查询结果
+            versions: 执行查询前获取的版本号快照
+        """
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # 查询期间表被写过，结果可能已过期，不写入缓存
+            if any(self._versions.get(t, 0) != v for t, v in versions):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, versions, size, value)
+            self._bytes += size
+            while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: Any) -> None:
+        """删除缓存条目（调用方持有锁）"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def invalidate(self, tables: Iterable[str]) -> None:
+        """
+        使引用了指定表的缓存全部失效
+
+        Args:
+            tables: 表名
+        """
+        with self._lock:
+            for table in tables:
+                table = table.lower()
+                self._versions[table] = self._versions.get(table, 0) + 1
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            dict: 命中、未命中、淘汰、失效次数及当前占用
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
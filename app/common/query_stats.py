@@ -0,0 +1,366 @@
+"""
+SQL执行统计模块
+为每条语句计时，按SQL指纹聚合统计信息，并把超过阈值的慢查询连同EXPLAIN计划写入独立的慢查询日志
+"""
+import math
+import re
+import time
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from app.common.logger import get_logger, get_dedicated_logger
+
+logger = get_logger(__name__)
+
+# 指纹规范化规则：字符串和数字字面量替换为?，IN列表和多行VALUES折叠
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LIST_RE = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)')
+_ROWS_RE = re.compile(r'(\(\?\+\))(?:\s*,\s*\(\?\+\))+')
+_SPACE_RE = re.compile(r'\s+')
+
+# 可以EXPLAIN的语句
+_EXPLAINABLE_RE = re.compile(r'^\s*(?:SELECT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+def fingerprint(sql: str) -> str:
+    """
+    计算SQL指纹：去掉字面量和参数差异，同一类语句得到相同的指纹
+
+    Args:
+        sql: SQL语句
+
+    Returns:
+        str: SQL指纹
+    """
+    text = _STRING_RE.sub('?', sql)
+    text = _NUMBER_RE.sub('?', text)
+    text = _LIST_RE.sub('(?+)', text)
+    text = _ROWS_RE.sub(r'\1', text)
+    return _SPACE_RE.sub(' ', text).strip().lower()
+
+
+class _FingerprintStats:
+    """单个SQL指纹的统计"""
+
+    __slots__ = ('count', 'total_ms', 'max_ms', 'rows', 'errors', 'samples')
+
+    def __init__(self, sample_size: int):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.samples: Deque[float] = deque(maxlen=sample_size)
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """计算已排序数据的百分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class QueryStats:
+    """
+    SQL执行统计
+
+    按指纹累计执行次数、总耗时、返回行数，并保留最近sample_size次耗时用于计算p50/p95/p99
+    """
+
+    # 指纹缓存上限：同一SQL字符串只计算一次指纹
+    FINGERPRINT_CACHE_SIZE = 4096
+
+    def __init__(self, sample_size: int = 1024, max_fingerprints: int = 2000):
+        """
+        初始化统计
+
+        Args:
+            sample_size: 每个指纹保留的最近耗时样本数
+            max_fingerprints: 最多统计的指纹数，超出后归入"other"
+        """
+        self.sample_size = sample_size
+        self.max_fingerprints = max_fingerprints
+        self._stats: Dict[str, _FingerprintStats] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, sql: str) -> str:
+        """
+        获取SQL指纹（带缓存）
+
+        Args:
+            sql: SQL语句
+
+        Returns:
+            str: SQL指纹
+        """
+        fp = self._fingerprints.get(sql)
+        if fp is None:
+            fp = fingerprint(sql)
+            if len(self._fingerprints) >= self.FINGERPRINT_CACHE_SIZE:
+                self._fingerprints.clear()
+            self._fingerprints[sql] = fp
+        return fp
+
+    def record(self, fp: str, elapsed_ms: float, rows: int, error: bool = False) -> None:
+        """
+        记录一次语句执行
+
+        Args:
+            fp: SQL指纹
+            elapsed_ms: 耗时（毫秒）
+            rows: 返回或影响的行数
+            error: 是否执行出错
+        """
+        with self._lock:
+            stats = self._stats.get(fp)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    fp = 'other'
+                    stats = self._stats.get(fp)
+                if stats is None:
+                    stats = self._stats[fp] = _FingerprintStats(self.sample_size)
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.rows += max(rows, 0)
+            stats.samples.append(elapsed_ms)
+            if error:
+                stats.errors += 1
+
+    def top(self, limit: int = 20, order_by: str = 'total_ms') -> List[Dict[str, Any]]:
+        """
+        获取统计排行
+
+        Args:
+            limit: 返回条数
+            order_by: 排序字段（total_ms/count/p99_ms/max_ms/rows）
+
+        Returns:
+            list: 各指纹的统计信息
+        """
+        with self._lock:
+            items = [(fp, s.count, s.total_ms, s.max_ms, s.rows, s.errors, sorted(s.samples))
+                     for fp, s in self._stats.items()]
+
+        result = []
+        for fp, count, total_ms, max_ms, rows, errors, samples in items:
+            result.append({
+                'fingerprint': fp,
+                'count': count,
+                'total_ms': round(total_ms, 3),
+                'avg_ms': round(total_ms / count, 3) if count else 0.0,
+                'p50_ms': round(_percentile(samples, 50), 3),
+                'p95_ms': round(_percentile(samples, 95), 3),
+                'p99_ms': round(_percentile(samples, 99), 3),
+                'max_ms': round(max_ms, 3),
+                'rows': rows,
+                'errors': errors
+            })
+        result.sort(key=lambda item: item.get(order_by, 0), reverse=True)
+        return result[:limit]
+
+    def reset(self) -> None:
+        """清空统计"""
+        with self._lock:
+            self._stats.clear()
+
+
+class SlowQueryLog:
+    """
+    慢查询日志
+
+    超过阈值的语句连同EXPLAIN计划写入独立日志文件。使用令牌桶限制每分钟的写入条数，
+    同一指纹的EXPLAIN在explain_interval秒内只执行一次，保证日志本身不会成为瓶颈
+    """
+
+    def __init__(self, threshold_ms: float = 500, per_minute: int = 60,
+                 explain: bool = True, explain_interval: int = 300):
+        """
+        初始化慢查询日志
+
+        Args:
+            threshold_ms: 慢查询阈值（毫秒）
+            per_minute: 每分钟最多记录条数
+            explain: 是否采集EXPLAIN计划
+            explain_interval: 同一指纹两次EXPLAIN的最小间隔（秒）
+        """
+        self.threshold_ms = threshold_ms
+        self.per_minute = per_minute
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.logged = 0
+        self.dropped = 0
+        self._tokens = float(per_minute)
+        self._refilled_at = time.monotonic()
+        self._explained: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._logger = None
+
+    def _take_token(self) -> bool:
+        """从令牌桶中取一个令牌，取不到说明超出限速"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(self.per_minute),
+                               self._tokens + (now - self._refilled_at) * self.per_minute / 60)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.logged += 1
+                return True
+            self.dropped += 1
+            return False
+
+    def _should_explain(self, fp: str) -> bool:
+        """判断该指纹是否需要采集EXPLAIN"""
+        with self._lock:
+            now = time.monotonic()
+            last = self._explained.get(fp)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            if len(self._explained) >= 10000:
+                self._explained.clear()
+            self._explained[fp] = now
+            return True
+
+    def record(self, cursor, sql: str, params: Any, fp: str, elapsed_ms: float, rows: int) -> None:
+        """
+        记录一条慢查询
+
+        Args:
+            cursor: 执行语句的游标（用于生成完整SQL和执行EXPLAIN）
+            sql: SQL语句
+            params: 参数
+            fp: SQL指纹
+            elapsed_ms: 耗时（毫秒）
+            rows: 返回或影响的行数
+        """
+        if not self._take_token():
+            return
+
+        try:
+            statement = cursor.mogrify(sql, params) if params is not None else sql
+        except Exception:
+            statement = sql
+
+        plan = None
+        if self.explain and getattr(cursor, 'explainable', False) \
+                and _EXPLAINABLE_RE.match(statement) and self._should_explain(fp):
+            plan = self._explain(cursor, statement)
+
+        if self._logger is None:
+            self._logger = get_dedicated_logger('slow_query', 'slow')
+
+        message = f"耗时={elapsed_ms:.1f}ms 行数={rows} 指纹={fp}\n{statement}"
+        if plan:
+            lines = [' | '.join(f"{k}={v}" for k, v in row.items()) for row in plan]
+            message += "\nEXPLAIN:\n" + '\n'.join(lines)
+        self._logger.info(message)
+
+    @staticmethod
+    def _explain(cursor, statement: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        在同一连接上执行EXPLAIN
+
+        Args:
+            cursor: 原游标
+            statement: 完整SQL
+
+        Returns:
+            list: EXPLAIN结果，失败时返回None
+        """
+        try:
+            with cursor.connection.cursor() as explain_cursor:
+                explain_cursor.execute(f"EXPLAIN {statement}")
+                return list(explain_cursor.fetchall())
+        except Exception as e:
+            logger.warning(f"采集EXPLAIN失败: {str(e)}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取慢查询日志统计
+
+        Returns:
+            dict: 阈值、已记录和因限速丢弃的条数
+        """
+        return {
+            'threshold_ms': self.threshold_ms,
+            'logged': self.logged,
+            'dropped': self.dropped
+        }
+
+
+class InstrumentedCursor:
+    """
+    计时游标代理
+    execute/executemany执行时计时并记录统计，其余属性委托给原游标
+    """
+
+    def __init__(self, cursor, stats: QueryStats, slow_log: SlowQueryLog, buffered: bool = True):
+        """
+        初始化计时游标
+
+        Args:
+            cursor: 原游标
+            stats: 统计对象
+            slow_log: 慢查询日志
+            buffered: 是否为缓冲游标。非缓冲（流式）游标执行后连接被结果集占用，不能EXPLAIN
+        """
+        self._cursor = cursor
+        self._stats = stats
+        self._slow_log = slow_log
+        self.explainable = buffered
+
+    def __getattr__(self, name: str):
+        """委托属性访问给原游标"""
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._cursor.close()
+        return False
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql: str, params: Any = None):
+        """执行语句并计时"""
+        return self._timed(self._cursor.execute, sql, params)
+
+    def executemany(self, sql: str, params_list: Any):
+        """批量执行语句并计时"""
+        return self._timed(self._cursor.executemany, sql, params_list, many=True)
+
+    def _timed(self, method, sql: str, params: Any, many: bool = False):
+        """
+        执行并记录耗时
+
+        Args:
+            method: 原游标的执行方法
+            sql: SQL语句
+            params: 参数
+            many: 是否为executemany
+        """
+        fp = self._stats.fingerprint(sql)
+        start = time.perf_counter()
+        try:
+            result = method(sql, params)
+        except Exception:
+            self._stats.record(fp, (time.perf_counter() - start) * 1000, 0, error=True)
+            raise
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        rows = self._cursor.rowcount if self.explainable else 0
+        self._stats.record(fp, elapsed_ms, rows)
+
+        if elapsed_ms >= self._slow_log.threshold_ms:
+            try:
+                self._slow_log.record(self, sql, None if many else params, fp, elapsed_ms, rows)
+            except Exception as e:
+                logger.warning(f"写入慢查询日志失败: {str(e)}")
+        return result
@@ -0,0 +1,218 @@
+"""
+只读副本路由模块
+管理多个只读副本的连接池，轮询选择健康的副本，并剔除不健康的副本
+"""
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+import pymysql
+from app.common import deadline
+from app.common.logger import get_logger
+from app.common.pool import ConnectionPool, PooledConnection, PoolTimeoutError
+
+logger = get_logger(__name__)
+
+
+def parse_endpoints(value: str, default_port: int = 3306) -> List[tuple]:
+    """
+    解析副本地址配置
+
+    Args:
+        value: 逗号分隔的地址列表，如 "10.0.0.2:3306,10.0.0.3"
+        default_port: 未写端口时使用的默认端口
+
+    Returns:
+        list: [(host, port), ...]
+    """
+    endpoints = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(':')
+        endpoints.append((host, int(port) if port else default_port))
+    return endpoints
+
+
+class Replica:
+    """
+    单个只读副本
+    持有独立的连接池和健康状态
+    """
+
+    def __init__(self, host: str, port: int, pool: ConnectionPool):
+        self.host = host
+        self.port = port
+        self.pool = pool
+        self.evicted_until = 0.0
+        self.last_check = 0.0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        """副本名称"""
+        return f"{self.host}:{self.port}"
+
+    def is_healthy(self, now: float) -> bool:
+        """判断副本当前是否可用"""
+        return now >= self.evicted_until
+
+
+class ReplicaSet:
+    """
+    只读副本集合
+
+    - 轮询选择健康副本，副本全部不可用时返回None由调用方回退到主库
+    - 连接失败、查询时连接异常或复制延迟过大的副本会被剔除evict_seconds秒；
+      连接池已满只说明副本繁忙，跳过本次选择但不剔除
+    - 获取副本连接只等待checkout_timeout秒（且不超过请求剩余时间），繁忙时尽快换下一个副本或回退主库，
+      不会在一个副本上耗尽整个请求
+    - 每隔check_interval秒在取出连接时检查一次复制延迟（max_lag为0时不检查）
+    """
+
+    def __init__(self, pool_factory: Callable[[str, int], ConnectionPool],
+                 endpoints: List[tuple], evict_seconds: int = 30,
+                 max_lag: int = 0, check_interval: int = 10, checkout_timeout: float = 0.1):
+        """
+        初始化副本集合
+
+        Args:
+            pool_factory: 根据(host, port)创建连接池的函数
+            endpoints: 副本地址列表 [(host, port), ...]
+            evict_seconds: 不健康副本被剔除的时长（秒）
+            max_lag: 允许的最大复制延迟（秒），0表示不检查
+            check_interval: 复制延迟检查间隔（秒）
+            checkout_timeout: 副本连接池已满时等待空闲连接的最长时间（秒）
+        """
+        self.replicas = [Replica(host, port, pool_factory(host, port)) for host, port in endpoints]
+        self.evict_seconds = evict_seconds
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.checkout_timeout = checkout_timeout
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def connection(self) -> Optional[PooledConnection]:
+        """
+        从健康的副本中取出一个连接
+
+        Returns:
+            PooledConnection: 副本连接，没有可用副本时返回None
+
+        Raises:
+            DeadlineExceeded: 请求截止时间已过
+        """
+        for replica in self._candidates():
+            try:
+                conn = replica.pool.connection(timeout=deadline.checkout_timeout(self.checkout_timeout))
+            except PoolTimeoutError as e:
+                logger.warning(f"副本 {replica.name} 连接池繁忙，本次跳过: {str(e)}")
+                continue
+            except (pymysql.err.OperationalError, pymysql.err.InterfaceError, OSError) as e:
+                self.evict(replica, f"获取连接失败: {str(e)}")
+                continue
+
+            if not self._lag_ok(replica, conn):
+                conn.close()
+                continue
+            return conn
+        return None
+
+    def _candidates(self) -> List[Replica]:
+        """按轮询顺序返回当前健康的副本"""
+        now = time.monotonic()
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % max(len(self.replicas), 1)
+        ordered = self.replicas[start:] + self.replicas[:start]
+        return [r for r in ordered if r.is_healthy(now)]
+
+    def _lag_ok(self, replica: Replica, conn: PooledConnection) -> bool:
+        """
+        按间隔检查副本的复制延迟
+
+        Args:
+            replica: 副本
+            conn: 副本连接
+
+        Returns:
+            bool: 延迟是否在允许范围内
+        """
+        now = time.monotonic()
+        if self.max_lag <= 0 or now - replica.last_check < self.check_interval:
+            return True
+        replica.last_check = now
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SHOW REPLICA STATUS")
+                status = cursor.fetchone()
+        except Exception as e:
+            # 没有REPLICATION CLIENT权限等情况下无法检查延迟，不作为剔除依据
+            logger.warning(f"副本 {replica.name} 复制状态检查失败: {str(e)}")
+            return True
+
+        if not status:
+            return True
+        lag = status.get('Seconds_Behind_Source')
+        if lag is None or lag > self.max_lag:
+            self.evict(replica, f"复制延迟过大或复制已停止: lag={lag}")
+            return False
+        return True
+
+    def evict(self, replica: Replica, reason: str) -> None:
+        """
+        剔除不健康的副本
+
+        Args:
+            replica: 副本
+            reason: 剔除原因
+        """
+        with self._lock:
+            replica.evicted_until = time.monotonic() + self.evict_seconds
+            replica.failures += 1
+            replica.last_error = reason
+        logger.warning(f"只读副本 {replica.name} 已剔除{self.evict_seconds}秒: {reason}")
+
+    def evict_pool(self, pool: ConnectionPool, reason: str) -> None:
+        """
+        根据连接池剔除对应的副本（连接在查询中出错时使用）
+
+        Args:
+            pool: 出错连接所属的连接池
+            reason: 剔除原因
+        """
+        for replica in self.replicas:
+            if replica.pool is pool:
+                self.evict(replica, reason)
+                return
+
+    def owns(self, pool: ConnectionPool) -> bool:
+        """判断连接池是否属于某个副本"""
+        return any(replica.pool is pool for replica in self.replicas)
+
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        获取所有副本的状态
+
+        Returns:
+            list: 每个副本的健康状态和连接池统计
+        """
+        now = time.monotonic()
+        result = []
+        for replica in self.replicas:
+            item = replica.pool.status()
+            item.update({
+                'healthy': replica.is_healthy(now),
+                'evicted_for': max(round(replica.evicted_until - now, 1), 0),
+                'failures': replica.failures,
+                'last_error': replica.last_error
+            })
+            result.append(item)
+        return result
+
+    def close(self) -> None:
+        """关闭所有副本的连接池"""
+        for replica in self.replicas:
+            replica.pool.close()
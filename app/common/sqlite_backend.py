@@ -0,0 +1,582 @@
+"""
+SQLite内嵌数据库后端
+不需要数据库服务器即可运行全部服务，用于基准测试、CI和单机部署：
+- 首次使用时把migrations/init.sql翻译成SQLite方言建表
+- 连接和游标适配为PyMySQL的用法（字典行、%s占位符、mogrify）
+- 执行时把服务中用到的MySQL语法翻译为SQLite语法
+"""
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from app.config import config
+from app.common.logger import get_logger
+from app.common.backend import Backend
+
+logger = get_logger(__name__)
+
+# 建表脚本
+SCHEMA_FILE = Path(__file__).resolve().parent.parent.parent / 'migrations' / 'init.sql'
+
+# 对应MySQL NOW()/CURRENT_TIMESTAMP的本地时间表达式
+_NOW = "datetime('now','localtime')"
+
+# 字符串字面量和标识符（翻译时跳过其中的内容）
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`")
+
+# 运行时SQL的MySQL语法到SQLite语法的替换规则（只作用于字面量之外的部分）
+_RULES = [
+    (re.compile(r'\bNOW\(\)', re.IGNORECASE), _NOW),
+    (re.compile(r'\bINSERT\s+IGNORE\s+INTO\b', re.IGNORECASE), 'INSERT OR IGNORE INTO'),
+    (re.compile(r'\bUPDATE\s+IGNORE\b', re.IGNORECASE), 'UPDATE OR IGNORE'),
+    (re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.IGNORECASE), 'ON CONFLICT DO UPDATE SET'),
+    (re.compile(r'\s+(?:FOR\s+UPDATE|LOCK\s+IN\s+SHARE\s+MODE)\b', re.IGNORECASE), ''),
+    (re.compile(r'^(\s*)EXPLAIN\s+(?!QUERY\s+PLAN\b)', re.IGNORECASE), r'\1EXPLAIN QUERY PLAN '),
+]
+
+# ON DUPLICATE KEY UPDATE中的VALUES(col)对应SQLite的excluded.col
+_VALUES_REF_RE = re.compile(r'\bVALUES\s*\(\s*(`?\w+`?)\s*\)', re.IGNORECASE)
+
+# 带ON UPDATE CURRENT_TIMESTAMP的列：表名 -> 列名列表（由register_on_update_columns按建表脚本登记）
+_ON_UPDATE_COLUMNS: Dict[str, List[str]] = {}
+
+# CREATE TABLE语句的表名和列定义部分；列定义中的ON UPDATE CURRENT_TIMESTAMP
+_CREATE_TABLE_RE = re.compile(r'\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\((.*)\)[^)]*$',
+                              re.IGNORECASE | re.DOTALL)
+_ON_UPDATE_RE = re.compile(r'\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b', re.IGNORECASE)
+
+# UPDATE语句的表名（可带别名）和SET子句起点；upsert的更新子句起点
+_UPDATE_RE = re.compile(r'^\s*UPDATE\s+(?:OR\s+IGNORE\s+)?`?(\w+)`?(?:\s+(?:AS\s+)?(?!SET\b)\w+)?\s+SET\s',
+                        re.IGNORECASE)
+_INSERT_RE = re.compile(r'^\s*INSERT\s+(?:OR\s+\w+\s+)?INTO\s+`?(\w+)`?', re.IGNORECASE)
+_UPSERT_SET_RE = re.compile(r'\bDO\s+UPDATE\s+SET\s', re.IGNORECASE)
+# SET子句之后的关键字
+_SET_END_RE = re.compile(r'\b(?:WHERE|ORDER\s+BY|LIMIT|RETURNING)\b', re.IGNORECASE)
+
+# SQLite中单条语句的字节数上限（批量插入按此拆分）
+MAX_STATEMENT_BYTES = 16 * 1024 * 1024
+
+
+def _adapt_datetime(value: datetime) -> str:
+    """datetime参数按MySQL DATETIME格式存储"""
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _convert_datetime(value: bytes) -> datetime:
+    """DATETIME列读出为datetime，与PyMySQL一致"""
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+
+
+def _segments(sql: str) -> Iterator[Tuple[bool, str]]:
+    """
+    把SQL切分为字面量和非字面量片段
+
+    Yields:
+        (是否为字面量, 片段文本)
+    """
+    pos = 0
+    for match in _LITERAL_RE.finditer(sql):
+        if match.start() > pos:
+            yield False, sql[pos:match.start()]
+        yield True, match.group(0)
+        pos = match.end()
+    if pos < len(sql):
+        yield False, sql[pos:]
+
+
+def translate_sql(sql: str, placeholders: bool = True) -> str:
+    """
+    把MySQL语法的SQL翻译为SQLite语法
+
+    Args:
+        sql: SQL语句
+        placeholders: 是否把%s占位符转换为?（有参数时PyMySQL才处理%s和%%）
+
+    Returns:
+        str: SQLite语句
+    """
+    parts = []
+    for literal, text in _segments(sql):
+        if not literal:
+            if placeholders:
+                text = text.replace('%s', '?').replace('%%', '%')
+            for pattern, replacement in _RULES:
+                text = pattern.sub(replacement, text)
+        parts.append(text)
+    result = ''.join(parts)
+
+    upsert = result.upper().find('ON CONFLICT DO UPDATE SET')
+    if upsert >= 0:
+        result = result[:upsert] + _VALUES_REF_RE.sub(r'excluded.\1', result[upsert:])
+    return _apply_on_update(result)
+
+
+def _apply_on_update(sql: str) -> str:
+    """
+    模拟MySQL的ON UPDATE CURRENT_TIMESTAMP：UPDATE或upsert的SET子句没有给这些列赋值时，
+    在SET子句末尾追加 `列` = 当前时间；显式赋值（包括 update_time = update_time）时保持原样
+
+    Args:
+        sql: 已翻译为SQLite语法的语句
+
+    Returns:
+        str: 处理后的语句
+    """
+    if not _ON_UPDATE_COLUMNS:
+        return sql
+    match = _UPDATE_RE.match(sql)
+    if match:
+        table, start = match.group(1), match.end()
+    else:
+        match = _INSERT_RE.match(sql)
+        if not match or match.group(1) not in _ON_UPDATE_COLUMNS:
+            return sql
+        table, start = match.group(1), None
+    columns = _ON_UPDATE_COLUMNS.get(table)
+    if not columns:
+        return sql
+
+    # 字面量替换为等长的空格后再找子句边界，位置与原语句一致（反引号标识符也被替换，赋值的列名从原语句取）
+    masked = ''.join(' ' * len(text) if literal else text for literal, text in _segments(sql))
+    if start is None:
+        found = _UPSERT_SET_RE.search(masked)
+        if not found:
+            return sql
+        start = found.end()
+
+    # SET子句到顶层的WHERE/ORDER BY/LIMIT/RETURNING或语句末尾为止，按顶层逗号拆分赋值
+    depth = 0
+    end = len(sql)
+    commas = []
+    for i in range(start, len(masked)):
+        char = masked[i]
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif depth == 0 and char == ',':
+            commas.append(i)
+        elif (depth == 0 and char.isalpha() and not (masked[i - 1].isalnum() or masked[i - 1] == '_')
+              and _SET_END_RE.match(masked, i)):
+            end = i
+            break
+
+    assigned = set()
+    for lo, hi in zip([start] + [c + 1 for c in commas], commas + [end]):
+        target = sql[lo:hi].split('=', 1)[0].strip().split('.')[-1].strip('`"')
+        assigned.add(target.lower())
+    missing = [c for c in columns if c.lower() not in assigned]
+    if not missing:
+        return sql
+    clause = sql[start:end].rstrip()
+    tail = sql[start + len(clause):]
+    additions = ''.join(f", `{column}` = {_NOW}" for column in missing)
+    return sql[:start] + clause + additions + tail
+
+
+def _literal(value: Any) -> str:
+    """
+    把Python值转义为SQLite字面量
+
+    Args:
+        value: 参数值
+
+    Returns:
+        str: SQL字面量
+    """
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return f"X'{bytes(value).hex()}'"
+    if isinstance(value, datetime):
+        value = _adapt_datetime(value)
+    elif isinstance(value, date):
+        value = value.isoformat()
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class SQLiteCursor:
+    """
+    SQLite游标适配器
+    行以字典返回，接受%s占位符，提供mogrify
+    """
+
+    def __init__(self, connection: 'SQLiteConnection'):
+        self.connection = connection
+        self._cursor = connection._raw.cursor()
+        self._columns: Optional[List[str]] = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    @staticmethod
+    def _params(params: Any) -> Sequence[Any]:
+        """参数统一转为序列"""
+        if params is None:
+            return ()
+        if isinstance(params, (list, tuple)):
+            return params
+        return (params,)
+
+    def _finish(self) -> int:
+        """记录执行结果"""
+        description = self._cursor.description
+        self._columns = [d[0] for d in description] if description else None
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+        return self.rowcount
+
+    def execute(self, sql: str, params: Any = None) -> int:
+        """执行语句"""
+        self._cursor.execute(translate_sql(sql, params is not None), self._params(params))
+        return self._finish()
+
+    def executemany(self, sql: str, params_list: Any) -> int:
+        """批量执行语句"""
+        self._cursor.executemany(translate_sql(sql), [self._params(p) for p in params_list])
+        return self._finish()
+
+    def _row(self, row: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        """元组行转为字典"""
+        if row is None or self._columns is None:
+            return None
+        return dict(zip(self._columns, row))
+
+    def fetchone(self) -> Optional[Dict[str, Any]]:
+        return self._row(self._cursor.fetchone()) if self._columns else None
+
+    def fetchmany(self, size: Optional[int] = None) -> List[Dict[str, Any]]:
+        if not self._columns:
+            return []
+        rows = self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+        return [self._row(row) for row in rows]
+
+    def fetchall(self) -> List[Dict[str, Any]]:
+        if not self._columns:
+            return []
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def mogrify(self, sql: str, params: Any = None) -> str:
+        """
+        用参数替换%s占位符，返回完整SQL
+
+        Args:
+            sql: 含%s占位符的SQL
+            params: 参数
+
+        Returns:
+            str: 完整SQL
+        """
+        if params is None:
+            return sql
+        values = iter(self._params(params))
+        parts = []
+        for literal, text in _segments(sql):
+            if not literal:
+                pieces = text.split('%s')
+                text = pieces[0] + ''.join(_literal(next(values)) + piece for piece in pieces[1:])
+                text = text.replace('%%', '%')
+            parts.append(text)
+        return ''.join(parts)
+
+    def close(self) -> None:
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    SQLite连接适配器
+    提供连接池需要的cursor/commit/rollback/ping/close
+    """
+
+    def __init__(self, raw: sqlite3.Connection):
+        self._raw = raw
+
+    def cursor(self, cursor_class=None) -> SQLiteCursor:
+        """创建游标（SQLite游标本身按需读取，流式游标类参数被忽略）"""
+        return SQLiteCursor(self)
+
+    def commit(self) -> None:
+        self._raw.commit()
+
+    def rollback(self) -> None:
+        self._raw.rollback()
+
+    def ping(self, reconnect: bool = False) -> None:
+        self._raw.execute('SELECT 1')
+
+    def close(self) -> None:
+        self._raw.close()
+
+
+def _split_statements(script: str) -> List[str]:
+    """
+    按分号拆分SQL脚本，去掉--注释（跳过字符串中的内容）
+
+    Args:
+        script: SQL脚本
+
+    Returns:
+        list: 语句列表
+    """
+    statements = []
+    current = []
+    quote = None
+    i = 0
+    while i < len(script):
+        ch = script[i]
+        if quote:
+            current.append(ch)
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"', '`'):
+            quote = ch
+            current.append(ch)
+        elif script.startswith('--', i):
+            end = script.find('\n', i)
+            i = len(script) if end < 0 else end
+            continue
+        elif ch == ';':
+            statements.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    statements.append(''.join(current).strip())
+    return [s for s in statements if s]
+
+
+def _split_definitions(body: str) -> List[str]:
+    """按顶层逗号拆分CREATE TABLE括号内的定义"""
+    parts = []
+    current = []
+    depth = 0
+    for literal, text in _segments(body):
+        if literal:
+            current.append(text)
+            continue
+        for ch in text:
+            if ch == '(':
+                depth += 1
+            elif ch == ')':
+                depth -= 1
+            elif ch == ',' and depth == 0:
+                parts.append(''.join(current).strip())
+                current = []
+                continue
+            current.append(ch)
+    parts.append(''.join(current).strip())
+    return [p for p in parts if p]
+
+
+def _translate_create_table(statement: str) -> List[str]:
+    """
+    翻译MySQL的CREATE TABLE语句
+
+    - BIGINT UNSIGNED AUTO_INCREMENT主键改为INTEGER PRIMARY KEY AUTOINCREMENT
+    - UNIQUE KEY改为表级UNIQUE约束，KEY改为独立的CREATE INDEX（索引名加表名前缀避免重名）
+    - 去掉ON UPDATE CURRENT_TIMESTAMP（执行UPDATE时由translate_sql按登记的列补上赋值）
+    - 去掉COMMENT、UNSIGNED和表选项
+
+    Args:
+        statement: CREATE TABLE语句
+
+    Returns:
+        list: SQLite语句列表
+    """
+    match = _CREATE_TABLE_RE.match(statement)
+    table, body = match.group(1), match.group(2)
+
+    columns, constraints, extra = [], [], []
+    primary_key = None
+    auto_column = None
+    for part in _split_definitions(body):
+        upper = part.upper()
+        if upper.startswith('PRIMARY KEY'):
+            primary_key = part
+        elif upper.startswith(('UNIQUE KEY', 'UNIQUE INDEX')):
+            constraints.append('UNIQUE ' + part[part.index('('):])
+        elif upper.startswith(('KEY ', 'INDEX ')):
+            key = re.match(r'(?:KEY|INDEX)\s+`?(\w+)`?\s*(\(.*\))', part, re.IGNORECASE)
+            extra.append(f"CREATE INDEX IF NOT EXISTS `{table}_{key.group(1)}` ON `{table}` {key.group(2)}")
+        else:
+            name = part.split()[0].strip('`')
+            part = re.sub(r"\s+COMMENT\s+'(?:[^']|'')*'", '', part, flags=re.IGNORECASE)
+            part = re.sub(r'\s+UNSIGNED\b', '', part, flags=re.IGNORECASE)
+            part = _ON_UPDATE_RE.sub('', part)
+            part = re.sub(r'\bDEFAULT\s+CURRENT_TIMESTAMP\b', f'DEFAULT ({_NOW})', part, flags=re.IGNORECASE)
+            if re.search(r'\bAUTO_INCREMENT\b', part, re.IGNORECASE):
+                auto_column = name
+                part = f"`{name}` INTEGER PRIMARY KEY AUTOINCREMENT"
+            columns.append(part)
+
+    if primary_key and not (auto_column and re.search(rf'\(\s*`?{auto_column}`?\s*\)', primary_key)):
+        constraints.append(primary_key)
+
+    statements = [f"CREATE TABLE IF NOT EXISTS `{table}` (\n    "
+                  + ',\n    '.join(columns + constraints) + "\n)"]
+    statements.extend(extra)
+    return statements
+
+
+def register_on_update_columns(script: str) -> None:
+    """
+    登记建表脚本中带ON UPDATE CURRENT_TIMESTAMP的列，供translate_sql在UPDATE时补上赋值
+    新建和已有的数据库都需要在使用前登记
+
+    Args:
+        script: MySQL建表脚本（如migrations/init.sql）
+    """
+    for statement in _split_statements(script):
+        match = _CREATE_TABLE_RE.match(statement)
+        if match:
+            _ON_UPDATE_COLUMNS[match.group(1)] = [
+                part.split()[0].strip('`') for part in _split_definitions(match.group(2))
+                if _ON_UPDATE_RE.search(part)
+            ]
+
+
+def translate_schema(script: str) -> List[str]:
+    """
+    把MySQL建表脚本翻译为SQLite语句
+
+    Args:
+        script: MySQL建表脚本（如migrations/init.sql）
+
+    Returns:
+        list: SQLite语句列表
+    """
+    statements = []
+    for statement in _split_statements(script):
+        upper = statement.upper()
+        if upper.startswith(('CREATE DATABASE', 'USE ')):
+            continue
+        if upper.startswith('CREATE TABLE'):
+            statements.extend(_translate_create_table(statement))
+        elif re.match(r'CREATE\s+(UNIQUE\s+)?INDEX\s+(?!IF\s)', upper):
+            statements.append(re.sub(r'\bINDEX\s+', 'INDEX IF NOT EXISTS ', statement, count=1, flags=re.IGNORECASE))
+        else:
+            statements.append(translate_sql(statement, placeholders=False))
+    return statements
+
+
+class SQLiteBackend(Backend):
+    """
+    SQLite后端
+
+    - 数据库文件不存在表结构时按migrations/init.sql建表
+    - 使用WAL模式，读写可以并发；写写冲突等待连接池超时时间，超时视为锁等待超时可重试
+    - path为:memory:时在临时目录中建库，关闭后删除（多个连接需要共享同一个库）
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str = ':memory:'):
+        """
+        初始化SQLite后端
+
+        Args:
+            path: 数据库文件路径（相对路径基于项目根目录），:memory:表示临时库
+        """
+        self.path = path
+        self.file: Optional[str] = None
+        self._temp_dir: Optional[str] = None
+
+    def prepare(self) -> None:
+        if self.file is not None:
+            return
+        if self.path == ':memory:':
+            self._temp_dir = tempfile.mkdtemp(prefix='prompt_db_')
+            self.file = os.path.join(self._temp_dir, 'prompt_db.sqlite3')
+        else:
+            path = Path(self.path)
+            if not path.is_absolute():
+                path = config.BASE_DIR / path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.file = str(path)
+
+        raw = self._open()
+        try:
+            exists = raw.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'prompts'"
+            ).fetchone()
+            if not exists:
+                self.load_schema(raw)
+        finally:
+            raw.close()
+        register_on_update_columns(SCHEMA_FILE.read_text(encoding='utf-8'))
+
+    def _open(self) -> sqlite3.Connection:
+        """打开底层SQLite连接"""
+        raw = sqlite3.connect(
+            self.file,
+            timeout=config.DB_POOL_TIMEOUT,            # 写锁等待时间
+            detect_types=sqlite3.PARSE_DECLTYPES,       # DATETIME列转换为datetime
+            check_same_thread=False                     # 连接池中的连接会在不同线程间传递
+        )
+        raw.execute('PRAGMA journal_mode=WAL')
+        return raw
+
+    @staticmethod
+    def load_schema(raw: sqlite3.Connection, schema_file: Path = SCHEMA_FILE) -> None:
+        """
+        执行翻译后的建表脚本
+
+        Args:
+            raw: SQLite连接
+            schema_file: MySQL建表脚本路径
+        """
+        script = schema_file.read_text(encoding='utf-8')
+        for statement in translate_schema(script):
+            raw.execute(statement)
+        raw.commit()
+        logger.info(f"SQLite数据库已按 {schema_file.name} 建表")
+
+    def connect(self, host: Optional[str] = None, port: Optional[int] = None) -> SQLiteConnection:
+        if self.file is None:
+            self.prepare()
+        return SQLiteConnection(self._open())
+
+    def describe(self) -> str:
+        return f"sqlite:///{self.file or self.path}"
+
+    def retry_reason(self, e: BaseException) -> Optional[str]:
+        if isinstance(e, sqlite3.OperationalError) and 'locked' in str(e):
+            return 'lock_timeouts'
+        return None
+
+    def max_statement_bytes(self, cursor) -> int:
+        return MAX_STATEMENT_BYTES
+
+    def close(self) -> None:
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+            self.file = None
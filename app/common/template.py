@@ -0,0 +1,98 @@
+"""
+Prompt模板渲染模块
+把含{{变量}}的模板编译成渲染计划：字面量中的花括号转义后与按位置编号的占位符拼成str.format格式串，
+渲染一行变量只需查找变量值并调用一次format，不再重新解析模板
+
+- 变量语法为{{name}}、{{ name }}、{{doc.title}}，内容分析也使用同一个正则提取变量
+- 带点的变量名先按完整名称查找，找不到时按路径逐级查找嵌套对象
+- 变量值只接受字符串和数字，缺少、类型不对的变量和（严格模式下）多余的变量会报告为错误
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# {{变量名}}：变量名以字母、汉字或下划线开头，括号内允许空格但不跨行
+VARIABLE_RE = re.compile(r'\{\{[ \t]*([^\W\d]\w*(?:\.\w+)*)[ \t]*\}\}')
+
+_MISSING = object()
+
+
+class RenderPlan:
+    """
+    编译后的模板
+    编译后不再修改，可以在多个线程间共享
+    """
+
+    __slots__ = ('format_string', 'variables', '_lookups', '_roots')
+
+    def __init__(self, format_string: str, variables: List[str]):
+        self.format_string = format_string
+        self.variables = variables
+        # (变量名, 路径)：不带点的变量路径为None
+        self._lookups = [(name, tuple(name.split('.')) if '.' in name else None) for name in variables]
+        self._roots = {name.split('.', 1)[0] for name in variables} | set(variables)
+
+    def _lookup(self, row: Dict[str, Any], name: str, path: Optional[Tuple[str, ...]]) -> Any:
+        """查找变量值，找不到时返回_MISSING"""
+        value = row.get(name, _MISSING)
+        if value is _MISSING and path is not None:
+            value = row
+            for key in path:
+                if not isinstance(value, dict) or key not in value:
+                    return _MISSING
+                value = value[key]
+        return value
+
+    def render(self, row: Any, strict: bool = False) -> Dict[str, Any]:
+        """
+        用一行变量渲染模板
+
+        Args:
+            row: 变量名 -> 值
+            strict: 为True时，模板中没有的变量也报告为错误
+
+        Returns:
+            dict: 成功时为 {'success': True, 'text': 渲染结果}，
+                  失败时为 {'success': False, 'error', 'missing', 'invalid', 'unknown'}
+        """
+        if not isinstance(row, dict):
+            return {'success': False, 'error': '变量必须是JSON对象', 'missing': [], 'invalid': [], 'unknown': []}
+
+        values = []
+        missing = []
+        invalid = []
+        for name, path in self._lookups:
+            value = self._lookup(row, name, path)
+            if type(value) is str:
+                values.append(value)
+            elif value is _MISSING or value is None:
+                missing.append(name)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                values.append(str(value))
+            else:
+                invalid.append(name)
+        unknown = [key for key in row if key not in self._roots] if strict else []
+
+        if missing or invalid or unknown:
+            return {'success': False, 'error': '变量校验失败', 'missing': missing, 'invalid': invalid, 'unknown': unknown}
+        return {'success': True, 'text': self.format_string.format(*values)}
+
+
+def compile_template(template: str) -> RenderPlan:
+    """
+    编译模板
+
+    Args:
+        template: 含{{变量}}的模板
+
+    Returns:
+        RenderPlan: 渲染计划，variables为按首次出现顺序排列的变量名
+    """
+    indexes: Dict[str, int] = {}
+    parts: List[str] = []
+    position = 0
+    for match in VARIABLE_RE.finditer(template):
+        parts.append(template[position:match.start()].replace('{', '{{').replace('}', '}}'))
+        parts.append('{%d}' % indexes.setdefault(match.group(1), len(indexes)))
+        position = match.end()
+    parts.append(template[position:].replace('{', '{{').replace('}', '}}'))
+    return RenderPlan(''.join(parts), list(indexes))
@@ -0,0 +1,253 @@
+"""
+文本比较模块
+用Myers差异算法（线性空间的中间蛇分治）比较两个版本，先按行比较，再对被替换的行逐字符比较，
+用于在服务端计算版本差异，浏览器不必下载两个版本的完整内容
+
+- 空间与输入长度成线性关系，分治用显式栈代替递归，大文本不会超出递归深度
+- 支持时间预算：超时后剩余的区域整体作为删除+插入，结果仍然正确但不一定最短
+"""
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# (tag, i1, i2, j1, j2)，tag为equal/delete/insert/replace，与difflib的opcodes相同
+Opcode = Tuple[str, int, int, int, int]
+
+
+def _common_prefix(a: Sequence, b: Sequence, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> int:
+    """两个区间的公共前缀长度"""
+    n = 0
+    while a_lo + n < a_hi and b_lo + n < b_hi and a[a_lo + n] == b[b_lo + n]:
+        n += 1
+    return n
+
+
+def _common_suffix(a: Sequence, b: Sequence, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> int:
+    """两个区间的公共后缀长度"""
+    n = 0
+    while a_hi - n > a_lo and b_hi - n > b_lo and a[a_hi - n - 1] == b[b_hi - n - 1]:
+        n += 1
+    return n
+
+
+def _bisect(a: Sequence, b: Sequence, a_lo: int, a_hi: int, b_lo: int, b_hi: int,
+            deadline: Optional[float]) -> Optional[Tuple[int, int]]:
+    """
+    从两端同时搜索编辑路径，找到中间蛇的位置（相对区间起点的偏移）
+
+    Returns:
+        tuple: 分割点 (x, y)，超时或没有公共元素时返回None
+    """
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    max_d = (n + m + 1) // 2
+    offset = max_d
+    v_length = 2 * max_d + 2
+    v1 = [-1] * v_length
+    v2 = [-1] * v_length
+    v1[offset + 1] = 0
+    v2[offset + 1] = 0
+    delta = n - m
+    # 差值为奇数时在正向搜索中检查重叠，否则在反向搜索中检查
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+
+    for d in range(max_d):
+        if deadline is not None and time.monotonic() > deadline:
+            return None
+
+        # 正向搜索
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = offset + k1
+            if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                x1 = v1[k1_offset + 1]
+            else:
+                x1 = v1[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a_lo + x1] == b[b_lo + y1]:
+                x1 += 1
+                y1 += 1
+            v1[k1_offset] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                k2_offset = offset + delta - k1
+                if 0 <= k2_offset < v_length and v2[k2_offset] != -1:
+                    if x1 >= n - v2[k2_offset]:
+                        return x1, y1
+
+        # 反向搜索
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = offset + k2
+            if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                x2 = v2[k2_offset + 1]
+            else:
+                x2 = v2[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a_hi - 1 - x2] == b[b_hi - 1 - y2]:
+                x2 += 1
+                y2 += 1
+            v2[k2_offset] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                k1_offset = offset + delta - k2
+                if 0 <= k1_offset < v_length and v1[k1_offset] != -1:
+                    x1 = v1[k1_offset]
+                    y1 = offset + x1 - k1_offset
+                    if x1 >= n - x2:
+                        return x1, y1
+    return None
+
+
+def diff_sequences(a: Sequence, b: Sequence,
+                   deadline: Optional[float] = None) -> Tuple[List[Opcode], bool]:
+    """
+    比较两个序列（元素需可比较相等）
+
+    Args:
+        a: 原序列
+        b: 新序列
+        deadline: 截止时间（time.monotonic()），None表示不限制
+
+    Returns:
+        tuple: (opcodes, 是否在时间预算内完成)
+    """
+    # 相同的片段 (a起点, b起点, 长度)
+    matches: List[Tuple[int, int, int]] = []
+    complete = True
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+        prefix = _common_prefix(a, b, a_lo, a_hi, b_lo, b_hi)
+        if prefix:
+            matches.append((a_lo, b_lo, prefix))
+            a_lo += prefix
+            b_lo += prefix
+        suffix = _common_suffix(a, b, a_lo, a_hi, b_lo, b_hi)
+        if suffix:
+            matches.append((a_hi - suffix, b_hi - suffix, suffix))
+            a_hi -= suffix
+            b_hi -= suffix
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+
+        split = _bisect(a, b, a_lo, a_hi, b_lo, b_hi, deadline)
+        if split is None:
+            if deadline is not None and time.monotonic() > deadline:
+                complete = False
+            continue
+        x, y = split
+        if (x, y) in ((0, 0), (a_hi - a_lo, b_hi - b_lo)):
+            continue
+        stack.append((a_lo + x, a_hi, b_lo + y, b_hi))
+        stack.append((a_lo, a_lo + x, b_lo, b_lo + y))
+
+    matches.sort()
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for a_start, b_start, length in matches + [(len(a), len(b), 0)]:
+        if i < a_start and j < b_start:
+            opcodes.append(('replace', i, a_start, j, b_start))
+        elif i < a_start:
+            opcodes.append(('delete', i, a_start, j, j))
+        elif j < b_start:
+            opcodes.append(('insert', i, i, j, b_start))
+        if length:
+            if opcodes and opcodes[-1][0] == 'equal':
+                opcodes[-1] = ('equal', opcodes[-1][1], a_start + length, opcodes[-1][3], b_start + length)
+            else:
+                opcodes.append(('equal', a_start, a_start + length, b_start, b_start + length))
+        i = a_start + length
+        j = b_start + length
+    return opcodes, complete
+
+
+def _char_ops(old: str, new: str, deadline: Optional[float]) -> Tuple[List[List[str]], bool]:
+    """逐字符比较一个被替换的块，返回 [['=', 文本] / ['-', 文本] / ['+', 文本]]"""
+    opcodes, complete = diff_sequences(old, new, deadline)
+    ops: List[List[str]] = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            ops.append(['=', old[i1:i2]])
+            continue
+        if i2 > i1:
+            ops.append(['-', old[i1:i2]])
+        if j2 > j1:
+            ops.append(['+', new[j1:j2]])
+    return ops, complete
+
+
+def diff_text(old: str, new: str, timeout_ms: Optional[int] = None,
+              context: Optional[int] = None) -> Dict[str, Any]:
+    """
+    比较两段文本：按行比较，被替换的行块再逐字符比较
+
+    Args:
+        old: 原文本
+        new: 新文本
+        timeout_ms: 时间预算（毫秒），None或0表示不限制
+        context: 相同行块只保留前后各context行，其余折叠为skip；None表示全部返回
+
+    Returns:
+        dict: ops为差异列表，每项为
+              {'op': 'equal'/'delete'/'insert', 'text': 文本}、
+              {'op': 'replace', 'old': 文本, 'new': 文本, 'chars': 逐字符差异}或
+              {'op': 'skip', 'lines': 折叠的行数}；
+              stats为增删的行数和字符数；complete表示是否在时间预算内完成
+    """
+    started = time.monotonic()
+    deadline = started + timeout_ms / 1000 if timeout_ms else None
+
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    # 行映射为整数后比较，相等判断不再逐字符比较整行
+    ids: Dict[str, int] = {}
+    a = [ids.setdefault(line, len(ids)) for line in old_lines]
+    b = [ids.setdefault(line, len(ids)) for line in new_lines]
+    opcodes, complete = diff_sequences(a, b, deadline)
+
+    ops: List[Dict[str, Any]] = []
+    stats = {'lines_added': 0, 'lines_removed': 0, 'chars_added': 0, 'chars_removed': 0}
+    last = len(opcodes) - 1
+    for index, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+        if tag == 'equal':
+            lines = old_lines[i1:i2]
+            head = 0 if index == 0 else context
+            tail = 0 if index == last else context
+            if context is not None and len(lines) > head + tail:
+                if head:
+                    ops.append({'op': 'equal', 'text': ''.join(lines[:head])})
+                ops.append({'op': 'skip', 'lines': len(lines) - head - tail})
+                if tail:
+                    ops.append({'op': 'equal', 'text': ''.join(lines[len(lines) - tail:])})
+            else:
+                ops.append({'op': 'equal', 'text': ''.join(lines)})
+            continue
+
+        removed = ''.join(old_lines[i1:i2])
+        added = ''.join(new_lines[j1:j2])
+        stats['lines_removed'] += i2 - i1
+        stats['lines_added'] += j2 - j1
+        if tag == 'delete':
+            stats['chars_removed'] += len(removed)
+            ops.append({'op': 'delete', 'text': removed})
+        elif tag == 'insert':
+            stats['chars_added'] += len(added)
+            ops.append({'op': 'insert', 'text': added})
+        else:
+            chars, chars_complete = _char_ops(removed, added, deadline)
+            complete = complete and chars_complete
+            stats['chars_removed'] += sum(len(text) for op, text in chars if op == '-')
+            stats['chars_added'] += sum(len(text) for op, text in chars if op == '+')
+            ops.append({'op': 'replace', 'old': removed, 'new': added, 'chars': chars})
+
+    return {
+        'ops': ops,
+        'stats': stats,
+        'complete': complete,
+        'elapsed_ms': round((time.monotonic() - started) * 1000, 1)
+    }
@@ -45,11 +45,38 @@ class Config:
         self.DB_NAME = os.getenv('DB_NAME', 'prompt_db')
         self.DB_CHARSET = os.getenv('DB_CHARSET', 'utf8mb4')
         
+        # 数据库后端（mysql/sqlite）。sqlite为内嵌数据库，用于基准测试和单机部署，
+        # 首次使用时按migrations/init.sql建表；DB_SQLITE_PATH为:memory:时使用关闭后即删除的临时库
+        self.DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')
+        self.DB_SQLITE_PATH = os.getenv('DB_SQLITE_PATH', 'data/prompt_db.sqlite3')
+        
         # 数据库连接池配置
         self.DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
         self.DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 3600))
         self.DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
         self.DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+        self.DB_POOL_PING_INTERVAL = int(os.getenv('DB_POOL_PING_INTERVAL', 30))
+        
+        # 只读副本配置（逗号分隔的host:port列表，为空时读写都走主库）
+        self.DB_REPLICAS = os.getenv('DB_REPLICAS', '')
+        self.DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))  # 写操作后会话读主库的时长
+        self.DB_REPLICA_EVICT_SECONDS = int(os.getenv('DB_REPLICA_EVICT_SECONDS', 30))  # 不健康副本的剔除时长
+        self.DB_REPLICA_MAX_LAG = int(os.getenv('DB_REPLICA_MAX_LAG', 0))  # 允许的最大复制延迟，0表示不检查
+        self.DB_REPLICA_CHECK_INTERVAL = int(os.getenv('DB_REPLICA_CHECK_INTERVAL', 10))  # 复制延迟检查间隔
+        self.DB_REPLICA_CHECKOUT_TIMEOUT = float(os.getenv('DB_REPLICA_CHECKOUT_TIMEOUT', 0.1))  # 副本连接池已满时的等待时间（秒）
+        
+        # 流式查询与批量写入配置
+        self.DB_STREAM_FETCH_SIZE = int(os.getenv('DB_STREAM_FETCH_SIZE', 500))  # 流式查询每次从网络读取的行数
+        self.DB_BULK_MAX_ROWS = int(os.getenv('DB_BULK_MAX_ROWS', 1000))  # 批量插入每条语句最多行数
+        self.DB_BULK_MAX_PACKET = int(os.getenv('DB_BULK_MAX_PACKET', 0))  # 批量插入语句最大字节数，0表示按服务端max_allowed_packet
+        
+        # 事务重试配置（死锁1213、锁等待超时1205）
+        self.DB_TX_MAX_RETRIES = int(os.getenv('DB_TX_MAX_RETRIES', 3))  # 最多重试次数，0表示不重试
+        self.DB_TX_RETRY_BACKOFF_MS = int(os.getenv('DB_TX_RETRY_BACKOFF_MS', 50))  # 首次重试的退避基数（毫秒），之后按指数增长
+        self.DB_TX_RETRY_MAX_BACKOFF_MS = int(os.getenv('DB_TX_RETRY_MAX_BACKOFF_MS', 1000))  # 单次退避上限（毫秒）
+        
+        # 请求截止时间（秒），传递到每条SQL，0表示不限制；路由可用@request_deadline单独指定
+        self.REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', 30))
         
         # 构建数据库URI
         self.DATABASE_URI = self._build_database_uri()
@@ -60,6 +87,12 @@ class Config:
         self.LOG_MAX_SIZE = int(os.getenv('LOG_MAX_SIZE', 100)) * 1024 * 1024  # 转换为字节
         self.LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', 30))
         
+        # SQL执行统计与慢查询日志
+        self.QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', 'True').lower() == 'true'
+        self.SLOW_QUERY_THRESHOLD_MS = int(os.getenv('SLOW_QUERY_THRESHOLD_MS', 500))
+        self.SLOW_QUERY_LOG_PER_MINUTE = int(os.getenv('SLOW_QUERY_LOG_PER_MINUTE', 60))
+        self.SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'True').lower() == 'true'
+        
         # 确保日志目录存在
         self.LOG_DIR.mkdir(parents=True, exist_ok=True)
         (self.LOG_DIR / 'error').mkdir(exist_ok=True)
@@ -92,6 +125,48 @@ class Config:
         self.REDIS_DB = int(os.getenv('REDIS_DB', 0))
         self.CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', 300))
         
+        # 进程内查询结果缓存（按表标签在写入时失效）
+        self.QUERY_CACHE_ENABLED = os.getenv('QUERY_CACHE_ENABLED', 'True').lower() == 'true'
+        self.QUERY_CACHE_TTL = int(os.getenv('QUERY_CACHE_TTL', 30))
+        self.QUERY_CACHE_MAX_MB = int(os.getenv('QUERY_CACHE_MAX_MB', 64))
+        self.QUERY_CACHE_MULTI_WORKER_TTL = int(os.getenv('QUERY_CACHE_MULTI_WORKER_TTL', 2))  # WORKERS大于1时的有效期上限（秒）
+        
+        # 对象缓存（Prompt详情等读多写少的数据）：local为进程内缓存，redis为多进程共享缓存
+        self.CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'local')
+        self.CACHE_LOCAL_TTL = int(os.getenv('CACHE_LOCAL_TTL', 5))  # 使用redis时进程内一级缓存的有效期（秒）
+        self.CACHE_LOCAL_MAX_ENTRIES = int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', 10000))  # 进程内缓存最多条目数
+        self.CACHE_LOCK_TIMEOUT_MS = int(os.getenv('CACHE_LOCK_TIMEOUT_MS', 3000))  # 防击穿加载锁的有效期（毫秒）
+        self.PROMPT_CACHE_ENABLED = os.getenv('PROMPT_CACHE_ENABLED', 'True').lower() == 'true'
+        
+        # ============== Prompt版本存储配置 ==============
+        # 历史版本保存为相对上一版本的差量，每隔若干版本保存一次完整快照（当前版本始终完整保存）
+        self.VERSION_DELTA_ENABLED = os.getenv('VERSION_DELTA_ENABLED', 'True').lower() == 'true'
+        self.VERSION_MAX_DELTA_CHAIN = int(os.getenv('VERSION_MAX_DELTA_CHAIN', 10))  # 还原一个版本最多应用的差量数
+        # 超过阈值的完整内容用zlib压缩保存，读取时在服务层解压
+        self.CONTENT_COMPRESS_MIN_BYTES = int(os.getenv('CONTENT_COMPRESS_MIN_BYTES', 4096))  # 0表示不压缩
+        self.CONTENT_COMPRESS_LEVEL = int(os.getenv('CONTENT_COMPRESS_LEVEL', 1))
+        self.CONTENT_COMPRESSED_RESPONSES = os.getenv('CONTENT_COMPRESSED_RESPONSES', 'True').lower() == 'true'  # 客户端支持deflate时直接发送压缩内容
+        
+        # ============== 版本比较配置 ==============
+        self.DIFF_TIMEOUT_MS = int(os.getenv('DIFF_TIMEOUT_MS', 1000))  # 单次比较的时间预算，超时后剩余部分整体作为删除+插入
+        self.DIFF_CACHE_ENABLED = os.getenv('DIFF_CACHE_ENABLED', 'True').lower() == 'true'  # 按版本ID对缓存比较结果
+        
+        # ============== 内容分析配置 ==============
+        self.ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', 1024))  # 按内容哈希缓存的分析结果数
+        self.ANALYSIS_MAX_CHARS = int(os.getenv('ANALYSIS_MAX_CHARS', 200000))  # 单次分析的最大字符数
+        self.ANALYSIS_SESSION_TTL = int(os.getenv('ANALYSIS_SESSION_TTL', 600))  # 增量分析会话状态的保留秒数
+        self.ANALYSIS_SESSION_MAX = int(os.getenv('ANALYSIS_SESSION_MAX', 1000))  # 进程内保留的最大会话数
+        
+        # ============== 模板渲染配置 ==============
+        self.RENDER_PLAN_CACHE_SIZE = int(os.getenv('RENDER_PLAN_CACHE_SIZE', 512))  # 进程内缓存的版本渲染计划数
+        self.RENDER_MAX_BATCH_ROWS = int(os.getenv('RENDER_MAX_BATCH_ROWS', 10000))  # 批量渲染每次请求的最大行数
+        
+        # ============== 批量导入配置 ==============
+        self.IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 200))  # 每个事务写入的Prompt数
+        self.IMPORT_MAX_BATCH_SIZE = int(os.getenv('IMPORT_MAX_BATCH_SIZE', 1000))  # 请求可指定的最大批大小
+        self.IMPORT_MAX_LINE_BYTES = int(os.getenv('IMPORT_MAX_LINE_BYTES', 1048576))  # 单行（单条Prompt）最大字节数
+        self.IMPORT_DEADLINE_SECONDS = float(os.getenv('IMPORT_DEADLINE_SECONDS', 0))  # 导入请求的截止时间，0表示不限制
+        
         # ============== 安全配置 ==============
         self.CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
         self.SESSION_TIMEOUT = int(os.getenv('SESSION_TIMEOUT', 3600))
@@ -100,6 +175,7 @@ class Config:
         # ============== 其他配置 ==============
         self.TIMEZONE = os.getenv('TIMEZONE', 'Asia/Shanghai')
         self.PAGE_SIZE = int(os.getenv('PAGE_SIZE', 20))
+        self.PAGE_TOTAL_CACHE_TTL = int(os.getenv('PAGE_TOTAL_CACHE_TTL', 60))  # 分页总数缓存时间（秒）
         self.MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 10)) * 1024 * 1024  # 转换为字节
     
     def _build_database_uri(self) -> str:
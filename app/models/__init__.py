@@ -1,13 +1,14 @@
 """
 数据模型包初始化
 """
-from .prompt import Prompt, PromptVersion, PromptTag
+from .prompt import Prompt, PromptVersion, PromptTag, Tag
 from .workspace import Workspace, WorkspaceMember
 
 __all__ = [
     'Prompt',
     'PromptVersion', 
     'PromptTag',
+    'Tag',
     'Workspace',
     'WorkspaceMember'
 ]
\ No newline at end of file
@@ -20,6 +20,9 @@ class Prompt(BaseModel):
         self.category: str = 'general'
         self.user_id: Optional[int] = None
         self.workspace_id: Optional[int] = None
+        self.current_version_id: Optional[int] = None
+        self.version_major: int = 1
+        self.version_minor: int = 0
         self.status: int = 1  # 0:删除 1:正常
         self.create_time: Optional[datetime] = None
         self.update_time: Optional[datetime] = None
@@ -63,7 +66,6 @@ class PromptVersion(BaseModel):
         self.content: Optional[str] = None
         self.variables_json: Optional[str] = None
         self.change_log: Optional[str] = None
-        self.is_current: int = 0
         self.published_at: Optional[datetime] = None
         self.author_id: Optional[int] = None
         self.create_time: Optional[datetime] = None
@@ -158,13 +160,24 @@ class PromptVersion(BaseModel):
         return True, None
 
 
+class Tag(BaseModel):
+    """
+    标签字典模型
+    """
+    
+    def __init__(self):
+        self.id: Optional[int] = None
+        self.name: Optional[str] = None
+        self.create_time: Optional[datetime] = None
+
+
 class PromptTag(BaseModel):
     """
-    Prompt标签模型
+    Prompt标签关联模型
     """
     
     def __init__(self):
         self.id: Optional[int] = None
         self.prompt_id: Optional[int] = None
-        self.tag_name: Optional[str] = None
+        self.tag_id: Optional[int] = None
         self.create_time: Optional[datetime] = None
\ No newline at end of file
@@ -21,7 +21,11 @@ def register_blueprints(app: Flask):
     # 导入并注册Prompt编辑器路由
     from app.routes.prompt_editor import prompt_editor_bp
     app.register_blueprint(prompt_editor_bp)
-    
+
+    # 导入并注册系统运行状态路由
+    from app.routes.system import system_bp
+    app.register_blueprint(system_bp)
+
     # TODO: 后续添加其他路由
     # from app.routes.auth import auth_bp
     # from app.routes.templates import templates_bp
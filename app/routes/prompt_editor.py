@@ -2,9 +2,18 @@
 Prompt编辑器路由模块
 处理Prompt编辑页面相关的所有HTTP请求
 """
-from flask import Blueprint, render_template, request, jsonify, session
+import json
+import hashlib
+from flask import Blueprint, Response, render_template, request, jsonify, session, stream_with_context
+from app.config import config
 from app.common.logger import get_logger
+from app.common.pagination import InvalidCursorError
+from app.common.deadline import request_deadline
 from app.services.prompt_service import PromptService
+from app.services.prompt_import_service import PromptImportService
+from app.services.prompt_render_service import PromptRenderService
+from app.services.content_analyzer import AnalysisStateError
+from app.services.workspace_service import WorkspaceService
 from functools import wraps
 
 logger = get_logger(__name__)
@@ -12,6 +21,12 @@ logger = get_logger(__name__)
 # 创建蓝图
 prompt_editor_bp = Blueprint('prompt_editor', __name__, url_prefix='/prompt')
 
+# 批量获取接口单次最多请求的Prompt数量
+MAX_BATCH_IDS = 100
+
+# 版本历史每页最多返回的版本数
+MAX_VERSION_PAGE_SIZE = 100
+
 
 def login_required(f):
     """
@@ -89,6 +104,51 @@ def create_prompt():
         return jsonify({'success': False, 'error': '服务器错误'}), 500
 
 
+@prompt_editor_bp.route('/api/import', methods=['POST'])
+@login_required
+@request_deadline(config.IMPORT_DEADLINE_SECONDS)
+def import_prompts():
+    """
+    批量导入Prompt
+    请求体为JSON Lines（每行一个对象）或带表头的CSV，字段为title、content、category、description、tags；
+    边读取边按批写入，响应也逐行流式返回，上传多大内存占用都不变；
+    截止时间使用IMPORT_DEADLINE_SECONDS（默认不限制），超过时导入中止，最后一行带error
+    
+    查询参数:
+        workspace_id: 导入到的工作空间ID，默认为1
+        format: jsonl或csv，默认按Content-Type判断（text/csv为CSV，其他为JSON Lines）
+        batch_size: 每个事务写入的Prompt数，默认使用配置IMPORT_BATCH_SIZE
+        
+    返回:
+        application/x-ndjson，每行一个导入结果 {"row", "success", "prompt_id", "uuid"} 或 {"row", "success", "error"}，
+        最后一行为 {"done": true, "stats": {...}}（行数、成功数、失败数、批次数、耗时、每秒行数），
+        超过截止时间中止时为 {"done": true, "success": false, "error": ..., "stats": {...}}
+    """
+    try:
+        user_id = session.get('user_id')
+        workspace_id = request.args.get('workspace_id', 1, type=int)
+        batch_size = request.args.get('batch_size', None, type=int)
+        fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'jsonl')
+        if fmt not in ('jsonl', 'csv'):
+            return jsonify({'success': False, 'error': 'format必须是jsonl或csv'}), 400
+        
+        if not WorkspaceService.is_workspace_member(workspace_id, user_id):
+            return jsonify({'success': False, 'error': '无权限导入到此工作空间'}), 403
+        
+        parse = PromptImportService.parse_csv if fmt == 'csv' else PromptImportService.parse_jsonl
+        
+        def generate():
+            rows = parse(request.stream)
+            for result in PromptImportService.import_prompts(user_id, workspace_id, rows, batch_size):
+                yield json.dumps(result, ensure_ascii=False) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        logger.error(f"批量导入Prompt失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': '服务器错误'}), 500
+
+
 @prompt_editor_bp.route('/api/<int:prompt_id>/update', methods=['PUT'])
 @login_required
 def update_prompt(prompt_id):
@@ -145,45 +205,269 @@ def get_prompt(prompt_id):
         return jsonify({'success': False, 'error': '服务器错误'}), 500
 
 
+@prompt_editor_bp.route('/api/batch', methods=['GET'])
+@login_required
+def get_prompts_batch():
+    """
+    批量获取Prompt详情
+    
+    查询参数:
+        ids: 逗号分隔的Prompt ID列表，如 ids=3,1,2
+        
+    返回:
+        JSON格式的Prompt列表，按请求的顺序排列，不存在或已删除的ID被忽略
+    """
+    try:
+        raw_ids = [i.strip() for i in request.args.get('ids', '').split(',') if i.strip()]
+        if not raw_ids:
+            return jsonify({'success': False, 'error': '缺少ids参数'}), 400
+        if not all(i.isdigit() for i in raw_ids):
+            return jsonify({'success': False, 'error': 'ids必须是逗号分隔的整数'}), 400
+        if len(raw_ids) > MAX_BATCH_IDS:
+            return jsonify({'success': False, 'error': f'一次最多获取{MAX_BATCH_IDS}个Prompt'}), 400
+        
+        user_id = session.get('user_id')
+        prompts = PromptService.get_prompts([int(i) for i in raw_ids], user_id)
+        
+        return jsonify({
+            'success': True,
+            'data': prompts
+        })
+        
+    except Exception as e:
+        logger.error(f"批量获取Prompt失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': '服务器错误'}), 500
+
+
+@prompt_editor_bp.route('/api/<int:prompt_id>/content', methods=['GET'])
+@login_required
+def get_prompt_content(prompt_id):
+    """
+    获取Prompt当前版本的内容（纯文本）
+    内容压缩保存且客户端接受deflate编码时，直接发送保存的压缩数据，不在服务端解压再压缩
+    
+    Args:
+        prompt_id: Prompt ID
+        
+    返回:
+        text/plain格式的Prompt内容
+    """
+    try:
+        user_id = session.get('user_id')
+        accept_compressed = config.CONTENT_COMPRESSED_RESPONSES and \
+            request.accept_encodings.quality('deflate') > 0
+        data = PromptService.get_current_content(prompt_id, user_id, accept_compressed)
+        
+        if not data:
+            return jsonify({'success': False, 'error': 'Prompt不存在或无权限'}), 404
+        
+        if data['content_zip'] is not None:
+            response = Response(data['content_zip'], mimetype='text/plain')
+            response.headers['Content-Encoding'] = 'deflate'
+        else:
+            response = Response(data['content'], mimetype='text/plain')
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['X-Prompt-Version'] = data['version']
+        return response
+        
+    except Exception as e:
+        logger.error(f"获取Prompt内容失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': '服务器错误'}), 500
+
+
 @prompt_editor_bp.route('/api/<int:prompt_id>/versions', methods=['GET'])
 @login_required
 def get_versions(prompt_id):
     """
-    获取Prompt版本历史
+    获取Prompt版本历史（只含元数据，按id倒序键集分页）
+    响应带ETag，请求带If-None-Match且历史未变化时返回304，不查询版本列表
     
     Args:
         prompt_id: Prompt ID
+        
+    查询参数:
+        cursor: 分页游标（上一页返回的next_cursor/prev_cursor）
+        page_size: 每页大小，默认20，最大MAX_VERSION_PAGE_SIZE
+        
+    返回:
+        JSON格式的版本列表（版本号、作者、变更说明、内容大小、时间、是否当前版本）和分页信息
     """
     try:
         user_id = session.get('user_id')
-        versions = PromptService.get_version_history(prompt_id, user_id)
+        cursor = request.args.get('cursor') or None
+        page_size = max(1, min(request.args.get('page_size', 20, type=int), MAX_VERSION_PAGE_SIZE))
         
-        return jsonify({
+        token = PromptService.get_history_etag(prompt_id)
+        if token is None:
+            return jsonify({'success': False, 'error': 'Prompt不存在或无权限'}), 404
+        etag = hashlib.sha1(f"{token}|{page_size}|{cursor or ''}".encode('utf-8')).hexdigest()[:20]
+        if request.if_none_match.contains(etag):
+            return _not_modified(etag)
+        
+        page = PromptService.get_version_history(prompt_id, user_id, cursor=cursor, page_size=page_size)
+        
+        response = jsonify({
             'success': True,
-            'versions': versions
+            'versions': page['data'],
+            'pagination': page['pagination']
         })
+        return _with_etag(response, etag)
         
+    except InvalidCursorError:
+        return jsonify({'success': False, 'error': '无效的分页游标'}), 400
     except Exception as e:
         logger.error(f"获取版本历史失败: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'error': '服务器错误'}), 500
 
 
+@prompt_editor_bp.route('/api/<int:prompt_id>/versions/<int:version_id>', methods=['GET'])
+@login_required
+def get_version(prompt_id, version_id):
+    """
+    获取单个版本的完整内容（差量存储的历史版本在此时还原）
+    响应带ETag，版本未变化时返回304，不还原内容
+    
+    Args:
+        prompt_id: Prompt ID
+        version_id: 版本ID
+        
+    返回:
+        JSON格式的版本信息，包含content
+    """
+    try:
+        user_id = session.get('user_id')
+        etag = PromptService.get_history_etag(prompt_id, version_id)
+        if etag is None:
+            return jsonify({'success': False, 'error': '版本不存在或无权限'}), 404
+        if request.if_none_match.contains(etag):
+            return _not_modified(etag)
+        
+        version = PromptService.get_version(prompt_id, version_id, user_id)
+        if not version:
+            return jsonify({'success': False, 'error': '版本不存在或无权限'}), 404
+        
+        return _with_etag(jsonify({'success': True, 'data': version}), etag)
+        
+    except Exception as e:
+        logger.error(f"获取版本失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': '服务器错误'}), 500
+
+
+@prompt_editor_bp.route('/api/<int:prompt_id>/diff', methods=['GET'])
+@login_required
+def diff_versions(prompt_id):
+    """
+    在服务端比较两个版本，浏览器不必下载两个版本的完整内容
+    响应带ETag，两个版本都未变化时返回304
+    
+    Args:
+        prompt_id: Prompt ID
+        
+    查询参数:
+        from: 原版本ID
+        to: 新版本ID
+        context: 相同行块保留的上下文行数，不传时返回全部相同行
+        
+    返回:
+        JSON格式的差异：ops（equal/delete/insert/skip，replace带逐字符差异chars）、
+        stats（增删的行数和字符数）、complete（是否在时间预算内完成）
+    """
+    try:
+        user_id = session.get('user_id')
+        from_version_id = request.args.get('from', type=int)
+        to_version_id = request.args.get('to', type=int)
+        context = request.args.get('context', type=int)
+        if from_version_id is None or to_version_id is None:
+            return jsonify({'success': False, 'error': '缺少from或to参数'}), 400
+        if context is not None and context < 0:
+            return jsonify({'success': False, 'error': 'context不能为负数'}), 400
+        
+        etag = PromptService.get_diff_etag(prompt_id, from_version_id, to_version_id, context)
+        if etag is None:
+            return jsonify({'success': False, 'error': '版本不存在或无权限'}), 404
+        if request.if_none_match.contains(etag):
+            return _not_modified(etag)
+        
+        result = PromptService.diff_versions(prompt_id, from_version_id, to_version_id, user_id, context)
+        if not result:
+            return jsonify({'success': False, 'error': '版本不存在或无权限'}), 404
+        
+        etag = result.pop('etag')
+        return _with_etag(jsonify({'success': True, 'data': result}), etag)
+        
+    except Exception as e:
+        logger.error(f"比较版本失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': '服务器错误'}), 500
+
+
+def _with_etag(response: Response, etag: str) -> Response:
+    """给响应加上ETag，要求客户端每次使用缓存前重新验证"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _not_modified(etag: str) -> Response:
+    """内容未变化时的304响应"""
+    return _with_etag(Response(status=304), etag)
+
+
 @prompt_editor_bp.route('/api/<int:prompt_id>/analyze', methods=['POST'])
 @login_required
 def analyze_prompt(prompt_id):
     """
     分析Prompt内容
-    提取变量、计算Token数等
+    提取变量及其位置、估算各提供商的Token数、统计字符和行数（相同内容的分析结果会被缓存）
+    
+    编辑器可以只发送修改：第一次发送完整内容，之后发送上一次结果的content_hash和修改片段，
+    服务端只重新统计修改所在的行。会话过期或基准内容不一致时返回409，需要重新发送完整内容
     
     Args:
         prompt_id: Prompt ID
+        
+    请求体:
+        session_id: 编辑会话ID（编辑器每次打开页面时生成），提供时才保留增量分析的基准
+        content: 完整内容
+        或 base_hash + patch: {'start', 'end', 'text'}，把基准内容的[start, end)替换为text（字符偏移）
+        
+    返回:
+        JSON格式的分析结果：content_hash、tokens（openai/claude/wenxin）、variables、stats
     """
     try:
-        data = request.json
+        data = request.get_json(silent=True) or {}
+        session_id = data.get('session_id')
+        if session_id is not None and (not isinstance(session_id, str) or not 0 < len(session_id) <= 64):
+            return jsonify({'success': False, 'error': 'session_id必须是不超过64个字符的字符串'}), 400
+        session_key = f"{session.get('user_id')}:{prompt_id}:{session_id}" if session_id else None
+        
+        patch = data.get('patch')
+        if patch is not None:
+            if not session_key or not isinstance(data.get('base_hash'), str):
+                return jsonify({'success': False, 'error': '增量分析需要session_id和base_hash'}), 400
+            if (not isinstance(patch, dict) or not isinstance(patch.get('text', ''), str)
+                    or not all(isinstance(patch.get(k), int) and not isinstance(patch.get(k), bool)
+                               for k in ('start', 'end'))):
+                return jsonify({'success': False, 'error': 'patch必须包含整数start、end和字符串text'}), 400
+            try:
+                analysis = PromptService.analyze_content_patch(session_key, data['base_hash'], patch['start'],
+                                                               patch['end'], patch.get('text', ''))
+            except AnalysisStateError as e:
+                return jsonify({'success': False, 'error': str(e), 'resend_content': True}), 409
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            return jsonify({
+                'success': True,
+                'analysis': analysis
+            })
+        
         content = data.get('content', '')
+        if not isinstance(content, str):
+            return jsonify({'success': False, 'error': 'content必须是字符串'}), 400
+        if len(content) > config.ANALYSIS_MAX_CHARS:
+            return jsonify({'success': False, 'error': f'内容不能超过{config.ANALYSIS_MAX_CHARS}个字符'}), 400
         
         # 分析内容
-        analysis = PromptService.analyze_content(content)
+        analysis = PromptService.analyze_content(content, session_key)
         
         return jsonify({
             'success': True,
@@ -195,6 +479,97 @@ def analyze_prompt(prompt_id):
         return jsonify({'success': False, 'error': '服务器错误'}), 500
 
 
+def _render_options(data: dict):
+    """
+    解析渲染接口的公共参数
+
+    Returns:
+        tuple: (version_id, strict, 错误信息)
+    """
+    version_id = data.get('version_id')
+    if version_id is not None and (not isinstance(version_id, int) or isinstance(version_id, bool)):
+        return None, False, 'version_id必须是整数'
+    strict = data.get('strict', False)
+    if not isinstance(strict, bool):
+        return None, False, 'strict必须是布尔值'
+    return version_id, strict, None
+
+
+@prompt_editor_bp.route('/api/<int:prompt_id>/render', methods=['POST'])
+@login_required
+def render_prompt(prompt_id):
+    """
+    用变量渲染Prompt（模板按版本编译一次并缓存）
+    
+    Args:
+        prompt_id: Prompt ID
+        
+    请求体:
+        variables: 变量名 -> 值（字符串或数字），{{doc.title}}可以用嵌套对象 {"doc": {"title": ...}} 提供
+        version_id: 版本ID，不传时使用当前版本
+        strict: 为true时模板中没有的变量也报告为错误，默认false
+        
+    返回:
+        JSON格式的渲染结果：text、version、variables；变量校验失败时返回400和missing/invalid/unknown
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        version_id, strict, error = _render_options(data)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
+        result = PromptRenderService.render(prompt_id, data.get('variables', {}), version_id, strict)
+        if result is None:
+            return jsonify({'success': False, 'error': 'Prompt或版本不存在'}), 404
+        if not result.pop('success'):
+            return jsonify({'success': False, **result}), 400
+        
+        return jsonify({'success': True, 'data': result})
+        
+    except Exception as e:
+        logger.error(f"渲染Prompt失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': '服务器错误'}), 500
+
+
+@prompt_editor_bp.route('/api/<int:prompt_id>/render/batch', methods=['POST'])
+@login_required
+def render_prompt_batch(prompt_id):
+    """
+    用多行变量批量渲染同一个版本，每行单独校验，某行失败不影响其他行
+    
+    Args:
+        prompt_id: Prompt ID
+        
+    请求体:
+        rows: 变量列表，每项格式同render接口的variables，最多RENDER_MAX_BATCH_ROWS行
+        version_id: 版本ID，不传时使用当前版本
+        strict: 为true时模板中没有的变量也报告为错误，默认false
+        
+    返回:
+        JSON格式的结果：results（与rows一一对应，每项为text或错误详情）、version、variables、stats
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        version_id, strict, error = _render_options(data)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        rows = data.get('rows')
+        if not isinstance(rows, list):
+            return jsonify({'success': False, 'error': 'rows必须是数组'}), 400
+        if len(rows) > config.RENDER_MAX_BATCH_ROWS:
+            return jsonify({'success': False, 'error': f'rows不能超过{config.RENDER_MAX_BATCH_ROWS}行'}), 400
+        
+        result = PromptRenderService.render_batch(prompt_id, rows, version_id, strict)
+        if result is None:
+            return jsonify({'success': False, 'error': 'Prompt或版本不存在'}), 404
+        
+        return jsonify({'success': True, 'data': result})
+        
+    except Exception as e:
+        logger.error(f"批量渲染Prompt失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': '服务器错误'}), 500
+
+
 # ============== 自动保存API ==============
 # 注: 自动保存功能已改为使用localStorage在前端实现
 
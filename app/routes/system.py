@@ -0,0 +1,69 @@
+"""
+系统运行状态路由模块
+提供数据库连接池、SQL执行统计等运行指标的查询接口
+"""
+from flask import Blueprint, jsonify, request
+from app.common.logger import get_logger
+from app.common.database import (
+    get_pool_status, get_request_stats, get_query_cache_stats, get_query_stats,
+    get_transaction_stats
+)
+from app.common.cache import cache
+
+logger = get_logger(__name__)
+
+# 创建蓝图
+system_bp = Blueprint('system', __name__, url_prefix='/api/system')
+
+
+@system_bp.route('/db/stats', methods=['GET'])
+def get_db_stats():
+    """
+    获取数据库运行指标
+
+    返回:
+        JSON格式的连接池状态、请求级连接取出统计、查询缓存统计、对象缓存统计和事务重试统计
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'data': {
+                'pool': get_pool_status(),
+                'requests': get_request_stats(),
+                'query_cache': get_query_cache_stats(),
+                'object_cache': cache.stats(),
+                'transactions': get_transaction_stats()
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"获取数据库运行指标失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': '获取运行指标失败'}), 500
+
+
+@system_bp.route('/db/queries', methods=['GET'])
+def get_db_queries():
+    """
+    获取SQL执行统计排行
+    
+    查询参数:
+        limit: 返回条数（默认20）
+        order_by: 排序字段 total_ms/count/p99_ms/max_ms/rows（默认total_ms）
+        
+    返回:
+        JSON格式的按SQL指纹聚合的统计
+    """
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        order_by = request.args.get('order_by', 'total_ms')
+        if order_by not in ('total_ms', 'count', 'p99_ms', 'max_ms', 'rows'):
+            return jsonify({'success': False, 'error': '不支持的排序字段'}), 400
+        
+        return jsonify({
+            'success': True,
+            'data': get_query_stats(limit, order_by)
+        })
+    
+    except Exception as e:
+        logger.error(f"获取SQL执行统计失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': '获取SQL执行统计失败'}), 500
@@ -0,0 +1,399 @@
+"""
+Prompt内容分析服务
+为编辑器提供Token估算、{{变量}}提取和字符/行统计，编辑器输入时会频繁调用：
+
+- 各类字符只用正则的findall/sub等C实现的操作统计，50KB的内容也只需几毫秒
+- 统计量都按整行可加（各类字符片段不跨越换行），增量分析时只需重新统计修改的行
+- 结果按内容的SHA-256哈希缓存在进程内，内容不变时重复分析不再计算
+- 每个编辑会话在进程内保留最近一次的内容和计数，编辑器只需发送基准哈希和修改片段
+"""
+import re
+import math
+import time
+import bisect
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import config
+from app.common.template import VARIABLE_RE
+
+# 中日韩文字（各家分词器基本按字或双字切分）：假名、汉字、谚文
+_CJK_RANGES = r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_CJK_RE = re.compile(f'[{_CJK_RANGES}]')
+# 英文单词、数字串，其余的非空白字符按标点/符号计算
+_WORD_RE = re.compile(r'[A-Za-z]+')
+_DIGITS_RE = re.compile(r'[0-9]+')
+_OTHER_LETTER_RE = re.compile(rf'[^\W\dA-Za-z_{_CJK_RANGES}]')
+
+# 各提供商分词器的估算参数（按公开的分词统计标定的近似值，不是精确的分词结果）：
+# cjk为每个汉字的Token数，word_chars为英文单词每个Token平均包含的字母数，
+# digits为每个Token包含的数字位数，symbol为每个标点/符号的Token数，other为其他文字每个字符的Token数
+TOKEN_PROFILES: Dict[str, Dict[str, Any]] = {
+    'openai': {'name': 'OpenAI', 'cjk': 0.75, 'word_chars': 4.0, 'digits': 3, 'symbol': 0.8, 'other': 0.5},
+    'claude': {'name': 'Claude', 'cjk': 1.1, 'word_chars': 3.6, 'digits': 1, 'symbol': 0.9, 'other': 0.6},
+    'wenxin': {'name': '文心一言', 'cjk': 0.7, 'word_chars': 3.2, 'digits': 2, 'symbol': 1.0, 'other': 0.7},
+}
+
+
+class AnalysisStateError(LookupError):
+    """
+    增量分析的基准内容不存在异常
+    会话已过期、不在当前进程或基准哈希与会话中的内容不一致时抛出，调用方应改为发送完整内容
+    """
+
+
+def count_segment(text: str) -> Dict[str, Any]:
+    """
+    统计一段文本的可加计数（两段文本在换行处拼接时，计数等于各自计数之和）
+
+    Args:
+        text: 文本（增量分析时应为若干完整的行）
+
+    Returns:
+        dict: 字符数、非空白字符数、字节数、换行数、汉字数、单词长度分布、数字串长度分布、符号数和其他文字数
+    """
+    words = Counter(map(len, _WORD_RE.findall(text)))
+    digits = Counter(map(len, _DIGITS_RE.findall(text)))
+    non_space = sum(map(len, text.split()))
+    if text.isascii():
+        # 纯ASCII的内容不会有汉字和其他文字，省去两次扫描
+        cjk = other = 0
+    else:
+        cjk = len(_CJK_RE.findall(text))
+        other = len(_OTHER_LETTER_RE.findall(text))
+    letters = sum(length * count for length, count in words.items())
+    digit_chars = sum(length * count for length, count in digits.items())
+    return {
+        'characters': len(text),
+        'non_whitespace': non_space,
+        'bytes': len(text.encode('utf-8')),
+        'newlines': text.count('\n'),
+        'cjk': cjk,
+        'words': words,
+        'digits': digits,
+        'symbols': non_space - cjk - other - letters - digit_chars,
+        'other': other,
+    }
+
+
+def merge_counts(total: Dict[str, Any], part: Dict[str, Any], sign: int = 1) -> Dict[str, Any]:
+    """
+    把一段文本的计数加到（sign为-1时从）总计数上，返回新的总计数
+
+    Args:
+        total: 总计数
+        part: count_segment的结果
+        sign: 1为加，-1为减
+
+    Returns:
+        dict: 新的总计数
+    """
+    result = {}
+    for key, value in total.items():
+        if isinstance(value, Counter):
+            merged = Counter(value)
+            for length, count in part[key].items():
+                merged[length] += sign * count
+            result[key] = +merged
+        else:
+            result[key] = value + sign * part[key]
+    return result
+
+
+def estimate_tokens(counts: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    按各提供商的分词参数估算Token数
+
+    Args:
+        counts: count_segment/merge_counts得到的计数
+
+    Returns:
+        dict: 提供商代码 -> {'name', 'tokens'}
+    """
+    result = {}
+    for code, profile in TOKEN_PROFILES.items():
+        word_tokens = sum(math.ceil(length / profile['word_chars']) * count
+                          for length, count in counts['words'].items())
+        digit_tokens = sum(math.ceil(length / profile['digits']) * count
+                           for length, count in counts['digits'].items())
+        tokens = (counts['cjk'] * profile['cjk'] + word_tokens + digit_tokens
+                  + counts['symbols'] * profile['symbol'] + counts['other'] * profile['other'])
+        result[code] = {'name': profile['name'], 'tokens': int(math.ceil(tokens))}
+    return result
+
+
+def find_variables(text: str, offset: int = 0, line: int = 1,
+                   line_start: int = 0) -> List[Dict[str, Any]]:
+    """
+    查找{{变量}}出现的位置
+
+    Args:
+        text: 文本
+        offset: text在完整内容中的起始偏移
+        line: text起始处的行号（从1开始）
+        line_start: text起始处所在行在完整内容中的起始偏移
+
+    Returns:
+        list: 每次出现的 {'name', 'start', 'end', 'line', 'column'}，偏移为完整内容中的字符偏移
+    """
+    occurrences = []
+    position = 0
+    for match in VARIABLE_RE.finditer(text):
+        # 只统计相邻两次出现之间的换行，整体只扫描一遍
+        newlines = text.count('\n', position, match.start())
+        if newlines:
+            line += newlines
+            line_start = offset + text.rfind('\n', position, match.start()) + 1
+        position = match.start()
+        start = offset + match.start()
+        occurrences.append({
+            'name': match.group(1),
+            'start': start,
+            'end': offset + match.end(),
+            'line': line,
+            'column': start - line_start + 1
+        })
+    return occurrences
+
+
+def apply_patch(content: str, counts: Dict[str, Any], occurrences: List[Dict[str, Any]],
+                start: int, end: int, text: str) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    用content[start:end]替换为text，只重新统计修改所在的整行，之后的变量位置整体平移
+
+    Args:
+        content: 修改前的内容
+        counts: 修改前的计数
+        occurrences: 修改前的变量出现位置（按位置排序）
+        start: 替换起点（字符偏移）
+        end: 替换终点（字符偏移，不含）
+        text: 新文本
+
+    Returns:
+        tuple: (修改后的内容, 计数, 变量出现位置)
+
+    Raises:
+        ValueError: 替换范围超出内容
+    """
+    if not 0 <= start <= end <= len(content):
+        raise ValueError(f'修改范围无效: [{start}, {end})，内容长度为{len(content)}')
+
+    # 修改所在的整行：从start所在行的行首到end所在行的行尾（含换行符）
+    line_start = content.rfind('\n', 0, start) + 1
+    line_end = content.find('\n', end)
+    line_end = len(content) if line_end == -1 else line_end + 1
+    old_segment = content[line_start:line_end]
+    new_segment = content[line_start:start] + text + content[end:line_end]
+    shift = len(new_segment) - len(old_segment)
+    line_shift = new_segment.count('\n') - old_segment.count('\n')
+
+    counts = merge_counts(merge_counts(counts, count_segment(old_segment), -1), count_segment(new_segment))
+
+    # 变量不跨行，修改行之前的不变，之后的只平移偏移和行号（列号不变）
+    starts = [o['start'] for o in occurrences]
+    head = bisect.bisect_left(starts, line_start)
+    tail = bisect.bisect_left(starts, line_end)
+    line = content.count('\n', 0, line_start) + 1
+    middle = find_variables(new_segment, line_start, line, line_start)
+    after = occurrences[tail:]
+    if shift or line_shift:
+        after = [dict(o, start=o['start'] + shift, end=o['end'] + shift, line=o['line'] + line_shift)
+                 for o in after]
+
+    return content[:start] + text + content[end:], counts, occurrences[:head] + middle + after
+
+
+def summarize(counts: Dict[str, Any], occurrences: List[Dict[str, Any]],
+              content_hash: str) -> Dict[str, Any]:
+    """
+    由计数和变量出现位置组装分析结果
+
+    Args:
+        counts: 内容的计数
+        occurrences: 变量的全部出现位置（按位置排序）
+        content_hash: 内容哈希
+
+    Returns:
+        dict: 分析结果
+    """
+    variables: Dict[str, Dict[str, Any]] = {}
+    for occurrence in occurrences:
+        entry = variables.setdefault(occurrence['name'], {'name': occurrence['name'], 'positions': []})
+        entry['positions'].append({k: occurrence[k] for k in ('start', 'end', 'line', 'column')})
+    for entry in variables.values():
+        entry['count'] = len(entry['positions'])
+
+    lines = counts['newlines'] + 1 if counts['characters'] else 0
+    return {
+        'content_hash': content_hash,
+        'tokens': estimate_tokens(counts),
+        'variables': list(variables.values()),
+        'stats': {
+            'characters': counts['characters'],
+            'characters_no_whitespace': counts['non_whitespace'],
+            'bytes': counts['bytes'],
+            'lines': lines,
+            'cjk_characters': counts['cjk'],
+            'words': sum(counts['words'].values()),
+            'variable_count': len(variables),
+            'variable_occurrences': len(occurrences)
+        }
+    }
+
+
+class ContentAnalyzer:
+    """
+    Prompt内容分析（带按内容哈希的进程内缓存和编辑会话状态）
+    返回的结果在多次调用间共享，调用方不应修改
+    """
+
+    _cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+    # 会话键 -> {'content', 'content_hash', 'counts', 'occurrences', 'expires'}
+    _sessions: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        """
+        计算内容哈希（与ContentStore相同，为SHA-256十六进制摘要）
+
+        Args:
+            content: 内容
+
+        Returns:
+            str: 内容哈希
+        """
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def analyze(content: str, session_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        分析内容：各提供商的Token估算、变量及其位置、字符和行统计
+
+        Args:
+            content: Prompt内容
+            session_key: 编辑会话键，提供时保留本次内容作为之后增量分析的基准
+
+        Returns:
+            dict: 分析结果（content_hash、tokens、variables、stats）
+        """
+        content_hash = ContentAnalyzer.hash_content(content)
+        cached = ContentAnalyzer.get_cached(content_hash)
+        if cached is not None:
+            if session_key:
+                # 计数在第一次增量分析时再补算
+                ContentAnalyzer._save_session(session_key, content, content_hash, None, None)
+            return cached
+
+        counts = count_segment(content)
+        occurrences = find_variables(content)
+        result = summarize(counts, occurrences, content_hash)
+        ContentAnalyzer.remember(result)
+        if session_key:
+            ContentAnalyzer._save_session(session_key, content, content_hash, counts, occurrences)
+        return result
+
+    @staticmethod
+    def analyze_patch(session_key: str, base_hash: str, start: int, end: int,
+                      text: str, max_chars: Optional[int] = None) -> Dict[str, Any]:
+        """
+        增量分析：把会话中的基准内容的[start, end)替换为text，只重新统计修改所在的行
+
+        Args:
+            session_key: 编辑会话键
+            base_hash: 编辑器上一次分析的内容哈希
+            start: 替换起点（字符偏移）
+            end: 替换终点（字符偏移，不含）
+            text: 新文本
+            max_chars: 修改后内容的最大字符数，None表示不限制
+
+        Returns:
+            dict: 修改后内容的分析结果
+
+        Raises:
+            AnalysisStateError: 会话不存在、已过期或基准哈希不一致
+            ValueError: 替换范围无效或修改后的内容超过max_chars
+        """
+        with ContentAnalyzer._lock:
+            state = ContentAnalyzer._sessions.get(session_key)
+            if state is not None and state['expires'] < time.monotonic():
+                del ContentAnalyzer._sessions[session_key]
+                state = None
+        if state is None or state['content_hash'] != base_hash:
+            raise AnalysisStateError('分析会话不存在或基准内容已变化')
+
+        content = state['content']
+        if max_chars is not None and len(content) - (end - start) + len(text) > max_chars:
+            raise ValueError(f'内容不能超过{max_chars}个字符')
+        counts, occurrences = state['counts'], state['occurrences']
+        if counts is None:
+            counts, occurrences = count_segment(content), find_variables(content)
+        content, counts, occurrences = apply_patch(content, counts, occurrences, start, end, text)
+
+        content_hash = ContentAnalyzer.hash_content(content)
+        result = ContentAnalyzer.get_cached(content_hash)
+        if result is None:
+            result = summarize(counts, occurrences, content_hash)
+            ContentAnalyzer.remember(result)
+        ContentAnalyzer._save_session(session_key, content, content_hash, counts, occurrences)
+        return result
+
+    @staticmethod
+    def _save_session(session_key: str, content: str, content_hash: str,
+                      counts: Optional[Dict[str, Any]], occurrences: Optional[List[Dict[str, Any]]]) -> None:
+        """
+        保存会话的最新内容，超过ANALYSIS_SESSION_MAX时淘汰最久未使用的会话
+
+        Args:
+            session_key: 编辑会话键
+            content: 内容
+            content_hash: 内容哈希
+            counts: 内容的计数，None表示下次增量分析时再计算
+            occurrences: 变量出现位置
+        """
+        state = {'content': content, 'content_hash': content_hash, 'counts': counts,
+                 'occurrences': occurrences, 'expires': time.monotonic() + config.ANALYSIS_SESSION_TTL}
+        with ContentAnalyzer._lock:
+            ContentAnalyzer._sessions[session_key] = state
+            ContentAnalyzer._sessions.move_to_end(session_key)
+            while len(ContentAnalyzer._sessions) > config.ANALYSIS_SESSION_MAX:
+                ContentAnalyzer._sessions.popitem(last=False)
+
+    @staticmethod
+    def get_cached(content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        按内容哈希读取缓存的分析结果
+
+        Args:
+            content_hash: 内容哈希
+
+        Returns:
+            dict: 分析结果，未缓存时返回None
+        """
+        with ContentAnalyzer._lock:
+            result = ContentAnalyzer._cache.get(content_hash)
+            if result is not None:
+                ContentAnalyzer._cache.move_to_end(content_hash)
+            return result
+
+    @staticmethod
+    def remember(result: Dict[str, Any]) -> None:
+        """
+        缓存分析结果，超过ANALYSIS_CACHE_SIZE时淘汰最久未使用的
+
+        Args:
+            result: 分析结果
+        """
+        with ContentAnalyzer._lock:
+            ContentAnalyzer._cache[result['content_hash']] = result
+            ContentAnalyzer._cache.move_to_end(result['content_hash'])
+            while len(ContentAnalyzer._cache) > config.ANALYSIS_CACHE_SIZE:
+                ContentAnalyzer._cache.popitem(last=False)
+
+    @staticmethod
+    def clear_cache() -> None:
+        """清空分析结果缓存和全部会话状态"""
+        with ContentAnalyzer._lock:
+            ContentAnalyzer._cache.clear()
+            ContentAnalyzer._sessions.clear()
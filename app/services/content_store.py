@@ -0,0 +1,289 @@
+"""
+Prompt内容存储服务
+版本的完整内容按SHA-256哈希只保存一份，版本通过content_id引用；
+每个内容维护引用计数，最后一个引用释放时在同一事务中删除；
+超过CONTENT_COMPRESS_MIN_BYTES的内容用zlib压缩保存在content_zip，读取时由decode_row解压
+"""
+import zlib
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
+from app.config import config
+from app.common.logger import get_logger
+from app.common.database import Database, run_transaction, invalidate_tables
+
+logger = get_logger(__name__)
+
+
+class ContentStore:
+    """
+    按内容寻址的去重存储
+    acquire/release需在调用方的事务中使用，与版本行的修改一起提交
+    """
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        """
+        计算内容哈希
+
+        Args:
+            content: 内容
+
+        Returns:
+            str: SHA-256十六进制摘要
+        """
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def encode(content: str) -> Tuple[str, Optional[bytes]]:
+        """
+        按大小决定是否压缩内容
+
+        Args:
+            content: 完整内容
+
+        Returns:
+            tuple: (content列的值, content_zip列的值)，压缩时content为空，不压缩时content_zip为None
+        """
+        raw = content.encode('utf-8')
+        threshold = config.CONTENT_COMPRESS_MIN_BYTES
+        if threshold <= 0 or len(raw) < threshold:
+            return content, None
+        compressed = zlib.compress(raw, config.CONTENT_COMPRESS_LEVEL)
+        # 压缩率太低的内容（已压缩、随机文本等）不值得读取时再解压
+        if len(compressed) > len(raw) * 0.9:
+            return content, None
+        return '', compressed
+
+    @staticmethod
+    def decompress(content_zip: bytes) -> str:
+        """
+        解压content_zip
+
+        Args:
+            content_zip: zlib压缩的内容
+
+        Returns:
+            str: 完整内容
+        """
+        return zlib.decompress(content_zip).decode('utf-8')
+
+    @staticmethod
+    def decode_row(row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        把查询结果中的content_zip解压到content
+        （查询需同时选出pc.content_zip；返回新字典，不修改可能来自查询缓存的原行）
+
+        Args:
+            row: 查询结果行
+
+        Returns:
+            dict: 不含content_zip、content为完整内容的行
+        """
+        if row is None or 'content_zip' not in row:
+            return row
+        row = dict(row)
+        content_zip = row.pop('content_zip')
+        if content_zip is not None:
+            row['content'] = ContentStore.decompress(content_zip)
+        return row
+
+    @staticmethod
+    def acquire(cursor, content: str) -> int:
+        """
+        保存内容并增加一次引用，相同内容已存在时只增加引用计数
+
+        Args:
+            cursor: 数据库游标
+            content: 完整内容
+
+        Returns:
+            int: 内容ID
+        """
+        content_hash = ContentStore.hash_content(content)
+        stored, content_zip = ContentStore.encode(content)
+        sql = """
+            INSERT INTO prompt_contents (content_hash, content, content_zip, ref_count)
+            VALUES (%s, %s, %s, 1)
+            ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+        """
+        cursor.execute(sql, (content_hash, stored, content_zip))
+
+        sql = "SELECT id FROM prompt_contents WHERE content_hash = %s"
+        cursor.execute(sql, (content_hash,))
+        return cursor.fetchone()['id']
+
+    @staticmethod
+    def acquire_many(cursor, contents: List[str]) -> List[int]:
+        """
+        批量保存内容并各增加一次引用（批量导入使用，语句数与内容数量无关）
+
+        Args:
+            cursor: 数据库游标
+            contents: 完整内容列表
+
+        Returns:
+            list: 与contents一一对应的内容ID
+        """
+        hashes = [ContentStore.hash_content(content) for content in contents]
+        counts: Dict[str, int] = {}
+        first: Dict[str, str] = {}
+        for content_hash, content in zip(hashes, contents):
+            counts[content_hash] = counts.get(content_hash, 0) + 1
+            first.setdefault(content_hash, content)
+        if not counts:
+            return []
+
+        # 同一批中的相同内容合并为一行，引用计数一次加上出现次数
+        rows = ((content_hash, *ContentStore.encode(content), counts[content_hash])
+                for content_hash, content in first.items())
+        Database.bulk_insert('prompt_contents', ['content_hash', 'content', 'content_zip', 'ref_count'],
+                             rows, on_duplicate={'ref_count': 'ref_count + VALUES(ref_count)'},
+                             cursor=cursor)
+
+        placeholders = ', '.join(['%s'] * len(counts))
+        sql = f"SELECT id, content_hash FROM prompt_contents WHERE content_hash IN ({placeholders})"
+        cursor.execute(sql, list(counts))
+        ids = {row['content_hash']: row['id'] for row in cursor.fetchall()}
+        return [ids[content_hash] for content_hash in hashes]
+
+    @staticmethod
+    def release(cursor, content_id: int) -> None:
+        """
+        释放一次引用，没有引用时删除内容
+
+        Args:
+            cursor: 数据库游标
+            content_id: 内容ID
+        """
+        sql = "UPDATE prompt_contents SET ref_count = ref_count - 1 WHERE id = %s"
+        cursor.execute(sql, (content_id,))
+
+        sql = "DELETE FROM prompt_contents WHERE id = %s AND ref_count <= 0"
+        cursor.execute(sql, (content_id,))
+
+    @staticmethod
+    def collect_garbage() -> Dict[str, Any]:
+        """
+        按版本表的实际引用重新计算引用计数，并删除没有引用的内容
+        （用于迁移后或异常中断后的校正，正常情况下release已经及时回收）
+
+        Returns:
+            dict: 校正的内容数和删除的内容数
+        """
+        try:
+            result = run_transaction(ContentStore._collect_garbage_tx)
+            if result['corrected'] or result['deleted']:
+                invalidate_tables('prompt_contents')
+            logger.info(f"内容回收完成: 校正{result['corrected']}个, 删除{result['deleted']}个")
+            return result
+
+        except Exception as e:
+            logger.error(f"内容回收失败: {str(e)}", exc_info=True)
+            return {'success': False, 'error': f'回收失败: {str(e)}'}
+
+    @staticmethod
+    def _collect_garbage_tx(conn) -> Dict[str, Any]:
+        """
+        内容回收的事务体（遇到死锁时会被重新执行）
+
+        Args:
+            conn: 数据库连接
+
+        Returns:
+            dict: 回收统计
+        """
+        with conn.cursor() as cursor:
+            sql = """
+                UPDATE prompt_contents
+                SET ref_count = (
+                    SELECT COUNT(*) FROM prompt_versions
+                    WHERE prompt_versions.content_id = prompt_contents.id
+                )
+                WHERE ref_count != (
+                    SELECT COUNT(*) FROM prompt_versions
+                    WHERE prompt_versions.content_id = prompt_contents.id
+                )
+            """
+            corrected = cursor.execute(sql)
+
+            sql = "DELETE FROM prompt_contents WHERE ref_count <= 0"
+            deleted = cursor.execute(sql)
+
+            return {'success': True, 'corrected': corrected, 'deleted': deleted}
+
+    @staticmethod
+    def compress_existing(batch_size: int = 500) -> Dict[str, Any]:
+        """
+        按当前阈值压缩已有的未压缩内容（迁移工具使用，每批一个事务）
+
+        Args:
+            batch_size: 每批处理的内容数
+
+        Returns:
+            dict: 检查的内容数、压缩的内容数和节省的字节数
+        """
+        stats = {'success': True, 'checked': 0, 'compressed': 0, 'bytes_saved': 0}
+        if config.CONTENT_COMPRESS_MIN_BYTES <= 0:
+            return stats
+
+        last_id = 0
+        try:
+            while True:
+                # 先用LENGTH粗略过滤掉小内容（SQLite按字符计算），是否压缩由encode决定
+                rows = Database.select_all(
+                    """
+                    SELECT id FROM prompt_contents
+                    WHERE id > %s AND content_zip IS NULL AND LENGTH(content) >= %s
+                    ORDER BY id LIMIT %s
+                    """,
+                    (last_id, config.CONTENT_COMPRESS_MIN_BYTES, batch_size), readonly=False, cache=False
+                )
+                if not rows:
+                    break
+                ids = [row['id'] for row in rows]
+                result = run_transaction(ContentStore._compress_batch_tx, ids)
+                for key in ('checked', 'compressed', 'bytes_saved'):
+                    stats[key] += result[key]
+                last_id = ids[-1]
+
+            if stats['compressed']:
+                invalidate_tables('prompt_contents')
+            logger.info(f"内容压缩完成: 检查{stats['checked']}个, 压缩{stats['compressed']}个, "
+                        f"节省{stats['bytes_saved']}字节")
+            return stats
+
+        except Exception as e:
+            logger.error(f"内容压缩失败: {str(e)}", exc_info=True)
+            return {'success': False, 'error': f'压缩失败: {str(e)}'}
+
+    @staticmethod
+    def _compress_batch_tx(conn, ids: List[int]) -> Dict[str, Any]:
+        """
+        压缩一批内容的事务体（遇到死锁时会被重新执行）
+
+        Args:
+            conn: 数据库连接
+            ids: 内容ID列表
+
+        Returns:
+            dict: 本批统计
+        """
+        stats = {'checked': 0, 'compressed': 0, 'bytes_saved': 0}
+        with conn.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(ids))
+            sql = f"""
+                SELECT id, content FROM prompt_contents
+                WHERE id IN ({placeholders}) AND content_zip IS NULL
+                FOR UPDATE
+            """
+            cursor.execute(sql, ids)
+            for row in cursor.fetchall():
+                stats['checked'] += 1
+                stored, content_zip = ContentStore.encode(row['content'])
+                if content_zip is None:
+                    continue
+                sql = "UPDATE prompt_contents SET content = %s, content_zip = %s WHERE id = %s"
+                cursor.execute(sql, (stored, content_zip, row['id']))
+                stats['compressed'] += 1
+                stats['bytes_saved'] += len(row['content'].encode('utf-8')) - len(content_zip)
+        return stats
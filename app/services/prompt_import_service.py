@@ -0,0 +1,247 @@
+"""
+Prompt批量导入服务
+逐行解析上传的JSON Lines或CSV文件，凑满一批后在一个事务中批量写入，
+逐行产出导入结果，内存占用只与批大小和单行长度有关，与上传文件大小无关
+"""
+import csv
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.config import config
+from app.common.logger import get_logger
+from app.common.deadline import DeadlineExceeded
+from app.services.prompt_service import PromptService
+
+logger = get_logger(__name__)
+
+# 与prompts、tags表的列长度一致
+_MAX_TITLE_CHARS = 100
+_MAX_CATEGORY_CHARS = 50
+_MAX_TAG_CHARS = 50
+
+# 解析结果：(行号, 记录, 错误信息)，记录和错误信息有且只有一个
+ParsedRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+class PromptImportService:
+    """
+    Prompt批量导入
+    """
+
+    @staticmethod
+    def _iter_lines(stream, max_bytes: int) -> Iterator[Optional[str]]:
+        """
+        逐行读取二进制流，超过max_bytes的行读完后以None代替
+
+        Args:
+            stream: 二进制输入流（如request.stream）
+            max_bytes: 单行最大字节数
+
+        Yields:
+            str: 解码后的行（保留换行符），超长的行为None
+        """
+        first = True
+        while True:
+            line = stream.readline(max_bytes + 1)
+            if not line:
+                return
+            if len(line) > max_bytes and not line.endswith(b'\n'):
+                # 丢弃这一行剩余的部分
+                while line and not line.endswith(b'\n'):
+                    line = stream.readline(max_bytes + 1)
+                yield None
+                continue
+            if first and line.startswith(b'\xef\xbb\xbf'):
+                line = line[3:]
+            first = False
+            yield line.decode('utf-8', errors='replace')
+
+    @staticmethod
+    def parse_jsonl(stream, max_line_bytes: Optional[int] = None) -> Iterator[ParsedRow]:
+        """
+        解析JSON Lines：每行一个JSON对象，空行忽略
+
+        Args:
+            stream: 二进制输入流
+            max_line_bytes: 单行最大字节数，默认使用配置IMPORT_MAX_LINE_BYTES
+
+        Yields:
+            tuple: (行号, 记录, 错误信息)
+        """
+        max_line_bytes = max_line_bytes or config.IMPORT_MAX_LINE_BYTES
+        for line_no, line in enumerate(PromptImportService._iter_lines(stream, max_line_bytes), 1):
+            if line is None:
+                yield line_no, None, f'行超过{max_line_bytes}字节'
+                continue
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f'JSON格式错误: {str(e)}'
+                continue
+            if not isinstance(data, dict):
+                yield line_no, None, '每行必须是JSON对象'
+                continue
+            yield line_no, data, None
+
+    @staticmethod
+    def parse_csv(stream, max_line_bytes: Optional[int] = None) -> Iterator[ParsedRow]:
+        """
+        解析CSV：第一行为列名（title、content、category、description、tags），
+        tags为逗号分隔的标签名，带引号的字段可以跨行
+
+        Args:
+            stream: 二进制输入流
+            max_line_bytes: 单行最大字节数，默认使用配置IMPORT_MAX_LINE_BYTES
+
+        Yields:
+            tuple: (记录所在的起始行号, 记录, 错误信息)
+        """
+        max_line_bytes = max_line_bytes or config.IMPORT_MAX_LINE_BYTES
+        oversized = []
+
+        def lines():
+            for line in PromptImportService._iter_lines(stream, max_line_bytes):
+                if line is None:
+                    # 用一个空字段的行占位，让读取器产出一行，再报告为错误
+                    oversized.append(True)
+                    line = ',\n'
+                yield line
+
+        reader = csv.DictReader(lines())
+        line_no = 1
+        while True:
+            start = line_no + 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield start, None, f'CSV格式错误: {str(e)}'
+                return
+            finally:
+                line_no = reader.line_num
+            if oversized:
+                oversized.clear()
+                yield start, None, f'行超过{max_line_bytes}字节'
+                continue
+            record = {k: v for k, v in row.items() if k is not None and v not in (None, '')}
+            if 'tags' in record:
+                record['tags'] = record['tags'].split(',')
+            yield start, record, None
+
+    @staticmethod
+    def validate(record: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        校验并规范化一条导入记录
+
+        Args:
+            record: 解析得到的记录
+
+        Returns:
+            tuple: (规范化后的记录, 错误信息)，校验失败时记录为None
+        """
+        title = record.get('title')
+        if not isinstance(title, str) or not title.strip():
+            return None, '标题不能为空'
+        title = title.strip()
+        if len(title) > _MAX_TITLE_CHARS:
+            return None, f'标题不能超过{_MAX_TITLE_CHARS}个字符'
+
+        content = record.get('content', '')
+        if not isinstance(content, str):
+            return None, 'content必须是字符串'
+
+        category = record.get('category') or 'general'
+        if not isinstance(category, str) or len(category) > _MAX_CATEGORY_CHARS:
+            return None, f'分类必须是不超过{_MAX_CATEGORY_CHARS}个字符的字符串'
+
+        description = record.get('description') or ''
+        if not isinstance(description, str):
+            return None, 'description必须是字符串'
+
+        tags = record.get('tags') or []
+        if isinstance(tags, str):
+            tags = tags.split(',')
+        if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+            return None, 'tags必须是字符串列表'
+        tags = [t.strip() for t in tags if t.strip()]
+        if any(len(t) > _MAX_TAG_CHARS for t in tags):
+            return None, f'标签不能超过{_MAX_TAG_CHARS}个字符'
+
+        return {'title': title, 'content': content, 'category': category,
+                'description': description, 'tags': tags}, None
+
+    @staticmethod
+    def import_prompts(user_id: int, workspace_id: int, rows: Iterator[ParsedRow],
+                       batch_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        批量导入Prompt
+        校验通过的记录凑满batch_size条后在一个事务中写入，一批失败时整批回滚并报告错误，
+        之后的批次继续导入；超过请求截止时间时整个导入中止（当前批次回滚），不再逐行报告失败
+
+        Args:
+            user_id: 用户ID
+            workspace_id: 工作空间ID
+            rows: parse_jsonl/parse_csv的输出
+            batch_size: 每个事务写入的Prompt数，默认使用配置IMPORT_BATCH_SIZE
+
+        Yields:
+            dict: 每行的导入结果（row、success、prompt_id/uuid或error），
+                  最后一项为 {'done': True, 'stats': 统计}，中止时另带error
+        """
+        batch_size = max(1, min(batch_size or config.IMPORT_BATCH_SIZE, config.IMPORT_MAX_BATCH_SIZE))
+        stats = {'rows': 0, 'created': 0, 'failed': 0, 'batches': 0}
+        started = time.monotonic()
+        pending: List[Tuple[int, Dict[str, Any]]] = []
+
+        def flush() -> Iterator[Dict[str, Any]]:
+            stats['batches'] += 1
+            try:
+                created = PromptService.create_prompts_bulk(user_id, workspace_id,
+                                                            [record for _, record in pending])
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"批量导入写入失败: 第{stats['batches']}批, {str(e)}", exc_info=True)
+                stats['failed'] += len(pending)
+                for line_no, _ in pending:
+                    yield {'row': line_no, 'success': False, 'error': f'写入失败: {str(e)}'}
+            else:
+                stats['created'] += len(created)
+                for (line_no, _), result in zip(pending, created):
+                    yield {'row': line_no, 'success': True, **result}
+            pending.clear()
+
+        aborted = None
+        try:
+            for line_no, record, error in rows:
+                stats['rows'] += 1
+                if record is not None:
+                    record, error = PromptImportService.validate(record)
+                if error:
+                    stats['failed'] += 1
+                    yield {'row': line_no, 'success': False, 'error': error}
+                    continue
+                pending.append((line_no, record))
+                if len(pending) >= batch_size:
+                    yield from flush()
+
+            if pending:
+                yield from flush()
+        except DeadlineExceeded as e:
+            # 之后的批次同样会超时，中止导入而不是把剩余的行都报告为写入失败
+            logger.warning(f"批量导入超过截止时间中止: 工作空间={workspace_id}, 第{stats['batches']}批, {str(e)}")
+            stats['failed'] += len(pending)
+            aborted = f"导入超过截止时间已中止，第{pending[0][0] if pending else stats['rows']}行及之后的记录未导入"
+
+        elapsed = time.monotonic() - started
+        stats['elapsed_ms'] = round(elapsed * 1000, 1)
+        stats['rows_per_second'] = round(stats['rows'] / elapsed, 1) if elapsed > 0 else 0.0
+        logger.info(f"批量导入完成: 工作空间={workspace_id}, 共{stats['rows']}行, "
+                    f"成功{stats['created']}, 失败{stats['failed']}, 耗时{stats['elapsed_ms']}ms")
+        if aborted:
+            yield {'done': True, 'success': False, 'error': aborted, 'stats': stats}
+            return
+        yield {'done': True, 'stats': stats}
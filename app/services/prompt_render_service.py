@@ -0,0 +1,136 @@
+"""
+Prompt渲染服务
+用变量渲染指定版本（默认当前版本）的Prompt模板，供各业务服务统一替换{{变量}}：
+每个版本的模板只编译一次，渲染计划按版本ID和版本的存储标记缓存在进程内，
+当前版本被原地修改时标记变化，自动重新编译
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import config
+from app.common.database import Database
+from app.common.logger import get_logger
+from app.common.template import RenderPlan, compile_template
+from app.services.prompt_service import PromptService
+
+logger = get_logger(__name__)
+
+
+class PromptRenderService:
+    """
+    Prompt模板渲染（带按版本缓存的渲染计划）
+    """
+
+    _plans: 'OrderedDict[Tuple, RenderPlan]' = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_plan(prompt_id: int, version_id: Optional[int] = None
+                 ) -> Optional[Tuple[Dict[str, Any], RenderPlan]]:
+        """
+        获取版本的渲染计划（缓存未命中时读取版本内容并编译）
+
+        Args:
+            prompt_id: Prompt ID
+            version_id: 版本ID，None表示当前版本
+
+        Returns:
+            tuple: (版本信息 {'id', 'version'}, 渲染计划)，Prompt或版本不存在时返回None
+        """
+        # 按主键查询一行得到版本和存储标记，不读取内容
+        sql = """
+            SELECT pv.id, pv.version, pv.content_id, pv.base_version_id, pv.update_time
+            FROM prompts p
+            JOIN prompt_versions pv ON pv.prompt_id = p.id
+            WHERE p.id = %s AND p.status != 0 AND pv.id = COALESCE(%s, p.current_version_id)
+        """
+        row = Database.select_one(sql, (prompt_id, version_id), cache=False)
+        if not row:
+            return None
+        version = {'id': row['id'], 'version': row['version']}
+        key = (row['id'], row['content_id'], row['base_version_id'], str(row['update_time']))
+
+        with PromptRenderService._lock:
+            plan = PromptRenderService._plans.get(key)
+            if plan is not None:
+                PromptRenderService._plans.move_to_end(key)
+                return version, plan
+
+        loaded = PromptService._load_versions(prompt_id, [row['id']]).get(row['id'])
+        if loaded is None:
+            return None
+        plan = compile_template(loaded['content'] or '')
+        with PromptRenderService._lock:
+            PromptRenderService._plans[key] = plan
+            PromptRenderService._plans.move_to_end(key)
+            while len(PromptRenderService._plans) > config.RENDER_PLAN_CACHE_SIZE:
+                PromptRenderService._plans.popitem(last=False)
+        return version, plan
+
+    @staticmethod
+    def render(prompt_id: int, variables: Dict[str, Any], version_id: Optional[int] = None,
+               strict: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        用一组变量渲染Prompt
+
+        Args:
+            prompt_id: Prompt ID
+            variables: 变量名 -> 值（字符串或数字，带点的变量名可以用嵌套对象提供）
+            version_id: 版本ID，None表示当前版本
+            strict: 为True时，模板中没有的变量也报告为错误
+
+        Returns:
+            dict: version、variables（模板中的变量名）和渲染结果（success、text或错误详情），
+                  Prompt或版本不存在时返回None
+        """
+        found = PromptRenderService.get_plan(prompt_id, version_id)
+        if found is None:
+            return None
+        version, plan = found
+        return {'version': version, 'variables': plan.variables, **plan.render(variables, strict)}
+
+    @staticmethod
+    def render_batch(prompt_id: int, rows: List[Any], version_id: Optional[int] = None,
+                     strict: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        用多行变量渲染同一个版本，每行单独校验，某行失败不影响其他行
+
+        Args:
+            prompt_id: Prompt ID
+            rows: 变量列表，每项为变量名 -> 值
+            version_id: 版本ID，None表示当前版本
+            strict: 为True时，模板中没有的变量也报告为错误
+
+        Returns:
+            dict: version、variables、results（与rows一一对应）和stats（行数、成功数、失败数、耗时），
+                  Prompt或版本不存在时返回None
+        """
+        found = PromptRenderService.get_plan(prompt_id, version_id)
+        if found is None:
+            return None
+        version, plan = found
+
+        started = time.monotonic()
+        render = plan.render
+        results = [render(row, strict) for row in rows]
+        rendered = sum(1 for result in results if result['success'])
+        elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+        logger.debug(f"批量渲染: ID={prompt_id}, 版本={version['id']}, {len(rows)}行, 耗时{elapsed_ms}ms")
+        return {
+            'version': version,
+            'variables': plan.variables,
+            'results': results,
+            'stats': {
+                'rows': len(rows),
+                'rendered': rendered,
+                'failed': len(rows) - rendered,
+                'elapsed_ms': elapsed_ms
+            }
+        }
+
+    @staticmethod
+    def clear_cache() -> None:
+        """清空渲染计划缓存"""
+        with PromptRenderService._lock:
+            PromptRenderService._plans.clear()
@@ -3,16 +3,46 @@ Prompt核心业务服务
 处理Prompt的创建、编辑、版本管理等核心功能
 """
 import uuid
+import hashlib
 import json
-import re
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Tuple
 from app.common.logger import get_logger
 from app.models import Prompt, PromptVersion, PromptTag
-from app.common.database import get_db_connection
+from app.common.database import get_db_connection, run_transaction, Database, invalidate_tables
+from app.common.cache import cache
+from app.common.delta import compact_diff, patch
+from app.common.textdiff import diff_text
+from app.services.content_store import ContentStore
+from app.services.content_analyzer import ContentAnalyzer
+from app.config import config
 
 logger = get_logger(__name__)
 
+# 批量获取时每条IN列表最多包含的ID数，超出后按块分批查询
+_IN_CHUNK_SIZE = 500
+
+# 标签名最大长度（tags.name为VARCHAR(50)）
+_MAX_TAG_CHARS = 50
+
+# 读取版本内容的列：完整内容保存在prompt_contents时从中读取，否则为prompt_versions.content；
+# 压缩保存的内容在content_zip中，读出后需经ContentStore.decode_row解压
+# （差量版本的content为差量，需经_resolve_contents还原）
+_CONTENT_COLUMNS = "COALESCE(pc.content, pv.content) AS content, pc.content_zip"
+_VERSION_COLUMNS = f"""
+    pv.id, pv.prompt_id, pv.version, {_CONTENT_COLUMNS},
+    pv.change_log, pv.published_at, pv.author_id, pv.create_time, pv.update_time
+"""
+# 版本历史列表只返回的元数据列
+_VERSION_META_COLUMNS = """
+    pv.id, pv.prompt_id, pv.version, pv.content_size, pv.change_log, pv.published_at,
+    pv.author_id, pv.create_time, pv.update_time
+"""
+_VERSION_FROM = """
+    FROM prompt_versions pv
+    LEFT JOIN prompt_contents pc ON pc.id = pv.content_id
+"""
+
 
 class PromptService:
     """
@@ -38,51 +68,13 @@ class PromptService:
             dict: 创建的Prompt信息
         """
         try:
-            with get_db_connection() as conn:
-                with conn.cursor() as cursor:
-                    # 生成UUID
-                    prompt_uuid = str(uuid.uuid4())
-                    
-                    # 插入Prompt基础信息
-                    sql = """
-                        INSERT INTO prompts (uuid, title, description, category, user_id, 
-                                           workspace_id, status)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """
-                    cursor.execute(sql, (
-                        prompt_uuid,
-                        title,
-                        kwargs.get('description', ''),
-                        category,
-                        user_id,
-                        workspace_id,
-                        1  # 正常状态
-                    ))
-                    prompt_id = cursor.lastrowid
-                    
-                    # 创建初始版本
-                    version_data = PromptService._create_version(
-                        cursor, prompt_id, 'v1.0', content, user_id, is_current=True
-                    )
-                    
-                    
-                    # 保存标签
-                    tags = kwargs.get('tags', [])
-                    if tags:
-                        PromptService._save_tags(cursor, prompt_id, tags)
-                    
-                    
-                    conn.commit()
-                    
-                    logger.info(f"创建Prompt成功: ID={prompt_id}, UUID={prompt_uuid}")
-                    
-                    return {
-                        'success': True,
-                        'prompt_id': prompt_id,
-                        'uuid': prompt_uuid,
-                        'version_id': version_data['id'],
-                        'version': version_data['version']
-                    }
+            result = run_transaction(
+                PromptService._create_prompt_tx, user_id, workspace_id, title, content, category, kwargs
+            )
+            invalidate_tables('prompts', 'prompt_versions', 'prompt_tags', 'tags', 'prompt_contents')
+            
+            logger.info(f"创建Prompt成功: ID={result['prompt_id']}, UUID={result['uuid']}")
+            return result
                     
         except Exception as e:
             logger.error(f"创建Prompt失败: {str(e)}", exc_info=True)
@@ -91,6 +83,149 @@ class PromptService:
                 'error': f'创建失败: {str(e)}'
             }
     
+    @staticmethod
+    def _create_prompt_tx(conn, user_id: int, workspace_id: int, title: str, content: str,
+                          category: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        创建Prompt的事务体（遇到死锁时会被重新执行）
+        
+        Args:
+            conn: 数据库连接
+            user_id: 用户ID
+            workspace_id: 工作空间ID
+            title: Prompt标题
+            content: Prompt内容
+            category: 分类
+            options: 其他可选参数（description、tags）
+            
+        Returns:
+            dict: 创建的Prompt信息
+        """
+        with conn.cursor() as cursor:
+            # 生成UUID
+            prompt_uuid = str(uuid.uuid4())
+            
+            # 插入Prompt基础信息
+            sql = """
+                INSERT INTO prompts (uuid, title, description, category, user_id, 
+                                   workspace_id, status, version_major, version_minor)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, 1, 0)
+            """
+            cursor.execute(sql, (
+                prompt_uuid,
+                title,
+                options.get('description', ''),
+                category,
+                user_id,
+                workspace_id,
+                1  # 正常状态
+            ))
+            prompt_id = cursor.lastrowid
+            
+            # 创建初始版本
+            version_data = PromptService._create_version(
+                cursor, prompt_id, 'v1.0', content, user_id, is_current=True
+            )
+            
+            # 保存标签
+            tags = options.get('tags', [])
+            if tags:
+                PromptService._save_tags(cursor, prompt_id, tags)
+            
+            return {
+                'success': True,
+                'prompt_id': prompt_id,
+                'uuid': prompt_uuid,
+                'version_id': version_data['id'],
+                'version': version_data['version']
+            }
+    
+    @staticmethod
+    def create_prompts_bulk(user_id: int, workspace_id: int,
+                            records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        在一个事务中批量创建Prompt
+        Prompt、初始版本、内容和标签都用多行INSERT写入，语句数与records数量无关
+        
+        Args:
+            user_id: 用户ID
+            workspace_id: 工作空间ID
+            records: Prompt列表，每项包含title、content，可选category、description、tags
+            
+        Returns:
+            list: 与records一一对应的创建结果（prompt_id、uuid）
+        """
+        if not records:
+            return []
+        result = run_transaction(PromptService._create_prompts_bulk_tx, user_id, workspace_id, records)
+        invalidate_tables('prompts', 'prompt_versions', 'prompt_tags', 'tags', 'prompt_contents')
+        return result
+    
+    @staticmethod
+    def _create_prompts_bulk_tx(conn, user_id: int, workspace_id: int,
+                                records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量创建Prompt的事务体（遇到死锁时会被重新执行）
+        
+        Args:
+            conn: 数据库连接
+            user_id: 用户ID
+            workspace_id: 工作空间ID
+            records: Prompt列表
+            
+        Returns:
+            list: 创建结果
+        """
+        with conn.cursor() as cursor:
+            uuids = [str(uuid.uuid4()) for _ in records]
+            
+            # 插入Prompt基础信息，再按UUID取回自增ID
+            Database.bulk_insert(
+                'prompts',
+                ['uuid', 'title', 'description', 'category', 'user_id', 'workspace_id',
+                 'status', 'version_major', 'version_minor'],
+                [(prompt_uuid, r['title'], r.get('description', ''), r.get('category', 'general'),
+                  user_id, workspace_id, 1, 1, 0) for prompt_uuid, r in zip(uuids, records)],
+                cursor=cursor
+            )
+            placeholders = ', '.join(['%s'] * len(uuids))
+            sql = f"SELECT id, uuid FROM prompts WHERE uuid IN ({placeholders})"
+            cursor.execute(sql, uuids)
+            ids_by_uuid = {row['uuid']: row['id'] for row in cursor.fetchall()}
+            prompt_ids = [ids_by_uuid[prompt_uuid] for prompt_uuid in uuids]
+            
+            # 初始版本：内容按哈希批量去重保存
+            content_ids = ContentStore.acquire_many(cursor, [r.get('content', '') for r in records])
+            Database.bulk_insert(
+                'prompt_versions',
+                ['prompt_id', 'version', 'content', 'content_id', 'content_size', 'change_log', 'author_id'],
+                [(prompt_id, 'v1.0', '', content_id, len(r.get('content', '').encode('utf-8')), '', user_id)
+                 for prompt_id, content_id, r in zip(prompt_ids, content_ids, records)],
+                cursor=cursor
+            )
+            sql = f"""
+                UPDATE prompts SET current_version_id = (
+                    SELECT MAX(pv.id) FROM prompt_versions pv WHERE pv.prompt_id = prompts.id
+                )
+                WHERE id IN ({', '.join(['%s'] * len(prompt_ids))})
+            """
+            cursor.execute(sql, prompt_ids)
+            
+            # 标签：所有Prompt的标签名一次换成ID，再一次写入关联
+            tags = [PromptService._normalize_tags(r.get('tags') or []) for r in records]
+            tag_ids = PromptService._resolve_tag_ids(
+                cursor, list(dict.fromkeys(name for names in tags for name in names))
+            )
+            rows = [(prompt_id, tag_id)
+                    for prompt_id, names in zip(prompt_ids, tags)
+                    for tag_id in dict.fromkeys(tag_ids[name] for name in names)]
+            if rows:
+                Database.bulk_insert('prompt_tags', ['prompt_id', 'tag_id'], rows,
+                                     ignore=True, cursor=cursor)
+            
+            return [{'prompt_id': prompt_id, 'uuid': prompt_uuid}
+                    for prompt_id, prompt_uuid in zip(prompt_ids, uuids)]
+    
     @staticmethod
     def update_prompt(prompt_id: int, user_id: int, **updates) -> Dict[str, Any]:
         """
@@ -105,78 +240,90 @@ class PromptService:
             dict: 更新结果
         """
         try:
-            with get_db_connection() as conn:
-                with conn.cursor() as cursor:
-                    # 检查权限
-                    sql = "SELECT user_id, status FROM prompts WHERE id = %s"
-                    cursor.execute(sql, (prompt_id,))
-                    prompt = cursor.fetchone()
-                    
-                    if not prompt:
-                        return {'success': False, 'error': 'Prompt不存在'}
-                    
-                    if prompt['user_id'] != user_id:
-                        return {'success': False, 'error': '无权限编辑此Prompt'}
-                    
-                    # 更新基础信息
-                    allowed_fields = ['title', 'description', 'category', 'status']
-                    update_fields = []
-                    update_values = []
-                    
-                    for field in allowed_fields:
-                        if field in updates:
-                            update_fields.append(f"{field} = %s")
-                            update_values.append(updates[field])
-                    
-                    if update_fields:
-                        sql = f"""
-                            UPDATE prompts 
-                            SET {', '.join(update_fields)}, update_time = NOW()
-                            WHERE id = %s
-                        """
-                        update_values.append(prompt_id)
-                        cursor.execute(sql, update_values)
-                    
-                    # 更新内容（创建新版本或更新当前版本）
-                    if 'content' in updates:
-                        content = updates['content']
-                        create_new_version = updates.get('create_new_version', False)
-                        
-                        if create_new_version:
-                            # 创建新版本
-                            new_version = PromptService._get_next_version(cursor, prompt_id)
-                            version_data = PromptService._create_version(
-                                cursor, prompt_id, new_version, content, user_id, 
-                                is_current=True, change_log=updates.get('change_log', '')
-                            )
-                        else:
-                            # 更新当前版本
-                            sql = """
-                                UPDATE prompt_versions 
-                                SET content = %s, update_time = NOW()
-                                WHERE prompt_id = %s AND is_current = 1
-                            """
-                            cursor.execute(sql, (content, prompt_id))
-                            
-                            # 获取版本ID
-                            sql = "SELECT id FROM prompt_versions WHERE prompt_id = %s AND is_current = 1"
-                            cursor.execute(sql, (prompt_id,))
-                            version = cursor.fetchone()
-                            version_data = {'id': version['id']}
-                    
-                    # 更新标签
-                    if 'tags' in updates:
-                        PromptService._update_tags(cursor, prompt_id, updates['tags'])
-                    
-                    conn.commit()
-                    
-                    logger.info(f"更新Prompt成功: ID={prompt_id}")
-                    return {'success': True, 'prompt_id': prompt_id}
+            result = run_transaction(PromptService._update_prompt_tx, prompt_id, user_id, updates)
+            if not result['success']:
+                return result
+            invalidate_tables('prompts', 'prompt_versions', 'prompt_tags', 'tags', 'prompt_contents')
+            PromptService.invalidate_prompt_cache(prompt_id)
+            
+            logger.info(f"更新Prompt成功: ID={prompt_id}")
+            return result
                     
         except Exception as e:
             logger.error(f"更新Prompt失败: {str(e)}", exc_info=True)
             return {'success': False, 'error': f'更新失败: {str(e)}'}
     
+    @staticmethod
+    def _update_prompt_tx(conn, prompt_id: int, user_id: int, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        更新Prompt的事务体（遇到死锁时会被重新执行）
+        
+        Args:
+            conn: 数据库连接
+            prompt_id: Prompt ID
+            user_id: 用户ID
+            updates: 要更新的字段
+            
+        Returns:
+            dict: 更新结果
+        """
+        with conn.cursor() as cursor:
+            # 检查权限
+            sql = "SELECT user_id, status FROM prompts WHERE id = %s"
+            cursor.execute(sql, (prompt_id,))
+            prompt = cursor.fetchone()
+            
+            if not prompt:
+                return {'success': False, 'error': 'Prompt不存在'}
+            
+            if prompt['user_id'] != user_id:
+                return {'success': False, 'error': '无权限编辑此Prompt'}
+            
+            # 更新基础信息
+            allowed_fields = ['title', 'description', 'category', 'status']
+            update_fields = []
+            update_values = []
+            
+            for field in allowed_fields:
+                if field in updates:
+                    update_fields.append(f"{field} = %s")
+                    update_values.append(updates[field])
+            
+            if update_fields:
+                sql = f"""
+                    UPDATE prompts 
+                    SET {', '.join(update_fields)}, update_time = NOW()
+                    WHERE id = %s
+                """
+                update_values.append(prompt_id)
+                cursor.execute(sql, update_values)
+            
+            # 更新内容（创建新版本或更新当前版本）
+            version_data = None
+            if 'content' in updates:
+                content = updates['content']
+                create_new_version = updates.get('create_new_version', False)
+                
+                if create_new_version:
+                    # 创建新版本（版本号在事务中分配，major_version为True时升级主版本）
+                    version_data = PromptService._create_version(
+                        cursor, prompt_id, None, content, user_id, 
+                        is_current=True, change_log=updates.get('change_log', ''),
+                        major=bool(updates.get('major_version', False))
+                    )
+                else:
+                    # 更新当前版本
+                    version_data = PromptService._replace_current_content(cursor, prompt_id, content)
+            
+            # 更新标签
+            if 'tags' in updates:
+                PromptService._update_tags(cursor, prompt_id, updates['tags'])
+            
+            result = {'success': True, 'prompt_id': prompt_id}
+            if version_data and version_data.get('version'):
+                result['version'] = version_data['version']
+            return result
+    
     @staticmethod
     def get_prompt(prompt_id: int, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
         """
@@ -190,124 +337,833 @@ class PromptService:
             dict: Prompt详情，如果不存在或无权限则返回None
         """
         try:
-            with get_db_connection() as conn:
-                with conn.cursor() as cursor:
-                    # 获取Prompt基础信息
-                    sql = """
-                        SELECT p.*
-                        FROM prompts p
-                        WHERE p.id = %s AND p.status != 0
-                    """
-                    cursor.execute(sql, (prompt_id,))
-                    prompt = cursor.fetchone()
-                    
-                    if not prompt:
-                        return None
-                    
-                    # 权限检查：检查用户是否属于同一工作空间
-                    # TODO: 实现工作空间成员检查
-                    # 暂时只检查是否是创建者
-                    # if not PromptService._can_access_prompt(cursor, prompt, user_id):
-                    #     return None
-                    
-                    # 获取当前版本
-                    sql = """
-                        SELECT * FROM prompt_versions 
-                        WHERE prompt_id = %s AND is_current = 1
-                    """
-                    cursor.execute(sql, (prompt_id,))
-                    version = cursor.fetchone()
-                    
-                    # 获取标签
-                    sql = "SELECT tag_name FROM prompt_tags WHERE prompt_id = %s"
-                    cursor.execute(sql, (prompt_id,))
-                    tags = [row['tag_name'] for row in cursor.fetchall()]
-                    
-                    # 组装返回数据
-                    result = dict(prompt)
-                    result['current_version'] = dict(version) if version else None
-                    result['tags'] = tags
-                    
-                    return result
+            if not config.PROMPT_CACHE_ENABLED:
+                return PromptService._load_prompt(prompt_id)
+            return cache.get_or_load(
+                PromptService._cache_key(prompt_id),
+                lambda: PromptService._load_prompt(prompt_id)
+            )
                     
         except Exception as e:
             logger.error(f"获取Prompt失败: {str(e)}", exc_info=True)
             return None
     
+    @staticmethod
+    def _load_prompt(prompt_id: int) -> Optional[Dict[str, Any]]:
+        """
+        从数据库读取并组装Prompt详情（基础信息、当前版本和标签）
+        
+        Args:
+            prompt_id: Prompt ID
+            
+        Returns:
+            dict: Prompt详情，如果不存在则返回None
+        """
+        with get_db_connection(readonly=True) as conn:
+            with conn.cursor() as cursor:
+                # 获取Prompt基础信息
+                sql = """
+                    SELECT p.*
+                    FROM prompts p
+                    WHERE p.id = %s AND p.status != 0
+                """
+                cursor.execute(sql, (prompt_id,))
+                prompt = cursor.fetchone()
+                
+                if not prompt:
+                    return None
+                
+                # 权限检查：检查用户是否属于同一工作空间
+                # TODO: 实现工作空间成员检查
+                # 暂时只检查是否是创建者
+                # if not PromptService._can_access_prompt(cursor, prompt, user_id):
+                #     return None
+                
+                # 按指针获取当前版本（当前版本始终保存完整内容）
+                version = None
+                if prompt['current_version_id']:
+                    sql = f"""
+                        SELECT {_VERSION_COLUMNS}, 1 AS is_current {_VERSION_FROM}
+                        WHERE pv.id = %s
+                    """
+                    cursor.execute(sql, (prompt['current_version_id'],))
+                    version = ContentStore.decode_row(cursor.fetchone())
+                
+                # 获取标签
+                sql = """
+                    SELECT t.name AS tag_name FROM prompt_tags pt
+                    JOIN tags t ON t.id = pt.tag_id
+                    WHERE pt.prompt_id = %s ORDER BY pt.id
+                """
+                cursor.execute(sql, (prompt_id,))
+                tags = [row['tag_name'] for row in cursor.fetchall()]
+                
+                # 组装返回数据
+                result = dict(prompt)
+                result['current_version'] = dict(version) if version else None
+                result['tags'] = tags
+                
+                return result
+    
+    @staticmethod
+    def _cache_key(prompt_id: int) -> str:
+        """Prompt详情的缓存键"""
+        return f"prompt:{int(prompt_id)}"
+    
+    @staticmethod
+    def invalidate_prompt_cache(*prompt_ids: int) -> None:
+        """
+        使Prompt详情缓存失效（修改Prompt、版本或标签的事务提交后调用）
+        
+        Args:
+            *prompt_ids: Prompt ID
+        """
+        cache.invalidate(*(PromptService._cache_key(i) for i in prompt_ids))
+    
+    @staticmethod
+    def get_prompts(prompt_ids: List[int], user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        批量获取Prompt详情
+        用IN列表一次查出所有Prompt、当前版本和标签，查询次数与数量无关（每块3次）
+        
+        Args:
+            prompt_ids: Prompt ID列表
+            user_id: 用户ID（用于权限检查）
+            
+        Returns:
+            list: Prompt详情列表，按请求的顺序返回，不存在或已删除的ID被忽略
+        """
+        ids = list(dict.fromkeys(int(i) for i in prompt_ids))
+        if not ids:
+            return []
+        
+        try:
+            prompts: Dict[int, Dict[str, Any]] = {}
+            with get_db_connection(readonly=True) as conn:
+                with conn.cursor() as cursor:
+                    for start in range(0, len(ids), _IN_CHUNK_SIZE):
+                        chunk = ids[start:start + _IN_CHUNK_SIZE]
+                        placeholders = ', '.join(['%s'] * len(chunk))
+                        
+                        # 获取Prompt基础信息
+                        sql = f"SELECT p.* FROM prompts p WHERE p.id IN ({placeholders}) AND p.status != 0"
+                        cursor.execute(sql, chunk)
+                        found = {}
+                        for row in cursor.fetchall():
+                            prompt = dict(row)
+                            prompt['current_version'] = None
+                            prompt['tags'] = []
+                            found[prompt['id']] = prompt
+                        if not found:
+                            continue
+                        
+                        # 按指针获取当前版本
+                        version_ids = [p['current_version_id'] for p in found.values() if p['current_version_id']]
+                        if version_ids:
+                            placeholders = ', '.join(['%s'] * len(version_ids))
+                            sql = f"""
+                                SELECT {_VERSION_COLUMNS}, 1 AS is_current {_VERSION_FROM}
+                                WHERE pv.id IN ({placeholders})
+                            """
+                            cursor.execute(sql, version_ids)
+                            for version in cursor.fetchall():
+                                found[version['prompt_id']]['current_version'] = ContentStore.decode_row(version)
+                        
+                        found_ids = list(found)
+                        placeholders = ', '.join(['%s'] * len(found_ids))
+                        
+                        # 获取标签
+                        sql = f"""
+                            SELECT pt.prompt_id, t.name AS tag_name FROM prompt_tags pt
+                            JOIN tags t ON t.id = pt.tag_id
+                            WHERE pt.prompt_id IN ({placeholders}) ORDER BY pt.id
+                        """
+                        cursor.execute(sql, found_ids)
+                        for row in cursor.fetchall():
+                            found[row['prompt_id']]['tags'].append(row['tag_name'])
+                        
+                        prompts.update(found)
+            
+            return [prompts[i] for i in ids if i in prompts]
+        
+        except Exception as e:
+            logger.error(f"批量获取Prompt失败: {str(e)}", exc_info=True)
+            return []
+    
+    
+    @staticmethod
+    def get_current_content(prompt_id: int, user_id: Optional[int] = None,
+                            accept_compressed: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        获取Prompt当前版本的内容
+        
+        Args:
+            prompt_id: Prompt ID
+            user_id: 用户ID（用于权限检查）
+            accept_compressed: 为True且内容压缩保存时直接返回压缩数据，不解压
+            
+        Returns:
+            dict: version_id、version，以及content（完整内容）或content_zip（zlib压缩数据）之一，
+                  不存在时返回None
+        """
+        try:
+            sql = f"""
+                SELECT pv.id AS version_id, pv.version, {_CONTENT_COLUMNS}
+                FROM prompts p
+                JOIN prompt_versions pv ON pv.id = p.current_version_id
+                LEFT JOIN prompt_contents pc ON pc.id = pv.content_id
+                WHERE p.id = %s AND p.status != 0
+            """
+            row = Database.select_one(sql, (prompt_id,))
+            if not row:
+                return None
+            if accept_compressed and row['content_zip'] is not None:
+                return {'version_id': row['version_id'], 'version': row['version'],
+                        'content': None, 'content_zip': row['content_zip']}
+            row = ContentStore.decode_row(row)
+            row['content_zip'] = None
+            return row
+        
+        except Exception as e:
+            logger.error(f"获取Prompt内容失败: {str(e)}", exc_info=True)
+            return None
+    
+    @staticmethod
+    def get_version_history(prompt_id: int, user_id: Optional[int] = None, cursor: Optional[str] = None,
+                            page_size: int = 20) -> Dict[str, Any]:
+        """
+        按id键集分页获取Prompt的版本历史
+        只返回元数据（版本号、作者、变更说明、内容大小、时间），内容通过get_version按需获取，
+        列表不需要还原差量或解压内容
+        
+        Args:
+            prompt_id: Prompt ID
+            user_id: 用户ID（用于权限检查）
+            cursor: 分页游标（上一页返回的next_cursor/prev_cursor）
+            page_size: 每页大小
+            
+        Returns:
+            dict: 包含data和pagination的分页结果，版本按创建顺序倒序（不计算总数，pagination.total为None）
+        """
+        sql = f"""
+            SELECT {_VERSION_META_COLUMNS},
+                   CASE WHEN pv.id = p.current_version_id THEN 1 ELSE 0 END AS is_current
+            FROM prompt_versions pv
+            JOIN prompts p ON p.id = pv.prompt_id
+            WHERE pv.prompt_id = %s
+        """
+        # 游标已经给出has_next，不再每页COUNT版本数；
+        # 不使用查询结果缓存，保证与get_history_etag（同样不走缓存）计算ETag时看到的是同一份历史
+        return Database.select_page(sql, (prompt_id,), page_size=page_size,
+                                    keyset=[('id', 'DESC')], cursor=cursor, total='none', cache=False)
+    
+    @staticmethod
+    def get_version(prompt_id: int, version_id: int, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        获取一个版本的元数据和完整内容（差量存储的版本会沿差量链还原）
+        
+        Args:
+            prompt_id: Prompt ID
+            version_id: 版本ID
+            user_id: 用户ID（用于权限检查）
+            
+        Returns:
+            dict: 版本信息，不存在时返回None
+        """
+        try:
+            return PromptService._load_versions(prompt_id, [version_id]).get(version_id)
+        
+        except Exception as e:
+            logger.error(f"获取版本失败: ID={prompt_id}, 版本={version_id}, {str(e)}", exc_info=True)
+            return None
+    
+    @staticmethod
+    def _load_versions(prompt_id: int, version_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        读取几个版本的元数据并还原完整内容（共用的差量链只读取一次）
+        
+        Args:
+            prompt_id: Prompt ID
+            version_ids: 版本ID列表
+            
+        Returns:
+            dict: 版本ID -> 版本信息，不存在或不属于此Prompt的版本被忽略
+        """
+        ids = list(dict.fromkeys(version_ids))
+        with get_db_connection(readonly=True) as conn:
+            with conn.cursor() as cursor:
+                sql = f"""
+                    SELECT {_VERSION_META_COLUMNS}, {_CONTENT_COLUMNS}, pv.base_version_id,
+                           CASE WHEN pv.id = p.current_version_id THEN 1 ELSE 0 END AS is_current
+                    {_VERSION_FROM}
+                    JOIN prompts p ON p.id = pv.prompt_id
+                    WHERE pv.id IN ({', '.join(['%s'] * len(ids))}) AND pv.prompt_id = %s
+                """
+                cursor.execute(sql, ids + [prompt_id])
+                rows = [ContentStore.decode_row(row) for row in cursor.fetchall()]
+                contents = PromptService._resolve_contents(cursor, rows)
+        
+        versions = {}
+        for row in rows:
+            version = dict(row)
+            version.pop('base_version_id')
+            version['content'] = contents[row['id']]
+            versions[row['id']] = version
+        return versions
+    
+    @staticmethod
+    def diff_versions(prompt_id: int, from_version_id: int, to_version_id: int,
+                      user_id: Optional[int] = None, context: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        比较同一Prompt的两个版本（行级+字符级差异）
+        结果按版本ID对和两个版本的存储标记缓存：被取代的版本内容不会再变，
+        当前版本被原地修改时标记变化，自动使用新的缓存键
+        
+        Args:
+            prompt_id: Prompt ID
+            from_version_id: 原版本ID
+            to_version_id: 新版本ID
+            user_id: 用户ID（用于权限检查）
+            context: 相同行块保留的上下文行数，None表示返回全部相同行
+            
+        Returns:
+            dict: 两个版本的id/version、差异列表ops、统计stats、是否完整complete和etag，
+                  版本不存在时返回None
+        """
+        try:
+            etag = PromptService.get_diff_etag(prompt_id, from_version_id, to_version_id, context)
+            if etag is None:
+                return None
+            
+            def load():
+                versions = PromptService._load_versions(prompt_id, [from_version_id, to_version_id])
+                if len(versions) != len({from_version_id, to_version_id}):
+                    return None
+                old, new = versions[from_version_id], versions[to_version_id]
+                result = diff_text(old['content'], new['content'],
+                                   timeout_ms=config.DIFF_TIMEOUT_MS, context=context)
+                if not result['complete']:
+                    logger.warning(f"版本比较超出时间预算: ID={prompt_id}, "
+                                   f"{from_version_id} -> {to_version_id}, 耗时{result['elapsed_ms']}ms")
+                result['from_version'] = {'id': old['id'], 'version': old['version']}
+                result['to_version'] = {'id': new['id'], 'version': new['version']}
+                result['etag'] = etag
+                return result
+            
+            # 超出时间预算的结果同样缓存：它仍是正确的差异，重新计算还会耗尽同样的预算
+            if not config.DIFF_CACHE_ENABLED:
+                return load()
+            return cache.get_or_load(f"prompt_diff:{int(from_version_id)}:{int(to_version_id)}:{etag}", load)
+        
+        except Exception as e:
+            logger.error(f"比较版本失败: ID={prompt_id}, {from_version_id} -> {to_version_id}, {str(e)}",
+                         exc_info=True)
+            return None
+    
+    @staticmethod
+    def get_diff_etag(prompt_id: int, from_version_id: int, to_version_id: int,
+                      context: Optional[int] = None) -> Optional[str]:
+        """
+        计算两个版本比较结果的校验标记（两个版本都未变化时不变）
+        
+        Args:
+            prompt_id: Prompt ID
+            from_version_id: 原版本ID
+            to_version_id: 新版本ID
+            context: 上下文行数
+            
+        Returns:
+            str: 校验标记，版本不存在时返回None
+        """
+        tokens = [PromptService.get_history_etag(prompt_id, v) for v in (from_version_id, to_version_id)]
+        if None in tokens:
+            return None
+        return hashlib.sha1(f"{tokens[0]}|{tokens[1]}|{context}".encode('utf-8')).hexdigest()[:20]
+    
+    @staticmethod
+    def get_history_etag(prompt_id: int, version_id: Optional[int] = None) -> Optional[str]:
+        """
+        计算版本历史或单个版本的校验标记（按主键查询一行，不读取内容）
+        历史列表只在创建新版本（版本号计数器变化）或修改当前版本内容时变化；
+        单个版本只在其内容被修改时变化
+        
+        Args:
+            prompt_id: Prompt ID
+            version_id: 版本ID，为None时计算整个版本历史的标记
+            
+        Returns:
+            str: 校验标记，Prompt或版本不存在时返回None
+        """
+        if version_id is None:
+            sql = """
+                SELECT p.current_version_id, p.version_major, p.version_minor,
+                       pv.content_id, pv.update_time
+                FROM prompts p
+                LEFT JOIN prompt_versions pv ON pv.id = p.current_version_id
+                WHERE p.id = %s
+            """
+            row = Database.select_one(sql, (prompt_id,), cache=False)
+            if not row:
+                return None
+            parts = (prompt_id, row['current_version_id'], row['version_major'], row['version_minor'],
+                     row['content_id'], row['update_time'])
+        else:
+            sql = """
+                SELECT id, content_id, base_version_id, update_time FROM prompt_versions
+                WHERE id = %s AND prompt_id = %s
+            """
+            row = Database.select_one(sql, (version_id, prompt_id), cache=False)
+            if not row:
+                return None
+            parts = (prompt_id, row['id'], row['content_id'], row['base_version_id'], row['update_time'])
+        return hashlib.sha1('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()[:20]
+    
+    @staticmethod
+    def analyze_content(content: str, session_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        分析Prompt内容：各提供商的Token估算、{{变量}}及其位置、字符和行统计
+        （结果按内容哈希缓存，内容不变时不重复计算）
+        
+        Args:
+            content: Prompt内容
+            session_key: 编辑会话键，提供时保留本次内容作为之后增量分析的基准
+            
+        Returns:
+            dict: 分析结果（content_hash、tokens、variables、stats）
+        """
+        return ContentAnalyzer.analyze(content, session_key)
+    
+    @staticmethod
+    def analyze_content_patch(session_key: str, base_hash: str, start: int, end: int,
+                              text: str) -> Dict[str, Any]:
+        """
+        增量分析Prompt内容：在会话中上一次分析的内容上应用修改，只重新统计修改所在的行
+        
+        Args:
+            session_key: 编辑会话键
+            base_hash: 上一次分析结果的content_hash
+            start: 替换起点（字符偏移）
+            end: 替换终点（字符偏移，不含）
+            text: 新文本
+            
+        Returns:
+            dict: 修改后内容的分析结果
+            
+        Raises:
+            AnalysisStateError: 会话不存在或基准内容不一致，需要重新发送完整内容
+            ValueError: 修改范围无效或内容过长
+        """
+        return ContentAnalyzer.analyze_patch(session_key, base_hash, start, end, text,
+                                             max_chars=config.ANALYSIS_MAX_CHARS)
+    
+    @staticmethod
+    def compact_version_history(prompt_id: int, expand: bool = False,
+                                dry_run: bool = False) -> Dict[str, Any]:
+        """
+        按当前配置重写一个Prompt的全部版本存储（迁移工具使用）
+        
+        Args:
+            prompt_id: Prompt ID
+            expand: 为True时全部改回完整内容（回滚差量存储）
+            dry_run: 为True时只计算不写入
+            
+        Returns:
+            dict: 版本数、改写的版本数、改写前后的内容字节数
+        """
+        try:
+            result = run_transaction(
+                PromptService._compact_version_history_tx, prompt_id, expand, dry_run
+            )
+            if result['rewritten'] and not dry_run:
+                invalidate_tables('prompt_versions', 'prompt_contents')
+            return result
+        
+        except Exception as e:
+            logger.error(f"重写版本存储失败: ID={prompt_id}, {str(e)}", exc_info=True)
+            return {'success': False, 'error': f'重写失败: {str(e)}'}
     
     @staticmethod
-    def _create_version(cursor, prompt_id: int, version: str, content: str, 
+    def _compact_version_history_tx(conn, prompt_id: int, expand: bool,
+                                    dry_run: bool) -> Dict[str, Any]:
+        """
+        重写版本存储的事务体（遇到死锁时会被重新执行）
+        
+        Args:
+            conn: 数据库连接
+            prompt_id: Prompt ID
+            expand: 是否全部改回完整内容
+            dry_run: 是否只计算不写入
+            
+        Returns:
+            dict: 重写统计
+        """
+        with conn.cursor() as cursor:
+            sql = "SELECT current_version_id FROM prompts WHERE id = %s FOR UPDATE"
+            cursor.execute(sql, (prompt_id,))
+            prompt = cursor.fetchone()
+            current_id = prompt['current_version_id'] if prompt else None
+            
+            sql = f"""
+                SELECT pv.id, {_CONTENT_COLUMNS}, pv.content_id, pv.base_version_id, pv.chain_depth,
+                       pv.content_size
+                {_VERSION_FROM}
+                WHERE pv.prompt_id = %s
+                ORDER BY pv.id
+                FOR UPDATE
+            """
+            cursor.execute(sql, (prompt_id,))
+            rows = [ContentStore.decode_row(row) for row in cursor.fetchall()]
+            contents = PromptService._resolve_contents(cursor, rows)
+            
+            stats = {'success': True, 'versions': len(rows), 'rewritten': 0,
+                     'bytes_before': 0, 'bytes_after': 0}
+            previous = None
+            for row in rows:
+                content = contents[row['id']]
+                delta = None
+                # 第一个版本和当前版本保存完整内容，其余版本按差量链长度决定是否保存快照
+                if (not expand and config.VERSION_DELTA_ENABLED and previous and row['id'] != current_id
+                        and previous['depth'] + 1 <= config.VERSION_MAX_DELTA_CHAIN):
+                    delta = compact_diff(contents[previous['id']], content)
+                
+                if delta is None:
+                    # 完整内容保存在prompt_contents
+                    depth = 0
+                    stored = content
+                    unchanged = row['content_id'] is not None and row['base_version_id'] is None
+                else:
+                    depth = previous['depth'] + 1
+                    stored = delta
+                    unchanged = row['content_id'] is None and \
+                        (row['content'], row['base_version_id'], row['chain_depth']) == (delta, previous['id'], depth)
+                
+                stats['bytes_before'] += len(row['content'].encode('utf-8'))
+                stats['bytes_after'] += len(stored.encode('utf-8'))
+                if not unchanged:
+                    stats['rewritten'] += 1
+                    if not dry_run:
+                        if delta is None:
+                            content_id = ContentStore.acquire(cursor, content)
+                            values = ('', content_id, None, 0, row['id'])
+                        else:
+                            values = (delta, None, previous['id'], depth, row['id'])
+                        sql = """
+                            UPDATE prompt_versions
+                            SET content = %s, content_id = %s, base_version_id = %s, chain_depth = %s,
+                                update_time = update_time
+                            WHERE id = %s
+                        """
+                        cursor.execute(sql, values)
+                        if row['content_id'] is not None:
+                            ContentStore.release(cursor, row['content_id'])
+                
+                # 补全迁移前版本的内容大小
+                size = len(content.encode('utf-8'))
+                if row['content_size'] != size and not dry_run:
+                    sql = "UPDATE prompt_versions SET content_size = %s, update_time = update_time WHERE id = %s"
+                    cursor.execute(sql, (size, row['id']))
+                previous = {'id': row['id'], 'depth': depth}
+            
+            return stats
+    
+    @staticmethod
+    def _create_version(cursor, prompt_id: int, version: Optional[str], content: str, 
                        author_id: int, is_current: bool = False, 
-                       change_log: str = '') -> Dict[str, Any]:
+                       change_log: str = '', major: bool = False) -> Dict[str, Any]:
         """
         创建新版本
         
         Args:
             cursor: 数据库游标
             prompt_id: Prompt ID
-            version: 版本号
+            version: 版本号，为None时由_allocate_version分配
             content: 内容
             author_id: 作者ID
             is_current: 是否为当前版本
             change_log: 变更日志
+            major: 分配版本号时是否升级主版本
             
         Returns:
             dict: 版本信息
         """
-        # 如果设为当前版本，先将其他版本设为非当前
+        # 如果设为当前版本，锁定Prompt行并读取原当前版本（同一Prompt的版本切换串行执行）
+        previous = None
         if is_current:
-            sql = "UPDATE prompt_versions SET is_current = 0 WHERE prompt_id = %s"
+            sql = f"""
+                SELECT pv.id, pv.version, pv.content_id, {_CONTENT_COLUMNS}
+                FROM prompts p
+                LEFT JOIN prompt_versions pv ON pv.id = p.current_version_id
+                LEFT JOIN prompt_contents pc ON pc.id = pv.content_id
+                WHERE p.id = %s
+                FOR UPDATE
+            """
             cursor.execute(sql, (prompt_id,))
+            previous = ContentStore.decode_row(cursor.fetchone())
+            if previous and previous['id'] is None:
+                previous = None
+            
+            # 内容与当前版本相同时不创建新版本
+            if previous and previous['content'] == content:
+                return {
+                    'id': previous['id'],
+                    'version': previous['version'],
+                    'unchanged': True
+                }
+        
+        # 内容不变时已返回，不会浪费版本号
+        if version is None:
+            version = PromptService._allocate_version(cursor, prompt_id, major)
         
-        # 插入新版本
+        # 插入新版本，完整内容按哈希去重保存
+        content_id = ContentStore.acquire(cursor, content)
         sql = """
-            INSERT INTO prompt_versions (prompt_id, version, content, 
-                                       change_log, is_current, author_id)
-            VALUES (%s, %s, %s, %s, %s, %s)
+            INSERT INTO prompt_versions (prompt_id, version, content, content_id,
+                                       content_size, change_log, author_id)
+            VALUES (%s, %s, '', %s, %s, %s, %s)
         """
         cursor.execute(sql, (
-            prompt_id, version, content, change_log, 
-            1 if is_current else 0, author_id
+            prompt_id, version, content_id, len(content.encode('utf-8')), change_log, author_id
         ))
+        version_id = cursor.lastrowid
+        
+        # 切换当前版本只需更新指针
+        if is_current:
+            sql = "UPDATE prompts SET current_version_id = %s WHERE id = %s"
+            cursor.execute(sql, (version_id, prompt_id))
+        
+        # 原当前版本成为历史版本，改为差量存储
+        if previous:
+            PromptService._store_as_delta(cursor, prompt_id, previous)
         
         return {
-            'id': cursor.lastrowid,
+            'id': version_id,
             'version': version
         }
     
     @staticmethod
-    def _get_next_version(cursor, prompt_id: int) -> str:
+    def _store_as_delta(cursor, prompt_id: int, version: Dict[str, Any]) -> None:
+        """
+        把一个历史版本改写为相对上一版本的差量
+        差量链达到VERSION_MAX_DELTA_CHAIN或差量不够紧凑时保留完整内容作为快照
+        
+        Args:
+            cursor: 数据库游标
+            prompt_id: Prompt ID
+            version: 版本（id、content_id和完整content）
+        """
+        if not config.VERSION_DELTA_ENABLED:
+            return
+        
+        sql = f"""
+            SELECT pv.id, {_CONTENT_COLUMNS}, pv.base_version_id, pv.chain_depth
+            {_VERSION_FROM}
+            WHERE pv.prompt_id = %s AND pv.id < %s
+            ORDER BY pv.id DESC
+            LIMIT 1
+        """
+        cursor.execute(sql, (prompt_id, version['id']))
+        base = ContentStore.decode_row(cursor.fetchone())
+        if not base or base['chain_depth'] + 1 > config.VERSION_MAX_DELTA_CHAIN:
+            return
+        
+        base_content = PromptService._resolve_contents(cursor, [base])[base['id']]
+        delta = compact_diff(base_content, version['content'])
+        if delta is None:
+            return
+        
+        sql = """
+            UPDATE prompt_versions
+            SET content = %s, content_id = NULL, base_version_id = %s, chain_depth = %s,
+                update_time = update_time
+            WHERE id = %s
+        """
+        cursor.execute(sql, (delta, base['id'], base['chain_depth'] + 1, version['id']))
+        if version['content_id'] is not None:
+            ContentStore.release(cursor, version['content_id'])
+    
+    @staticmethod
+    def _replace_current_content(cursor, prompt_id: int, content: str) -> Dict[str, Any]:
         """
-        获取下一个版本号
+        修改当前版本的内容（不创建新版本）
         
         Args:
             cursor: 数据库游标
             prompt_id: Prompt ID
+            content: 新内容
             
         Returns:
-            str: 下一个版本号
+            dict: 版本信息
         """
         sql = """
-            SELECT version FROM prompt_versions 
-            WHERE prompt_id = %s 
-            ORDER BY create_time DESC 
-            LIMIT 1
+            SELECT pv.id, pv.content_id
+            FROM prompts p
+            JOIN prompt_versions pv ON pv.id = p.current_version_id
+            WHERE p.id = %s
+            FOR UPDATE
         """
         cursor.execute(sql, (prompt_id,))
-        result = cursor.fetchone()
+        current = cursor.fetchone()
+        if not current:
+            return {'id': None}
         
-        if result:
-            current_version = result['version']
-            # 解析版本号（v1.0 -> v1.1）
-            match = re.match(r'v(\d+)\.(\d+)', current_version)
-            if match:
-                major = int(match.group(1))
-                minor = int(match.group(2))
-                return f'v{major}.{minor + 1}'
+        # 先引用新内容再释放旧内容，内容不变时不会被删除后重建
+        content_id = ContentStore.acquire(cursor, content)
+        sql = """
+            UPDATE prompt_versions 
+            SET content = '', content_id = %s, content_size = %s, update_time = NOW()
+            WHERE id = %s
+        """
+        cursor.execute(sql, (content_id, len(content.encode('utf-8')), current['id']))
+        if current['content_id'] is not None:
+            ContentStore.release(cursor, current['content_id'])
         
-        return 'v1.0'
+        return {'id': current['id']}
+    
+    @staticmethod
+    def _resolve_contents(cursor, rows: List[Dict[str, Any]]) -> Dict[int, str]:
+        """
+        还原版本的完整内容，沿差量链批量读取缺少的基准版本
+        
+        Args:
+            cursor: 数据库游标
+            rows: 版本行（id、content、base_version_id），content为完整内容或差量
+            
+        Returns:
+            dict: 版本ID -> 完整内容
+            
+        Raises:
+            ValueError: 差量链中的基准版本不存在
+        """
+        contents: Dict[int, str] = {}
+        deltas: Dict[int, Tuple[int, str]] = {}
+        
+        def add(row):
+            if row['base_version_id'] is None:
+                contents[row['id']] = row['content']
+            else:
+                deltas[row['id']] = (row['base_version_id'], row['content'])
+        
+        for row in rows:
+            add(row)
+        
+        # 每轮读取一层缺少的基准版本，最多VERSION_MAX_DELTA_CHAIN轮
+        missing = {b for b, _ in deltas.values() if b not in contents and b not in deltas}
+        while missing:
+            placeholders = ', '.join(['%s'] * len(missing))
+            sql = f"""
+                SELECT pv.id, {_CONTENT_COLUMNS}, pv.base_version_id
+                {_VERSION_FROM}
+                WHERE pv.id IN ({placeholders})
+            """
+            cursor.execute(sql, list(missing))
+            fetched = [ContentStore.decode_row(row) for row in cursor.fetchall()]
+            if len(fetched) != len(missing):
+                found = {row['id'] for row in fetched}
+                raise ValueError(f"差量基准版本不存在: {sorted(missing - found)}")
+            for row in fetched:
+                add(row)
+            missing = {b for b, _ in deltas.values() if b not in contents and b not in deltas}
+        
+        for version_id in list(deltas):
+            # 找到链上最近的已还原版本，再依次应用差量
+            chain = []
+            current = version_id
+            while current not in contents:
+                chain.append(current)
+                current = deltas[current][0]
+            for item in reversed(chain):
+                contents[item] = patch(contents[deltas[item][0]], deltas[item][1])
+        
+        return contents
+    
+    @staticmethod
+    def _allocate_version(cursor, prompt_id: int, major: bool = False) -> str:
+        """
+        在当前事务中分配下一个版本号
+        版本号计数器保存在prompts行上，自增更新会锁定该行，并发保存会依次得到不同的版本号
+        
+        Args:
+            cursor: 数据库游标
+            prompt_id: Prompt ID
+            major: 为True时升级主版本（v1.3 -> v2.0），否则升级次版本（v1.3 -> v1.4）
+            
+        Returns:
+            str: 版本号（如v1.4）
+        """
+        if major:
+            sql = """
+                UPDATE prompts
+                SET version_major = version_major + 1, version_minor = 0
+                WHERE id = %s
+            """
+        else:
+            sql = "UPDATE prompts SET version_minor = version_minor + 1 WHERE id = %s"
+        cursor.execute(sql, (prompt_id,))
+        
+        sql = "SELECT version_major, version_minor FROM prompts WHERE id = %s"
+        cursor.execute(sql, (prompt_id,))
+        counter = cursor.fetchone()
+        return f"v{counter['version_major']}.{counter['version_minor']}"
     
     
+    @staticmethod
+    def _normalize_tags(tags: List[str]) -> List[str]:
+        """
+        去掉空标签和首尾空白，去重并保持原有顺序
+        
+        Args:
+            tags: 标签列表
+            
+        Returns:
+            list: 整理后的标签名
+            
+        Raises:
+            ValueError: 标签超过最大长度（插入时会被截断，无法再按原名找到）
+        """
+        names = list(dict.fromkeys(t.strip() for t in tags if t and t.strip()))
+        if any(len(name) > _MAX_TAG_CHARS for name in names):
+            raise ValueError(f'标签不能超过{_MAX_TAG_CHARS}个字符')
+        return names
+    
+    @staticmethod
+    def _resolve_tag_ids(cursor, names: List[str]) -> Dict[str, int]:
+        """
+        把标签名换成标签字典ID，字典中没有的标签先插入
+        
+        Args:
+            cursor: 数据库游标
+            names: 标签名列表（已去重）
+            
+        Returns:
+            dict: 标签名到标签ID的映射
+            
+        Raises:
+            ValueError: 插入后仍找不到某个标签
+        """
+        if not names:
+            return {}
+        Database.bulk_insert('tags', ['name'], [(name,) for name in names],
+                             ignore=True, cursor=cursor)
+        
+        placeholders = ', '.join(['%s'] * len(names))
+        sql = f"SELECT id, name FROM tags WHERE name IN ({placeholders})"
+        cursor.execute(sql, names)
+        exact = {row['name']: row['id'] for row in cursor.fetchall()}
+        tag_ids = {name: exact.get(name) for name in names}
+        
+        # 排序规则认为相同的写法（大小写、重音、全角半角等）只保留字典中已有的那个，
+        # 逐个按数据库的排序规则查找
+        for name in names:
+            if tag_ids[name] is None:
+                cursor.execute("SELECT id FROM tags WHERE name = %s LIMIT 1", (name,))
+                row = cursor.fetchone()
+                tag_ids[name] = row['id'] if row else None
+        
+        missing = [name for name, tag_id in tag_ids.items() if tag_id is None]
+        if missing:
+            raise ValueError(f"标签写入失败: {', '.join(missing)}")
+        return tag_ids
+    
     @staticmethod
     def _save_tags(cursor, prompt_id: int, tags: List[str]) -> None:
         """
@@ -318,28 +1174,52 @@ class PromptService:
             prompt_id: Prompt ID
             tags: 标签列表
         """
-        for tag in tags:
-            if tag:
-                sql = """
-                    INSERT IGNORE INTO prompt_tags (prompt_id, tag_name) 
-                    VALUES (%s, %s)
-                """
-                cursor.execute(sql, (prompt_id, tag))
-                
+        tag_ids = PromptService._resolve_tag_ids(cursor, PromptService._normalize_tags(tags))
+        # 一条多行INSERT写入所有标签关联
+        rows = [(prompt_id, tag_id) for tag_id in dict.fromkeys(tag_ids.values())]
+        if rows:
+            Database.bulk_insert('prompt_tags', ['prompt_id', 'tag_id'], rows,
+                                 ignore=True, cursor=cursor)
     
     @staticmethod
     def _update_tags(cursor, prompt_id: int, tags: List[str]) -> None:
         """
         更新标签
+        与已有标签比较，只删除去掉的标签、插入新增的标签，标签未变化时不写入
         
         Args:
             cursor: 数据库游标
             prompt_id: Prompt ID
             tags: 标签列表
         """
-        # 删除旧标签
-        sql = "DELETE FROM prompt_tags WHERE prompt_id = %s"
+        names = PromptService._normalize_tags(tags)
+        
+        sql = """
+            SELECT pt.tag_id, t.name FROM prompt_tags pt
+            JOIN tags t ON t.id = pt.tag_id
+            WHERE pt.prompt_id = %s
+        """
         cursor.execute(sql, (prompt_id,))
+        existing = {row['name']: row['tag_id'] for row in cursor.fetchall()}
+        existing_ids = set(existing.values())
+        
+        # 只为新增的标签名查找（或创建）标签ID
+        new_names = [name for name in names if name not in existing]
+        wanted = {existing[name] for name in names if name in existing}
+        added = []
+        for tag_id in PromptService._resolve_tag_ids(cursor, new_names).values():
+            if tag_id not in wanted:
+                wanted.add(tag_id)
+                added.append(tag_id)
+        
+        removed = [tag_id for tag_id in existing_ids if tag_id not in wanted]
+        if removed:
+            placeholders = ', '.join(['%s'] * len(removed))
+            sql = f"DELETE FROM prompt_tags WHERE prompt_id = %s AND tag_id IN ({placeholders})"
+            cursor.execute(sql, [prompt_id] + removed)
         
-        # 保存新标签
-        PromptService._save_tags(cursor, prompt_id, tags)
\ No newline at end of file
+        added = [tag_id for tag_id in added if tag_id not in existing_ids]
+        if added:
+            Database.bulk_insert('prompt_tags', ['prompt_id', 'tag_id'],
+                                 [(prompt_id, tag_id) for tag_id in added],
+                                 ignore=True, cursor=cursor)
\ No newline at end of file
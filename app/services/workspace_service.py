@@ -2,10 +2,11 @@
 工作空间业务服务
 处理工作空间的创建、管理和成员管理
 """
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional
 from app.common.logger import get_logger
 from app.models import Workspace, WorkspaceMember
-from app.common.database import get_db_connection, Database
+from app.common.database import get_db_connection, Database, invalidate_tables
+from app.services.content_store import ContentStore
 
 logger = get_logger(__name__)
 
@@ -51,6 +52,7 @@ class WorkspaceService:
                     cursor.execute(sql, (workspace_id, user_id, 'owner'))
                     
                     conn.commit()
+                    invalidate_tables('workspaces', 'workspace_members')
                     
                     logger.info(f"创建个人工作空间成功: user_id={user_id}, workspace_id={workspace_id}")
                     return workspace_id
@@ -92,6 +94,7 @@ class WorkspaceService:
                     cursor.execute(sql, (workspace_id, owner_id, 'owner'))
                     
                     conn.commit()
+                    invalidate_tables('workspaces', 'workspace_members')
                     
                     logger.info(f"创建协作空间成功: workspace_id={workspace_id}")
                     
@@ -246,15 +249,133 @@ class WorkspaceService:
             return []
         
         sql = """
-            SELECT p.*, u.username, pv.version, pv.content,
+            SELECT p.*, u.username, pv.version, COALESCE(pc.content, pv.content) AS content, pc.content_zip,
                    ps.use_count, ps.test_count, ps.favorite_count
             FROM prompts p
             LEFT JOIN users u ON p.user_id = u.id
-            LEFT JOIN prompt_versions pv ON p.id = pv.prompt_id AND pv.is_current = 1
+            LEFT JOIN prompt_versions pv ON pv.id = p.current_version_id
+            LEFT JOIN prompt_contents pc ON pc.id = pv.content_id
             LEFT JOIN prompt_statistics ps ON p.id = ps.prompt_id
             WHERE p.workspace_id = %s AND p.status = 1
             ORDER BY p.update_time DESC
         """
         
         prompts = Database.select_all(sql, (workspace_id,))
-        return prompts if prompts else []
\ No newline at end of file
+        return [ContentStore.decode_row(p) for p in prompts] if prompts else []
+    
+    @staticmethod
+    def get_workspace_prompts_page(workspace_id: int, user_id: int, cursor: Optional[str] = None,
+                                   page_size: int = 20, total: str = 'cached',
+                                   tag: Optional[str] = None) -> Dict[str, Any]:
+        """
+        按键集分页获取工作空间的Prompt
+        按 (update_time, id) 倒序翻页，深翻页的代价与第一页相同
+        
+        Args:
+            workspace_id: 工作空间ID
+            user_id: 用户ID（用于权限检查）
+            cursor: 分页游标（上一页返回的next_cursor/prev_cursor）
+            page_size: 每页大小
+            total: 总数计算方式（exact/cached/approx/none）
+            tag: 只返回带有此标签的Prompt
+            
+        Returns:
+            dict: 包含data和pagination的分页结果
+        """
+        empty = {'data': [], 'pagination': {'page_size': page_size, 'total': 0,
+                                            'has_next': False, 'has_prev': False,
+                                            'next_cursor': None, 'prev_cursor': None}}
+        if not WorkspaceService.is_workspace_member(workspace_id, user_id):
+            return empty
+        
+        params = [workspace_id]
+        tag_filter = ''
+        if tag:
+            # 先把标签名换成整数ID，过滤走prompt_tags的(prompt_id, tag_id)唯一索引
+            row = Database.select_one("SELECT id FROM tags WHERE name = %s", (tag,))
+            if not row:
+                return empty
+            tag_filter = "AND EXISTS (SELECT 1 FROM prompt_tags pt WHERE pt.prompt_id = p.id AND pt.tag_id = %s)"
+            params.append(row['id'])
+        
+        sql = """
+            SELECT p.*, u.username, pv.version, COALESCE(pc.content, pv.content) AS content, pc.content_zip,
+                   ps.use_count, ps.test_count, ps.favorite_count
+            FROM prompts p
+            LEFT JOIN users u ON p.user_id = u.id
+            LEFT JOIN prompt_versions pv ON pv.id = p.current_version_id
+            LEFT JOIN prompt_contents pc ON pc.id = pv.content_id
+            LEFT JOIN prompt_statistics ps ON p.id = ps.prompt_id
+            WHERE p.workspace_id = %s AND p.status = 1 {tag_filter}
+        """
+        
+        page = Database.select_page(
+            sql.format(tag_filter=tag_filter), tuple(params), page_size=page_size,
+            keyset=[('update_time', 'DESC'), ('id', 'DESC')],
+            cursor=cursor, total=total
+        )
+        page['data'] = [ContentStore.decode_row(p) for p in page['data']]
+        return page
+    
+    @staticmethod
+    def get_workspace_tag_counts(workspace_id: int, user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        统计工作空间内各标签的Prompt数
+        按整数tag_id分组计数，最后才关联标签字典取名称
+        
+        Args:
+            workspace_id: 工作空间ID
+            user_id: 用户ID（用于权限检查）
+            limit: 最多返回的标签数
+            
+        Returns:
+            list: 按Prompt数倒序的标签列表，包含id、name和prompt_count
+        """
+        if not WorkspaceService.is_workspace_member(workspace_id, user_id):
+            return []
+        
+        sql = """
+            SELECT t.id, t.name, c.prompt_count
+            FROM (
+                SELECT pt.tag_id, COUNT(*) AS prompt_count
+                FROM prompt_tags pt
+                JOIN prompts p ON p.id = pt.prompt_id
+                WHERE p.workspace_id = %s AND p.status = 1
+                GROUP BY pt.tag_id
+            ) c
+            JOIN tags t ON t.id = c.tag_id
+            ORDER BY c.prompt_count DESC, t.id
+            LIMIT %s
+        """
+        
+        return Database.select_all(sql, (workspace_id, limit)) or []
+    
+    @staticmethod
+    def iter_workspace_prompts(workspace_id: int, user_id: int,
+                               batch_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """
+        流式遍历工作空间的所有Prompt（用于导出等大批量场景）
+        使用服务端游标分批读取，内存占用只与batch_size有关
+        
+        Args:
+            workspace_id: 工作空间ID
+            user_id: 用户ID（用于权限检查）
+            batch_size: 每批返回的行数
+            
+        Yields:
+            list: 一批Prompt记录
+        """
+        if not WorkspaceService.is_workspace_member(workspace_id, user_id):
+            return
+        
+        sql = """
+            SELECT p.*, pv.version, COALESCE(pc.content, pv.content) AS content, pc.content_zip
+            FROM prompts p
+            LEFT JOIN prompt_versions pv ON pv.id = p.current_version_id
+            LEFT JOIN prompt_contents pc ON pc.id = pv.content_id
+            WHERE p.workspace_id = %s AND p.status = 1
+            ORDER BY p.update_time DESC, p.id DESC
+        """
+        
+        for batch in Database.stream(sql, (workspace_id,), batch_size=batch_size):
+            yield [ContentStore.decode_row(p) for p in batch]
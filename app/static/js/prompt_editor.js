@@ -10,6 +10,13 @@ let hasUnsavedChanges = false;
 let autoSaveTimer = null;
 let testRunning = false;
 
+// 内容分析：服务端保留上一次分析的内容，之后只发送修改片段
+const analysisSessionId = Math.random().toString(36).slice(2) + Date.now().toString(36);
+let analyzedContent = null;
+let analyzedHash = null;
+let analysisRunning = false;
+let lastAnalysis = null;
+
 /**
  * 初始化Prompt编辑器
  */
@@ -30,6 +37,9 @@ function initPromptEditor(promptData, isNew) {
     
     // 设置快捷键
     setupKeyboardShortcuts();
+    
+    // 设置内容分析
+    setupContentAnalysis();
 }
 
 /**
@@ -51,6 +61,89 @@ function setupAutoSave() {
     }, 1000);
 }
 
+/**
+ * 设置内容分析：每秒检查一次，内容变化后请求分析
+ */
+function setupContentAnalysis() {
+    setInterval(() => {
+        const content = document.getElementById('promptContent').value;
+        if (currentPromptId && !analysisRunning && content !== analyzedContent) {
+            analyzeContent(content);
+        }
+    }, 1000);
+}
+
+/**
+ * 计算从旧内容到新内容的单个替换片段（公共前缀和后缀之外的部分）
+ * 偏移按Unicode码点计算，与服务端的字符偏移一致
+ */
+function computeContentPatch(oldText, newText) {
+    let prefix = 0;
+    const maxPrefix = Math.min(oldText.length, newText.length);
+    while (prefix < maxPrefix && oldText.charCodeAt(prefix) === newText.charCodeAt(prefix)) {
+        prefix++;
+    }
+    let suffix = 0;
+    const maxSuffix = maxPrefix - prefix;
+    while (suffix < maxSuffix &&
+           oldText.charCodeAt(oldText.length - 1 - suffix) === newText.charCodeAt(newText.length - 1 - suffix)) {
+        suffix++;
+    }
+    // 不拆开代理对
+    if (prefix > 0 && /[\uD800-\uDBFF]/.test(oldText[prefix - 1])) {
+        prefix--;
+    }
+    if (suffix > 0 && /[\uDC00-\uDFFF]/.test(oldText[oldText.length - suffix])) {
+        suffix--;
+    }
+    const codePoints = (text, end) => end - (text.slice(0, end).match(/[\uDC00-\uDFFF]/g) || []).length;
+    return {
+        start: codePoints(oldText, prefix),
+        end: codePoints(oldText, oldText.length - suffix),
+        text: newText.slice(prefix, newText.length - suffix)
+    };
+}
+
+/**
+ * 请求内容分析：已有基准时只发送修改片段，服务端返回409时改为发送完整内容
+ */
+async function analyzeContent(content) {
+    analysisRunning = true;
+    try {
+        const send = (body) => fetch(`/prompt/api/${currentPromptId}/analyze`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ session_id: analysisSessionId, ...body })
+        });
+        
+        let response;
+        if (analyzedHash !== null) {
+            response = await send({ base_hash: analyzedHash, patch: computeContentPatch(analyzedContent, content) });
+        }
+        if (!response || response.status === 409) {
+            response = await send({ content });
+        }
+        
+        const result = await response.json();
+        if (result.success) {
+            analyzedContent = content;
+            analyzedHash = result.analysis.content_hash;
+            lastAnalysis = result.analysis;
+            document.dispatchEvent(new CustomEvent('promptAnalysis', { detail: result.analysis }));
+        } else {
+            // 下次重新发送完整内容
+            analyzedContent = content;
+            analyzedHash = null;
+        }
+    } catch (error) {
+        console.error('Analyze error:', error);
+    } finally {
+        analysisRunning = false;
+    }
+}
+
 /**
  * 设置变化监听器
  */
@@ -0,0 +1,30 @@
+"""
+Prompt模板渲染基准测试
+编译一次模板后批量渲染多行变量，输出每秒渲染行数
+
+用法: python benchmarks/bench_render.py [行数]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.common.template import compile_template
+
+
+def main(count: int = 20000) -> None:
+    """渲染count行并打印耗时"""
+    plan = compile_template('{"a": 1} {{ name }}, {{name}}! {{doc.title}} {{产品}} {0}')
+    rows = [{'name': str(i), 'doc': {'title': 't'}, '产品': i} for i in range(count)]
+
+    started = time.monotonic()
+    rendered = sum(1 for row in rows if plan.render(row)['success'])
+    elapsed = time.monotonic() - started
+    print(f"渲染{rendered}/{count}行, 耗时{elapsed * 1000:.1f}ms, {count / elapsed:.0f}行/秒")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,7 @@
+-- ====================================
+-- 增量迁移 002: Prompt键集分页索引
+-- 说明: 为按 (update_time, id) 倒序的键集分页添加复合索引
+-- 使用方法: mysql -h<host> -u<user> -p<password> prompt_db < migrations/002_prompt_keyset_index.sql
+-- ====================================
+
+CREATE INDEX idx_workspace_status_update ON prompts(workspace_id, status, update_time, id);
@@ -0,0 +1,11 @@
+-- ====================================
+-- 增量迁移 003: Prompt版本差量存储
+-- 说明: 历史版本改为保存相对上一版本的差量，定期保存完整快照
+-- 使用方法: mysql -h<host> -u<user> -p<password> prompt_db < migrations/003_prompt_version_delta.sql
+--          然后执行 python migrations/rewrite_version_storage.py 把已有历史改写为差量格式
+-- ====================================
+
+ALTER TABLE prompt_versions
+    MODIFY COLUMN `content` TEXT NOT NULL COMMENT 'Prompt内容（base_version_id不为空时为相对基准版本的差量）',
+    ADD COLUMN `base_version_id` BIGINT UNSIGNED DEFAULT NULL COMMENT '差量基准版本ID（NULL表示content为完整内容）' AFTER `content`,
+    ADD COLUMN `chain_depth` SMALLINT UNSIGNED NOT NULL DEFAULT 0 COMMENT '距最近完整快照的差量层数' AFTER `base_version_id`;
@@ -0,0 +1,21 @@
+-- ====================================
+-- 增量迁移 004: Prompt版本内容去重
+-- 说明: 完整内容按SHA-256哈希保存在prompt_contents表，版本通过content_id引用，并维护引用计数
+-- 使用方法: mysql -h<host> -u<user> -p<password> prompt_db < migrations/004_prompt_content_dedup.sql
+--          然后执行 python migrations/rewrite_version_storage.py 把已有版本的完整内容移入prompt_contents
+--          （未迁移的版本仍从prompt_versions.content读取，可以在服务运行时逐步迁移）
+-- ====================================
+
+CREATE TABLE IF NOT EXISTS `prompt_contents` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '内容ID',
+    `content_hash` CHAR(64) NOT NULL COMMENT '内容SHA-256哈希',
+    `content` TEXT NOT NULL COMMENT '完整内容',
+    `ref_count` INT NOT NULL DEFAULT 0 COMMENT '引用此内容的版本数',
+    `create_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_content_hash` (`content_hash`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Prompt内容表（按内容哈希去重）';
+
+ALTER TABLE prompt_versions
+    ADD COLUMN `content_id` BIGINT UNSIGNED DEFAULT NULL COMMENT '完整内容ID（关联prompt_contents，此时content为空）' AFTER `content`,
+    ADD KEY `idx_content_id` (`content_id`);
@@ -0,0 +1,10 @@
+-- ====================================
+-- 增量迁移 005: 大内容压缩保存
+-- 说明: 超过阈值的完整内容用zlib压缩保存在content_zip，content置空
+-- 使用方法: mysql -h<host> -u<user> -p<password> prompt_db < migrations/005_prompt_content_compression.sql
+--          然后执行 python migrations/rewrite_version_storage.py --compress 压缩已有的大内容
+-- ====================================
+
+ALTER TABLE prompt_contents
+    MODIFY COLUMN `content` TEXT NOT NULL COMMENT '完整内容（压缩保存时为空）',
+    ADD COLUMN `content_zip` MEDIUMBLOB DEFAULT NULL COMMENT 'zlib压缩的完整内容（超过阈值时使用）' AFTER `content`;
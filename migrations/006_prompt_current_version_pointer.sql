@@ -0,0 +1,40 @@
+-- ====================================
+-- 增量迁移 006: 当前版本指针
+-- 说明: prompts.current_version_id指向当前版本，取代prompt_versions.is_current标记；
+--      切换版本只更新prompts中的一行，读取当前版本按主键关联
+-- 使用方法: mysql -h<host> -u<user> -p<password> prompt_db < migrations/006_prompt_current_version_pointer.sql
+--          第一、二步在部署新版本时执行（期间暂停Prompt编辑，避免旧版本创建的版本没有回填指针）；
+--          第三步删除is_current，在旧版本全部下线后执行
+-- ====================================
+
+-- 第一步：添加指针字段
+ALTER TABLE prompts
+    ADD COLUMN `current_version_id` BIGINT UNSIGNED DEFAULT NULL COMMENT '当前版本ID' AFTER `workspace_id`;
+
+-- 第二步：回填指针（保持update_time不变）
+-- 优先使用is_current = 1的版本（存在多个时取最新的）
+UPDATE prompts p
+JOIN (
+    SELECT prompt_id, MAX(id) AS version_id
+    FROM prompt_versions
+    WHERE is_current = 1
+    GROUP BY prompt_id
+) cur ON cur.prompt_id = p.id
+SET p.current_version_id = cur.version_id, p.update_time = p.update_time
+WHERE p.current_version_id IS NULL;
+
+-- 没有当前版本标记的Prompt使用最新的版本
+UPDATE prompts p
+JOIN (
+    SELECT prompt_id, MAX(id) AS version_id
+    FROM prompt_versions
+    GROUP BY prompt_id
+) latest ON latest.prompt_id = p.id
+SET p.current_version_id = latest.version_id, p.update_time = p.update_time
+WHERE p.current_version_id IS NULL;
+
+-- 第三步：删除is_current标记及其索引
+ALTER TABLE prompt_versions
+    DROP INDEX `idx_is_current`,
+    DROP INDEX `idx_version_prompt_current`,
+    DROP COLUMN `is_current`;
@@ -0,0 +1,23 @@
+-- ====================================
+-- 增量迁移 007: 版本号计数器
+-- 说明: 版本号改为由prompts行上的计数器在事务中自增分配，取代按创建时间查找最新版本号
+-- 使用方法: mysql -h<host> -u<user> -p<password> prompt_db < migrations/007_prompt_version_counter.sql
+-- ====================================
+
+ALTER TABLE prompts
+    ADD COLUMN `version_major` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '最新分配的主版本号' AFTER `current_version_id`,
+    ADD COLUMN `version_minor` INT UNSIGNED NOT NULL DEFAULT 0 COMMENT '最新分配的次版本号' AFTER `version_major`;
+
+-- 回填：取每个Prompt已有的最大版本号（按主版本、次版本比较，保持update_time不变）
+UPDATE prompts p
+JOIN (
+    SELECT prompt_id,
+           MAX(CAST(SUBSTRING_INDEX(SUBSTRING(version, 2), '.', 1) AS UNSIGNED) * 1000000
+               + CAST(SUBSTRING_INDEX(version, '.', -1) AS UNSIGNED)) AS latest
+    FROM prompt_versions
+    WHERE version REGEXP '^v[0-9]+\\.[0-9]+$'
+    GROUP BY prompt_id
+) v ON v.prompt_id = p.id
+SET p.version_major = FLOOR(v.latest / 1000000),
+    p.version_minor = MOD(v.latest, 1000000),
+    p.update_time = p.update_time;
@@ -0,0 +1,52 @@
+-- ====================================
+-- 增量迁移 008: 标签字典表
+-- 说明: 标签名移入tags字典表，prompt_tags改为按整数tag_id关联，
+--      按标签筛选和统计改为比较整数键
+-- 使用方法: mysql -h<host> -u<user> -p<password> prompt_db < migrations/008_tag_dictionary.sql
+--          第一、二步在部署新版本前执行；第三步在旧版本全部下线后执行
+--          （第三步开头会再回填一次，补上部署期间旧版本写入的标签）
+-- ====================================
+
+-- 第一步：创建标签字典表，prompt_tags添加tag_id（新版本不再写入tag_name，先允许为空）
+CREATE TABLE IF NOT EXISTS `tags` (
+    `id` INT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '标签ID',
+    `name` VARCHAR(50) NOT NULL COMMENT '标签名称',
+    `create_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_name` (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='标签字典表';
+
+ALTER TABLE prompt_tags
+    ADD COLUMN `tag_id` INT UNSIGNED DEFAULT NULL COMMENT '标签字典ID（tags.id）' AFTER `prompt_id`,
+    MODIFY COLUMN `tag_name` VARCHAR(50) DEFAULT NULL COMMENT '标签名称（已移入tags表，待删除）';
+
+-- 第二步：回填标签字典和tag_id
+INSERT IGNORE INTO tags (name)
+SELECT DISTINCT tag_name FROM prompt_tags WHERE tag_name IS NOT NULL;
+
+UPDATE prompt_tags pt
+JOIN tags t ON t.name = pt.tag_name
+SET pt.tag_id = t.id
+WHERE pt.tag_id IS NULL;
+
+-- 第三步：再回填一次，删除重复关联和tag_name，建立整数键索引
+INSERT IGNORE INTO tags (name)
+SELECT DISTINCT tag_name FROM prompt_tags WHERE tag_id IS NULL AND tag_name IS NOT NULL;
+
+UPDATE prompt_tags pt
+JOIN tags t ON t.name = pt.tag_name
+SET pt.tag_id = t.id
+WHERE pt.tag_id IS NULL;
+
+DELETE pt1 FROM prompt_tags pt1
+JOIN prompt_tags pt2 ON pt2.prompt_id = pt1.prompt_id AND pt2.tag_id = pt1.tag_id AND pt2.id < pt1.id;
+
+ALTER TABLE prompt_tags
+    DROP INDEX `uk_prompt_tag`,
+    DROP INDEX `idx_prompt_id`,
+    DROP INDEX `idx_tag_name`,
+    DROP COLUMN `tag_name`,
+    MODIFY COLUMN `tag_id` INT UNSIGNED NOT NULL COMMENT '标签字典ID（tags.id）',
+    ADD UNIQUE KEY `uk_prompt_tag` (`prompt_id`, `tag_id`),
+    ADD KEY `idx_tag_id` (`tag_id`, `prompt_id`),
+    COMMENT = 'Prompt标签关联表';
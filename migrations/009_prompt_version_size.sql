@@ -0,0 +1,20 @@
+-- ====================================
+-- 增量迁移 009: 版本内容大小
+-- 说明: prompt_versions.content_size记录完整内容的字节数，版本历史列表只返回元数据，
+--      不必为了显示大小读取内容
+-- 使用方法: mysql -h<host> -u<user> -p<password> prompt_db < migrations/009_prompt_version_size.sql
+--          差量保存和压缩保存的版本无法在SQL中得到大小，执行后运行
+--          python migrations/rewrite_version_storage.py 补全（补全前列表中这些版本的大小为null）
+-- ====================================
+
+ALTER TABLE prompt_versions
+    ADD COLUMN `content_size` INT UNSIGNED DEFAULT NULL COMMENT '完整内容的UTF-8字节数（版本历史列表展示，不必还原内容）' AFTER `chain_depth`;
+
+-- 回填完整保存且未压缩的版本（保持update_time不变）
+UPDATE prompt_versions pv
+LEFT JOIN prompt_contents pc ON pc.id = pv.content_id
+SET pv.content_size = OCTET_LENGTH(COALESCE(pc.content, pv.content)),
+    pv.update_time = pv.update_time
+WHERE pv.base_version_id IS NULL
+  AND pv.content_size IS NULL
+  AND (pc.id IS NULL OR pc.content_zip IS NULL);
@@ -51,6 +51,9 @@ CREATE TABLE IF NOT EXISTS `prompts` (
     `category` VARCHAR(50) DEFAULT 'general' COMMENT '分类（marketing/customer-service/product/code/creative/analysis）',
     `user_id` BIGINT UNSIGNED NOT NULL COMMENT '创建用户ID',
     `workspace_id` BIGINT UNSIGNED NOT NULL COMMENT '所属工作空间ID',
+    `current_version_id` BIGINT UNSIGNED DEFAULT NULL COMMENT '当前版本ID',
+    `version_major` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '最新分配的主版本号',
+    `version_minor` INT UNSIGNED NOT NULL DEFAULT 0 COMMENT '最新分配的次版本号',
     `status` TINYINT DEFAULT 1 COMMENT '状态（0:删除 1:正常）',
     `create_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     `update_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
@@ -71,9 +74,12 @@ CREATE TABLE IF NOT EXISTS `prompt_versions` (
     `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '版本ID',
     `prompt_id` BIGINT UNSIGNED NOT NULL COMMENT 'Prompt ID',
     `version` VARCHAR(20) NOT NULL COMMENT '版本号（如：v1.0, v1.1）',
-    `content` TEXT NOT NULL COMMENT 'Prompt内容',
+    `content` TEXT NOT NULL COMMENT 'Prompt内容（base_version_id不为空时为相对基准版本的差量）',
+    `content_id` BIGINT UNSIGNED DEFAULT NULL COMMENT '完整内容ID（关联prompt_contents，此时content为空）',
+    `base_version_id` BIGINT UNSIGNED DEFAULT NULL COMMENT '差量基准版本ID（NULL表示content为完整内容）',
+    `chain_depth` SMALLINT UNSIGNED NOT NULL DEFAULT 0 COMMENT '距最近完整快照的差量层数',
+    `content_size` INT UNSIGNED DEFAULT NULL COMMENT '完整内容的UTF-8字节数（版本历史列表展示，不必还原内容）',
     `change_log` TEXT COMMENT '版本变更说明',
-    `is_current` TINYINT DEFAULT 0 COMMENT '是否为当前版本（0:否 1:是）',
     `published_at` DATETIME DEFAULT NULL COMMENT '发布时间',
     `author_id` BIGINT UNSIGNED NOT NULL COMMENT '版本作者ID',
     `create_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
@@ -81,8 +87,8 @@ CREATE TABLE IF NOT EXISTS `prompt_versions` (
     PRIMARY KEY (`id`),
     UNIQUE KEY `uk_prompt_version` (`prompt_id`, `version`),
     KEY `idx_prompt_id` (`prompt_id`),
-    KEY `idx_is_current` (`is_current`),
     KEY `idx_author_id` (`author_id`),
+    KEY `idx_content_id` (`content_id`),
     KEY `idx_create_time` (`create_time`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Prompt版本管理表';
 
@@ -92,19 +98,44 @@ CREATE TABLE IF NOT EXISTS `prompt_versions` (
 CREATE TABLE IF NOT EXISTS `prompt_tags` (
     `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '标签ID',
     `prompt_id` BIGINT UNSIGNED NOT NULL COMMENT 'Prompt ID',
-    `tag_name` VARCHAR(50) NOT NULL COMMENT '标签名称',
+    `tag_id` INT UNSIGNED NOT NULL COMMENT '标签字典ID（tags.id）',
     `create_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     PRIMARY KEY (`id`),
-    UNIQUE KEY `uk_prompt_tag` (`prompt_id`, `tag_name`),
-    KEY `idx_prompt_id` (`prompt_id`),
-    KEY `idx_tag_name` (`tag_name`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Prompt标签表';
+    UNIQUE KEY `uk_prompt_tag` (`prompt_id`, `tag_id`),
+    KEY `idx_tag_id` (`tag_id`, `prompt_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Prompt标签关联表';
+
+-- ====================================
+-- 6. prompt_contents 表 - Prompt内容表
+-- ====================================
+CREATE TABLE IF NOT EXISTS `prompt_contents` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '内容ID',
+    `content_hash` CHAR(64) NOT NULL COMMENT '内容SHA-256哈希',
+    `content` TEXT NOT NULL COMMENT '完整内容（压缩保存时为空）',
+    `content_zip` MEDIUMBLOB DEFAULT NULL COMMENT 'zlib压缩的完整内容（超过阈值时使用）',
+    `ref_count` INT NOT NULL DEFAULT 0 COMMENT '引用此内容的版本数',
+    `create_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_content_hash` (`content_hash`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Prompt内容表（按内容哈希去重）';
+
+-- ====================================
+-- 7. tags 表 - 标签字典表
+-- ====================================
+CREATE TABLE IF NOT EXISTS `tags` (
+    `id` INT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '标签ID',
+    `name` VARCHAR(50) NOT NULL COMMENT '标签名称',
+    `create_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_name` (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='标签字典表';
 
 -- ====================================
 -- 创建索引优化查询性能
 -- ====================================
 CREATE INDEX idx_prompt_user_status ON prompts(user_id, status);
-CREATE INDEX idx_version_prompt_current ON prompt_versions(prompt_id, is_current);
+-- 键集分页：按 (update_time, id) 倒序翻页工作空间内的Prompt
+CREATE INDEX idx_workspace_status_update ON prompts(workspace_id, status, update_time, id);
 
 -- ====================================
 -- 插入初始数据
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Prompt版本存储重写工具
+按当前配置把已有版本改写为新的存储格式（迁移003差量存储、004内容去重后执行）：
+历史版本改为差量，完整内容移入prompt_contents按哈希去重，最后校正引用计数并回收无引用的内容；
+指定--compress时再按当前阈值压缩已有的大内容（迁移005后执行）；
+同时补全迁移009无法回填的版本内容大小
+
+使用方法:
+    python migrations/rewrite_version_storage.py             # 改写为差量格式
+    python migrations/rewrite_version_storage.py --dry-run   # 只统计可节省的空间
+    python migrations/rewrite_version_storage.py --expand    # 全部改回完整内容（回滚差量存储前执行）
+    python migrations/rewrite_version_storage.py --compress  # 同时压缩已有的大内容
+
+每个Prompt在单独的事务中改写，可以在服务运行时执行，中断后重新执行即可
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# 将项目根目录添加到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.common.database import Database, init_database, close_database
+from app.common.logger import get_logger
+from app.services.prompt_service import PromptService
+from app.services.content_store import ContentStore
+
+logger = get_logger(__name__)
+
+
+def main():
+    """
+    主函数
+    按Prompt ID分批遍历，逐个改写版本存储
+    """
+    parser = argparse.ArgumentParser(description='按当前配置重写Prompt版本存储')
+    parser.add_argument('--expand', action='store_true', help='全部改回完整内容')
+    parser.add_argument('--dry-run', action='store_true', help='只统计不写入')
+    parser.add_argument('--compress', action='store_true', help='压缩已有的大内容')
+    parser.add_argument('--batch-size', type=int, default=500, help='每批读取的Prompt数')
+    args = parser.parse_args()
+
+    if not init_database():
+        return 1
+
+    totals = {'prompts': 0, 'versions': 0, 'rewritten': 0, 'bytes_before': 0, 'bytes_after': 0}
+    failed = []
+    last_id = 0
+    try:
+        while True:
+            rows = Database.select_all(
+                "SELECT id FROM prompts WHERE id > %s ORDER BY id LIMIT %s",
+                (last_id, args.batch_size), readonly=False
+            )
+            if not rows:
+                break
+            for row in rows:
+                result = PromptService.compact_version_history(row['id'], args.expand, args.dry_run)
+                if not result['success']:
+                    failed.append(row['id'])
+                    continue
+                totals['prompts'] += 1
+                for key in ('versions', 'rewritten', 'bytes_before', 'bytes_after'):
+                    totals[key] += result[key]
+            last_id = rows[-1]['id']
+            logger.info(f"已处理到Prompt ID={last_id}: {totals}")
+
+        if not args.dry_run and not ContentStore.collect_garbage()['success']:
+            failed.append('gc')
+        if args.compress and not args.dry_run and not ContentStore.compress_existing(args.batch_size)['success']:
+            failed.append('compress')
+    finally:
+        close_database()
+
+    saved = totals['bytes_before'] - totals['bytes_after']
+    logger.info(
+        f"{'[dry-run] ' if args.dry_run else ''}完成: {totals['prompts']}个Prompt, "
+        f"{totals['versions']}个版本, 改写{totals['rewritten']}个, "
+        f"内容{totals['bytes_before']}字节 -> {totals['bytes_after']}字节（节省{saved}字节）"
+    )
+    if failed:
+        logger.error(f"{len(failed)}个Prompt改写失败，可重新执行: {failed[:20]}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""
+测试公共夹具
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import app.common.database as database
+from app.common.cache import cache
+from app.config import config
+
+
+@pytest.fixture
+def sqlite_db(monkeypatch):
+    """切换到临时SQLite数据库"""
+    monkeypatch.setattr(config, 'DB_BACKEND', 'sqlite')
+    monkeypatch.setattr(config, 'DB_SQLITE_PATH', ':memory:')
+    monkeypatch.setattr(config, 'DB_REPLICAS', '')
+    monkeypatch.setattr(database, '_backend', None)
+    monkeypatch.setattr(database, '_db_pool', None)
+    monkeypatch.setattr(database, '_replica_set', None)
+    monkeypatch.setattr(database, '_query_cache', None)
+    monkeypatch.setattr(database, '_max_packet', None)
+    # 每个测试使用新的数据库，ID会重复，清空对象缓存
+    cache.clear()
+    assert database.init_database()
+    yield
+    database.close_database()
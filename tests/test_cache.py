@@ -0,0 +1,105 @@
+"""
+对象缓存单元测试
+测试读穿透、并发加载合并、代数失效，以及Prompt详情缓存的失效
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.common.cache import Cache
+from app.services.prompt_service import PromptService
+
+
+def test_get_or_load_returns_copies():
+    """测试命中后不再调用loader，且每次返回独立的副本"""
+    cache = Cache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {'tags': ['a']}
+
+    first = cache.get_or_load('k', loader)
+    first['tags'].append('b')
+    assert cache.get_or_load('k', loader) == {'tags': ['a']}
+    assert len(calls) == 1
+    assert cache.get_or_load('missing', lambda: None) is None
+    assert cache.stats()['local_hits'] == 1
+
+
+def test_concurrent_loads_are_coalesced():
+    """测试同一个键并发未命中时只加载一次"""
+    cache = Cache()
+    calls = []
+    started = threading.Event()
+
+    def loader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', loader)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 7
+
+
+def test_invalidate_during_load_discards_stale_value():
+    """测试失效前开始、失效后才完成的加载不会写入缓存"""
+    cache = Cache()
+    version = {'value': 'old'}
+
+    def slow_loader():
+        value = version['value']
+        cache.invalidate('k')  # 模拟加载期间另一个请求提交了修改
+        version['value'] = 'new'
+        return value
+
+    assert cache.get_or_load('k', slow_loader) == 'old'
+    assert cache.get_or_load('k', lambda: version['value']) == 'new'
+
+
+def test_prompt_cache_invalidated_on_update(sqlite_db):
+    """测试Prompt详情缓存命中，以及更新后失效"""
+    prompt_id = PromptService.create_prompt(1, 1, '标题', '内容', tags=['a'])['prompt_id']
+
+    assert PromptService.get_prompt(prompt_id)['title'] == '标题'
+    assert PromptService.get_prompt(prompt_id)['title'] == '标题'
+
+    assert PromptService.update_prompt(prompt_id, 1, title='新标题', tags=['b'])['success']
+    prompt = PromptService.get_prompt(prompt_id)
+    assert prompt['title'] == '新标题'
+    assert prompt['tags'] == ['b']
+
+
+def test_local_cache_ttl_shortened_with_multiple_workers(monkeypatch):
+    """测试多worker只使用进程内缓存时有效期缩短为CACHE_LOCAL_TTL"""
+    from flask import Flask
+    from app.common.cache import config
+
+    monkeypatch.setattr(config, 'CACHE_BACKEND', 'local')
+    monkeypatch.setattr(config, 'CACHE_TIMEOUT', 300)
+    monkeypatch.setattr(config, 'CACHE_LOCAL_TTL', 5)
+
+    monkeypatch.setattr(config, 'WORKERS', 1)
+    cache = Cache()
+    cache.init_app(Flask(__name__))
+    assert cache.ttl == 300
+
+    monkeypatch.setattr(config, 'WORKERS', 4)
+    cache = Cache()
+    cache.init_app(Flask(__name__))
+    assert cache.ttl == 5
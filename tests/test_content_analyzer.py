@@ -0,0 +1,130 @@
+"""
+Prompt内容分析单元测试
+"""
+
+import random
+import sys
+from pathlib import Path
+
+from flask import Flask
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import content_analyzer
+from app.services.content_analyzer import (ContentAnalyzer, apply_patch, count_segment, find_variables,
+                                           merge_counts)
+from app.routes.prompt_editor import prompt_editor_bp
+
+
+def test_analyze_variables_stats_and_tokens():
+    """测试变量位置、字符和行统计，以及各提供商的Token估算"""
+    ContentAnalyzer.clear_cache()
+    content = '你好，{{name}}！\nPlease read {{ doc.title }} twice.\n{{name}}\n{{1bad}}'
+    result = ContentAnalyzer.analyze(content)
+
+    names = {v['name']: v for v in result['variables']}
+    assert list(names) == ['name', 'doc.title']
+    assert names['name']['count'] == 2
+    assert names['name']['positions'][0] == {'start': 3, 'end': 11, 'line': 1, 'column': 4}
+    assert names['name']['positions'][1]['line'] == 3
+    assert names['name']['positions'][1]['column'] == 1
+    assert names['doc.title']['positions'][0]['line'] == 2
+    assert content[names['doc.title']['positions'][0]['start']:names['doc.title']['positions'][0]['end']] \
+        == '{{ doc.title }}'
+
+    stats = result['stats']
+    assert stats['characters'] == len(content)
+    assert stats['bytes'] == len(content.encode('utf-8'))
+    assert stats['lines'] == 4
+    assert stats['cjk_characters'] == 2
+    assert stats['variable_count'] == 2 and stats['variable_occurrences'] == 3
+    assert set(result['tokens']) == {'openai', 'claude', 'wenxin'}
+    assert all(t['tokens'] > 0 for t in result['tokens'].values())
+    assert ContentAnalyzer.analyze('')['stats']['lines'] == 0
+
+
+def test_counts_are_additive_across_lines():
+    """测试在换行处拆分的两段文本，计数之和等于整体计数"""
+    content = 'abc 123 你好\n  ßeta, {{x}} 4567\nend'
+    whole = count_segment(content)
+    split = content.index('\n') + 1
+    assert merge_counts(count_segment(content[:split]), count_segment(content[split:])) == whole
+    assert merge_counts(whole, count_segment(content[split:]), -1) == count_segment(content[:split])
+    assert whole['other'] == 1
+
+
+def test_apply_patch_matches_full_analysis():
+    """测试增量修改后的计数和变量位置与重新完整分析的结果一致"""
+    rng = random.Random(5)
+    alphabet = list('ab {{}}x\n你好12_.é ')
+    for _ in range(500):
+        content = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        counts, occurrences = count_segment(content), find_variables(content)
+        for _ in range(5):
+            start = rng.randint(0, len(content))
+            end = rng.randint(start, len(content))
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 6)))
+            content, counts, occurrences = apply_patch(content, counts, occurrences, start, end, text)
+            assert counts == count_segment(content)
+            assert occurrences == find_variables(content)
+
+
+def test_analysis_memoized_by_content_hash(monkeypatch):
+    """测试相同内容的分析结果从缓存返回，缓存按LRU淘汰"""
+    ContentAnalyzer.clear_cache()
+    calls = []
+    original = content_analyzer.count_segment
+    monkeypatch.setattr(content_analyzer, 'count_segment', lambda text: calls.append(text) or original(text))
+    monkeypatch.setattr(content_analyzer.config, 'ANALYSIS_CACHE_SIZE', 2)
+
+    first = ContentAnalyzer.analyze('{{a}}')
+    assert ContentAnalyzer.analyze('{{a}}') is first
+    assert len(calls) == 1
+
+    ContentAnalyzer.analyze('{{b}}')
+    ContentAnalyzer.analyze('{{c}}')
+    assert ContentAnalyzer.get_cached(first['content_hash']) is None
+    ContentAnalyzer.clear_cache()
+
+
+def test_analyze_route_validates_content():
+    """测试分析接口返回分析结果并校验内容"""
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(prompt_editor_bp)
+    client = app.test_client()
+
+    response = client.post('/prompt/api/1/analyze', json={'content': 'Hi {{user}}'})
+    assert response.status_code == 200
+    assert response.get_json()['analysis']['variables'][0]['name'] == 'user'
+    assert client.post('/prompt/api/1/analyze', json={'content': 123}).status_code == 400
+
+
+def test_analyze_route_accepts_patches():
+    """测试分析接口的增量模式：按基准哈希应用修改，会话不存在或基准不一致时返回409"""
+    ContentAnalyzer.clear_cache()
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(prompt_editor_bp)
+    client = app.test_client()
+    url = '/prompt/api/1/analyze'
+
+    first = client.post(url, json={'session_id': 's1', 'content': 'Hi {{user}}\nBye\n'}).get_json()['analysis']
+    patched = client.post(url, json={'session_id': 's1', 'base_hash': first['content_hash'],
+                                     'patch': {'start': 0, 'end': 2, 'text': '你好 {{greeting}}'}})
+    assert patched.status_code == 200
+    analysis = patched.get_json()['analysis']
+    assert analysis == ContentAnalyzer.analyze('你好 {{greeting}} {{user}}\nBye\n')
+    assert analysis['variables'][1]['positions'][0]['start'] == 16
+
+    # 基于过期的哈希、其他会话或越界的修改
+    stale = {'session_id': 's1', 'base_hash': first['content_hash'], 'patch': {'start': 0, 'end': 0, 'text': 'x'}}
+    response = client.post(url, json=stale)
+    assert response.status_code == 409 and response.get_json()['resend_content']
+    assert client.post(url, json=dict(stale, session_id='s2')).status_code == 409
+    out_of_range = {'session_id': 's1', 'base_hash': analysis['content_hash'],
+                    'patch': {'start': 5, 'end': 999, 'text': ''}}
+    assert client.post(url, json=out_of_range).status_code == 400
+    assert client.post(url, json=dict(stale, session_id=None)).status_code == 400
+    ContentAnalyzer.clear_cache()
@@ -0,0 +1,547 @@
+"""
+数据库操作模块单元测试
+使用模拟连接测试请求级工作单元等功能
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import app.common.database as database
+from app.common.deadline import DeadlineExceeded
+from app.common.pool import ConnectionPool
+
+
+class FakeCursor:
+    """模拟游标，记录执行过的SQL"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.lastrowid = 0
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((sql, params))
+        self._rows = list(self.conn.results.pop(0)) if self.conn.results else []
+        self.rowcount = len(self._rows)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def mogrify(self, sql, params):
+        return sql % tuple(repr(p) for p in params)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """模拟数据库连接"""
+
+    def __init__(self):
+        self.executed = []
+        self.results = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    """替换全局连接池为模拟连接池"""
+    created = []
+
+    def creator():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    pool = ConnectionPool(creator=creator, pool_size=2, max_overflow=2, timeout=1)
+    monkeypatch.setattr(database, '_db_pool', pool)
+    monkeypatch.setattr(database, '_query_cache', None)
+    pool.created = created
+    return pool
+
+
+@pytest.fixture
+def flask_app(fake_pool):
+    """创建注册了工作单元的Flask应用"""
+    from flask import Flask
+
+    app = Flask(__name__)
+    database.init_app(app)
+    return app
+
+
+def test_without_request_each_call_checks_out(fake_pool):
+    """测试请求外每次操作单独取出连接"""
+    database.Database.select_one("SELECT 1")
+    database.Database.select_all("SELECT 2")
+
+    assert fake_pool.status()['checkouts'] == 2
+    assert fake_pool.status()['in_use'] == 0
+
+
+def test_request_shares_one_connection(flask_app, fake_pool):
+    """测试同一请求内的多次操作共享一个连接"""
+
+    @flask_app.route('/multi')
+    def multi():
+        database.Database.select_one("SELECT 1")
+        database.Database.select_all("SELECT 2")
+        database.Database.execute("UPDATE t SET a = 1", commit=False)
+        return 'ok'
+
+    response = flask_app.test_client().get('/multi')
+
+    assert response.headers['X-DB-Checkouts'] == '1'
+    assert fake_pool.status()['checkouts'] == 1
+    assert fake_pool.status()['in_use'] == 0
+    assert fake_pool.created[0].commits == 1
+
+
+def test_request_without_db_access_checks_out_nothing(flask_app, fake_pool):
+    """测试未访问数据库的请求不取出连接"""
+
+    @flask_app.route('/none')
+    def none():
+        return 'ok'
+
+    response = flask_app.test_client().get('/none')
+
+    assert response.headers['X-DB-Checkouts'] == '0'
+    assert fake_pool.status()['checkouts'] == 0
+
+
+def test_request_error_rolls_back(flask_app, fake_pool):
+    """测试请求抛出异常时工作单元回滚"""
+    flask_app.config['PROPAGATE_EXCEPTIONS'] = False
+
+    @flask_app.route('/fail')
+    def fail():
+        database.Database.execute("UPDATE t SET a = 1", commit=False)
+        raise RuntimeError("boom")
+
+    flask_app.test_client().get('/fail')
+
+    conn = fake_pool.created[0]
+    assert conn.commits == 0
+    assert conn.rollbacks >= 1
+    assert fake_pool.status()['in_use'] == 0
+
+
+def test_keyset_page_first_and_next(fake_pool):
+    """测试键集分页的首页和下一页"""
+    from datetime import datetime
+
+    keyset = [('update_time', 'DESC'), ('id', 'DESC')]
+    rows = [{'id': i, 'update_time': datetime(2025, 8, 1, 12, 0, i)} for i in (5, 4, 3)]
+
+    pool_conn = fake_pool.connection()
+    raw = pool_conn._raw
+    pool_conn.close()
+    raw.results = [rows]
+
+    first = database.Database.select_page("SELECT * FROM prompts", (), page_size=2,
+                                          keyset=keyset, total='none')
+    pagination = first['pagination']
+
+    assert [r['id'] for r in first['data']] == [5, 4]
+    assert pagination['has_next'] and not pagination['has_prev']
+    assert pagination['total'] is None
+    assert 'ORDER BY t.update_time DESC, t.id DESC LIMIT %s' in raw.executed[-1][0]
+
+    raw.results = [rows[2:]]
+    second = database.Database.select_page("SELECT * FROM prompts", (), page_size=2,
+                                           keyset=keyset, cursor=pagination['next_cursor'],
+                                           total='none')
+    sql, params = raw.executed[-1]
+
+    assert [r['id'] for r in second['data']] == [3]
+    assert not second['pagination']['has_next'] and second['pagination']['has_prev']
+    assert 't.update_time < %s' in sql
+    assert params[-1] == 3
+    assert params[0] == rows[1]['update_time']
+
+
+def test_cursor_round_trip():
+    """测试分页游标编解码"""
+    from datetime import datetime
+    from app.common.pagination import encode_cursor, decode_cursor, InvalidCursorError
+
+    values = [datetime(2025, 8, 6, 10, 30), 42]
+    cursor = encode_cursor(values, 'prev')
+
+    assert decode_cursor(cursor, 2) == (values, 'prev')
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, 3)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor('not-a-cursor', 2)
+
+
+def test_stream_batches_and_release(fake_pool):
+    """测试流式查询分批返回并在读完后归还连接"""
+    conn = fake_pool.connection()
+    raw = conn._raw
+    conn.close()
+    raw.results = [[{'id': i} for i in range(5)]]
+
+    batches = list(database.Database.stream("SELECT * FROM prompts", batch_size=2))
+
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert fake_pool.status()['in_use'] == 0
+    assert fake_pool.status()['idle'] == 1
+    assert not raw.closed
+
+
+def test_stream_early_stop_discards_connection(fake_pool):
+    """测试提前停止迭代时连接被关闭而不是放回连接池"""
+    conn = fake_pool.connection()
+    raw = conn._raw
+    conn.close()
+    raw.results = [[{'id': i} for i in range(5)]]
+
+    for row in database.Database.stream("SELECT * FROM prompts"):
+        break
+
+    assert fake_pool.status()['in_use'] == 0
+    assert fake_pool.status()['idle'] == 0
+    assert raw.closed
+
+
+def test_bulk_insert_chunks_by_rows_and_bytes(fake_pool, monkeypatch):
+    """测试批量插入按行数和语句字节数分批"""
+    monkeypatch.setattr(database.config, 'DB_BULK_MAX_PACKET', 200)
+    conn = fake_pool.connection()
+    raw = conn._raw
+    conn.close()
+
+    rows = [(1, f'tag{i}') for i in range(10)]
+    counts = database.Database.bulk_insert('prompt_tags', ['prompt_id', 'tag_name'], rows,
+                                           ignore=True, max_rows=4)
+
+    statements = [sql for sql, _ in raw.executed]
+    assert len(counts) == len(statements) == 3
+    assert all(sql.startswith('INSERT IGNORE INTO `prompt_tags`') for sql in statements)
+    assert statements[0].count('(1,') == 4
+    assert all(len(sql.encode('utf-8')) <= 200 for sql in statements)
+
+    raw.executed.clear()
+    database.Database.bulk_insert('prompt_tags', ['prompt_id', 'tag_name'], rows,
+                                  on_duplicate=['tag_name'], max_rows=100)
+    sql = raw.executed[0][0]
+    assert len(raw.executed) == 2
+    assert sql.endswith('ON DUPLICATE KEY UPDATE `tag_name` = VALUES(`tag_name`)')
+
+
+@pytest.fixture
+def replica_set(fake_pool, monkeypatch):
+    """为模拟连接池配置一个模拟只读副本"""
+    from app.common.replica import ReplicaSet
+
+    replica_conns = []
+
+    def factory(host, port):
+        def creator():
+            conn = FakeConnection()
+            replica_conns.append(conn)
+            return conn
+        return ConnectionPool(creator=creator, pool_size=2, max_overflow=0, timeout=1,
+                              name=f'replica:{host}:{port}')
+
+    replicas = ReplicaSet(factory, [('replica1', 3306)], evict_seconds=30)
+    replicas.created = replica_conns
+    monkeypatch.setattr(database, '_replica_set', replicas)
+    return replicas
+
+
+def test_reads_route_to_replica(fake_pool, replica_set):
+    """测试读操作路由到副本，写操作路由到主库"""
+    database.Database.select_all("SELECT 1")
+    database.Database.execute("UPDATE t SET a = 1")
+
+    assert len(replica_set.created) == 1
+    assert len(fake_pool.created) == 1
+    assert replica_set.created[0].executed[0][0] == "SELECT 1"
+    assert fake_pool.created[0].executed[0][0] == "UPDATE t SET a = 1"
+
+
+def test_read_your_writes_within_request(flask_app, fake_pool, replica_set):
+    """测试请求中写操作之后的读操作走主库，并开启会话粘滞"""
+    flask_app.secret_key = 'test'
+
+    @flask_app.route('/write-then-read')
+    def write_then_read():
+        database.Database.select_one("SELECT before")
+        database.Database.execute("UPDATE t SET a = 1", commit=False)
+        database.Database.select_one("SELECT after")
+        return 'ok'
+
+    @flask_app.route('/read')
+    def read():
+        database.Database.select_one("SELECT sticky")
+        return 'ok'
+
+    client = flask_app.test_client()
+    response = client.get('/write-then-read')
+
+    assert response.headers['X-DB-Checkouts'] == '2'
+    assert [sql for sql, _ in replica_set.created[0].executed] == ["SELECT before"]
+    primary_sql = [sql for sql, _ in fake_pool.created[0].executed]
+    assert primary_sql == ["UPDATE t SET a = 1", "SELECT after"]
+
+    client.get('/read')
+    assert fake_pool.created[0].executed[-1][0] == "SELECT sticky"
+
+
+def test_unhealthy_replica_evicted(fake_pool, replica_set):
+    """测试副本获取连接失败时被剔除并回退到主库"""
+    replica = replica_set.replicas[0]
+
+    def broken():
+        raise ConnectionError("副本不可用")
+
+    replica.pool.creator = broken
+    database.Database.select_one("SELECT 1")
+
+    assert fake_pool.created[0].executed[0][0] == "SELECT 1"
+    assert not replica.is_healthy(time.monotonic())
+    assert replica_set.status()[0]['failures'] == 1
+
+
+def test_busy_replica_skipped_not_evicted(flask_app, fake_pool, replica_set):
+    """测试副本连接池已满时只短暂等待，在请求截止前回退到主库，且不剔除副本"""
+    from flask import g
+
+    replica = replica_set.replicas[0]
+    held = [replica.pool.connection(), replica.pool.connection()]
+    timeouts = []
+    original = replica.pool.connection
+    replica.pool.connection = lambda timeout=None: timeouts.append(timeout) or original(timeout=timeout)
+    replica_set.checkout_timeout = 0.01
+
+    # 副本只等待checkout_timeout，而不是连接池超时或请求剩余时间
+    with flask_app.test_request_context():
+        g.deadline = time.monotonic() + 5
+        assert database.Database.select_one("SELECT 1") is None
+    assert timeouts == [0.01]
+    assert fake_pool.created[0].executed[0][0] == "SELECT 1"
+
+    # 请求剩余时间更短时按剩余时间等待，等完后截止时间已过，不再访问主库
+    with flask_app.test_request_context():
+        replica_set.checkout_timeout = 1
+        g.deadline = time.monotonic() + 0.05
+        with pytest.raises(DeadlineExceeded):
+            database.Database.select_one("SELECT 2")
+    assert 0 < timeouts[1] <= 0.05
+    assert len(fake_pool.created[0].executed) == 1
+    assert replica.is_healthy(time.monotonic())
+    assert replica_set.status()[0]['failures'] == 0
+    for conn in held:
+        conn.close()
+
+
+@pytest.fixture
+def query_cache(fake_pool, monkeypatch):
+    """启用一个空的查询结果缓存"""
+    from app.common.query_cache import QueryCache
+
+    cache = QueryCache(ttl=60)
+    monkeypatch.setattr(database, '_query_cache', cache)
+    return cache
+
+
+def test_query_cache_hit_and_invalidate(fake_pool, query_cache):
+    """测试查询缓存命中以及写表后失效"""
+    sql = "SELECT * FROM workspace_members WHERE workspace_id = %s"
+    conn = fake_pool.connection()
+    raw = conn._raw
+    conn.close()
+    raw.results = [[{'user_id': 1}], [], [{'user_id': 2}]]
+
+    first = database.Database.select_all(sql, (1,))
+    first[0]['user_id'] = 99
+    second = database.Database.select_all("SELECT *  FROM workspace_members\n WHERE workspace_id = %s", (1,))
+
+    assert second == [{'user_id': 1}]
+    assert query_cache.stats()['hits'] == 1
+
+    database.Database.execute("DELETE FROM workspace_members WHERE user_id = %s", (1,))
+    third = database.Database.select_all(sql, (1,))
+
+    assert third == [{'user_id': 2}]
+    assert query_cache.stats()['misses'] == 2
+
+
+def test_query_cache_skipped_after_write_in_request(flask_app, fake_pool, query_cache):
+    """测试请求中写过数据后读取不使用缓存，避免缓存未提交的数据"""
+
+    @flask_app.route('/write-read')
+    def write_read():
+        database.Database.execute("UPDATE prompts SET title = 'a'", commit=False)
+        database.Database.select_one("SELECT * FROM prompts WHERE id = 1")
+        return 'ok'
+
+    flask_app.test_client().get('/write-read')
+
+    assert query_cache.stats()['entries'] == 0
+
+
+def test_query_cache_skips_replica_reads(fake_pool, replica_set, query_cache):
+    """测试只读副本返回的结果不放入缓存，副本不可用回退主库时照常缓存"""
+    database.Database.select_all("SELECT * FROM prompts")
+    database.Database.select_all("SELECT * FROM prompts")
+
+    assert len(replica_set.created[0].executed) == 2
+    assert query_cache.stats()['entries'] == 0
+
+    replica_set.evict(replica_set.replicas[0], "测试")
+    database.Database.select_all("SELECT * FROM prompts")
+    database.Database.select_all("SELECT * FROM prompts")
+
+    assert len(fake_pool.created[0].executed) == 1
+    assert query_cache.stats()['entries'] == 1
+
+
+def test_query_cache_ttl_capped_with_multiple_workers(monkeypatch):
+    """测试WORKERS大于1时查询结果缓存的有效期缩短"""
+    monkeypatch.setattr(database.config, 'QUERY_CACHE_ENABLED', True)
+    monkeypatch.setattr(database.config, 'QUERY_CACHE_TTL', 30)
+    monkeypatch.setattr(database.config, 'QUERY_CACHE_MULTI_WORKER_TTL', 2)
+
+    monkeypatch.setattr(database.config, 'WORKERS', 1)
+    assert database._create_query_cache().ttl == 30
+    monkeypatch.setattr(database.config, 'WORKERS', 4)
+    assert database._create_query_cache().ttl == 2
+    monkeypatch.setattr(database.config, 'QUERY_CACHE_ENABLED', False)
+    assert database._create_query_cache() is None
+
+
+def test_select_page_without_cache(fake_pool, query_cache):
+    """测试select_page传cache=False时数据和总数查询都不使用缓存"""
+    sql = "SELECT id FROM prompt_versions WHERE prompt_id = %s"
+    conn = fake_pool.connection()
+    raw = conn._raw
+    conn.close()
+    raw.results = [[], [{'total': 0}], []] * 2
+    for _ in range(2):
+        database.Database.select_page(sql, (1,), page_size=10, keyset=[('id', 'DESC')], total='none', cache=False)
+        database.Database.select_page(sql, (1,), page_size=10, cache=False)
+
+    assert len(raw.executed) == 6
+    assert query_cache.stats()['entries'] == 0
+
+
+def test_query_cache_table_extraction():
+    """测试从SQL中提取读写的表名"""
+    from app.common.query_cache import read_tables, written_table
+
+    sql = """
+        SELECT p.*, pv.version FROM prompts p
+        LEFT JOIN `prompt_versions` pv ON p.id = pv.prompt_id
+        WHERE p.id IN (SELECT prompt_id FROM prompt_tags WHERE tag_name = %s)
+    """
+    assert read_tables(sql) == {'prompts', 'prompt_versions', 'prompt_tags'}
+    assert written_table("INSERT IGNORE INTO `prompt_tags` (a) VALUES (1)") == 'prompt_tags'
+    assert written_table("  update prompts set a = 1") == 'prompts'
+    assert written_table("DELETE FROM workspace_members WHERE id = 1") == 'workspace_members'
+    assert written_table("SELECT 1") is None
+
+
+def test_query_cache_memory_cap():
+    """测试查询缓存按内存上限淘汰最久未使用的条目"""
+    from app.common.query_cache import QueryCache, MISS
+
+    cache = QueryCache(ttl=60, max_bytes=1000)
+    for i in range(20):
+        cache.set(i, [{'content': 'x' * 100}], ())
+
+    stats = cache.stats()
+    assert stats['bytes'] <= 1000
+    assert stats['evictions'] > 0
+    assert cache.get(0) is MISS
+    assert cache.get(19) is not MISS
+
+
+def test_transaction_retries_deadlock(fake_pool, monkeypatch):
+    """测试事务遇到死锁时回滚并重试"""
+    import pymysql
+
+    monkeypatch.setattr(database.time, 'sleep', lambda seconds: None)
+    before = database.get_transaction_stats()
+    calls = []
+
+    @database.Database.transaction
+    def save(conn, value):
+        calls.append(value)
+        if len(calls) < 3:
+            raise pymysql.err.OperationalError(1213, 'Deadlock found when trying to get lock')
+        return value * 2
+
+    assert save(21) == 42
+    assert calls == [21, 21, 21]
+
+    stats = database.get_transaction_stats()
+    assert stats['retries'] - before['retries'] == 2
+    assert stats['deadlocks'] - before['deadlocks'] == 2
+    assert fake_pool.status()['in_use'] == 0
+
+
+def test_transaction_retry_budget_and_other_errors(fake_pool, monkeypatch):
+    """测试重试次数耗尽后抛出异常，不可重试的错误不重试"""
+    import pymysql
+
+    monkeypatch.setattr(database.time, 'sleep', lambda seconds: None)
+    calls = []
+
+    def lock_timeout(conn):
+        calls.append(1)
+        raise pymysql.err.OperationalError(1205, 'Lock wait timeout exceeded')
+
+    with pytest.raises(pymysql.err.OperationalError):
+        database.run_transaction(lock_timeout, max_retries=2)
+    assert len(calls) == 3
+
+    calls.clear()
+
+    def duplicate(conn):
+        calls.append(1)
+        raise pymysql.err.IntegrityError(1062, 'Duplicate entry')
+
+    with pytest.raises(pymysql.err.IntegrityError):
+        database.run_transaction(duplicate)
+    assert len(calls) == 1
@@ -0,0 +1,106 @@
+"""
+请求截止时间模块单元测试
+测试截止时间传递到SQL以及超时请求的快速失败
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from flask import Flask, jsonify
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import app.common.database as database
+from app.common import deadline
+from app.common.pool import ConnectionPool
+from tests.test_database import FakeConnection
+
+
+@pytest.fixture
+def deadline_app(monkeypatch):
+    """创建注册了工作单元和截止时间的Flask应用"""
+    created = []
+
+    def creator():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    pool = ConnectionPool(creator=creator, pool_size=2, max_overflow=0, timeout=1,
+                          cursor_wrapper=database._wrap_cursor)
+    monkeypatch.setattr(database, '_db_pool', pool)
+    monkeypatch.setattr(database, '_query_cache', None)
+
+    app = Flask(__name__)
+    database.init_app(app)
+    deadline.init_app(app)
+    app.created = created
+    return app
+
+
+def test_select_carries_max_execution_time(deadline_app):
+    """测试SELECT语句带上剩余时间的MAX_EXECUTION_TIME提示"""
+
+    @deadline_app.route('/api/read')
+    @deadline.request_deadline(5)
+    def read():
+        database.Database.select_one("SELECT * FROM prompts WHERE id = %s", (1,))
+        database.Database.execute("UPDATE prompts SET title = %s", ('t',), commit=False)
+        return jsonify({'success': True})
+
+    response = deadline_app.test_client().get('/api/read')
+
+    assert response.status_code == 200
+    select_sql, update_sql = [sql for sql, _ in deadline_app.created[0].executed]
+    assert select_sql.startswith("SELECT /*+ MAX_EXECUTION_TIME(")
+    hint_ms = int(select_sql.split('MAX_EXECUTION_TIME(')[1].split(')')[0])
+    assert 0 < hint_ms <= 5000
+    assert update_sql == "UPDATE prompts SET title = %s"
+
+
+def test_expired_request_fails_fast_with_504(deadline_app):
+    """测试截止时间已过的请求不再访问数据库并返回504"""
+
+    @deadline_app.route('/api/slow')
+    @deadline.request_deadline(0.01)
+    def slow():
+        time.sleep(0.02)
+        try:
+            database.Database.select_all("SELECT * FROM prompts")
+        except Exception as e:
+            # 服务层的常见写法：捕获异常并返回普通错误
+            return jsonify({'success': False, 'error': str(e)}), 500
+        return jsonify({'success': True})
+
+    response = deadline_app.test_client().get('/api/slow')
+
+    assert response.status_code == 504
+    assert response.get_json()['success'] is False
+    assert all(not conn.executed for conn in deadline_app.created)
+
+
+def test_pool_timeout_returns_503(deadline_app, monkeypatch):
+    """测试连接池繁忙时请求返回503，等待连接的时间受请求截止时间限制"""
+    pool = database.get_db_pool()
+    held = [pool.connection(), pool.connection()]
+    timeouts = []
+    original = pool.connection
+    monkeypatch.setattr(pool, 'connection', lambda timeout=None: timeouts.append(timeout) or original(timeout=timeout))
+
+    @deadline_app.route('/api/busy')
+    @deadline.request_deadline(0.05)
+    def busy():
+        database.Database.select_one("SELECT 1")
+        return jsonify({'success': True})
+
+    response = deadline_app.test_client().get('/api/busy')
+
+    # 等待时间受请求截止时间限制，而不是连接池的1秒超时
+    assert len(timeouts) == 1 and 0 < timeouts[0] <= 0.05
+    assert response.status_code == 503
+    assert response.get_json() == {'success': False, 'error': '数据库繁忙，请稍后重试'}
+    for conn in held:
+        conn.close()
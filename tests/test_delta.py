@@ -0,0 +1,172 @@
+"""
+文本差量、版本差量存储、内容去重和压缩单元测试
+"""
+
+import sys
+import zlib
+from pathlib import Path
+
+from flask import Flask
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import app.common.database as database
+from app.common.delta import diff, patch, compact_diff
+from app.config import config
+from app.services.prompt_service import PromptService
+from app.services.content_store import ContentStore
+from app.routes.prompt_editor import prompt_editor_bp
+
+
+def test_diff_and_patch_roundtrip():
+    """测试差量还原，包括多行、单行内修改和空文本"""
+    base = '你是一名客服。\n请礼貌地回答{{question}}。\n' * 20
+    cases = [
+        base.replace('礼貌', '耐心', 1),
+        base + '最后附上签名。\n',
+        '开头插入一行\n' + base[:200],
+        '',
+    ]
+    for target in cases:
+        assert patch(base, diff(base, target)) == target
+    assert patch('', diff('', 'abc')) == 'abc'
+
+    # 小改动的差量远小于完整内容，完全不同的内容不值得保存差量
+    assert len(compact_diff(base, cases[0])) < len(cases[0]) // 10
+    assert compact_diff('abc', 'xyz') is None
+
+
+def _history_contents(prompt_id):
+    """按版本历史的顺序逐个获取版本内容"""
+    history = PromptService.get_version_history(prompt_id, page_size=100)['data']
+    return [PromptService.get_version(prompt_id, v['id'])['content'] for v in history]
+
+
+def test_version_history_stored_as_deltas(sqlite_db, monkeypatch):
+    """测试历史版本以差量保存、差量链有上限，且可以还原完整历史"""
+    monkeypatch.setattr(config, 'VERSION_MAX_DELTA_CHAIN', 3)
+    body = '请根据以下资料撰写一份产品介绍，要求语气专业、条理清晰。\n' * 10
+    prompt_id = PromptService.create_prompt(1, 1, '产品介绍', body + '版本0')['prompt_id']
+    for i in range(1, 9):
+        assert PromptService.update_prompt(prompt_id, 1, content=body + f'版本{i}',
+                                           create_new_version=True)['success']
+
+    rows = database.Database.select_all(
+        "SELECT id, content, base_version_id, chain_depth FROM prompt_versions "
+        "WHERE prompt_id = %s ORDER BY id", (prompt_id,), cache=False)
+    assert [row['chain_depth'] for row in rows] == [0, 1, 2, 3, 0, 1, 2, 3, 0]
+    assert rows[-1]['base_version_id'] is None
+    assert PromptService.get_prompt(prompt_id)['current_version_id'] == rows[-1]['id']
+    assert rows[1]['base_version_id'] is not None and len(rows[1]['content']) < 100
+
+    history = PromptService.get_version_history(prompt_id, page_size=100)['data']
+    contents = _history_contents(prompt_id)
+    assert contents == [body + f'版本{i}' for i in range(8, -1, -1)]
+    assert history[0]['version'] == 'v1.8'
+    assert [v['is_current'] for v in history] == [1] + [0] * 8
+    assert [v['content_size'] for v in history] == [len(c.encode('utf-8')) for c in contents]
+
+    # 迁移工具：改回完整内容后再压缩，历史保持不变
+    expanded = PromptService.compact_version_history(prompt_id, expand=True)
+    assert expanded['rewritten'] == 6 and expanded['bytes_after'] > expanded['bytes_before']
+    compacted = PromptService.compact_version_history(prompt_id)
+    assert compacted['rewritten'] == 6
+    assert PromptService.compact_version_history(prompt_id)['rewritten'] == 0
+    assert _history_contents(prompt_id) == contents
+
+
+def test_identical_content_is_stored_once(sqlite_db):
+    """测试相同内容只保存一份，内容不变时不创建新版本，最后一个引用释放后内容被回收"""
+    template = '你是一名翻译，请把以下内容翻译成英文：{{text}}'
+    first = PromptService.create_prompt(1, 1, '翻译', template)['prompt_id']
+    second = PromptService.create_prompt(1, 1, '翻译副本', template)['prompt_id']
+
+    def contents():
+        return database.Database.select_all(
+            "SELECT content_hash, ref_count FROM prompt_contents ORDER BY id", cache=False)
+
+    assert [row['ref_count'] for row in contents()] == [2]
+
+    # 内容不变时不创建新版本
+    assert PromptService.update_prompt(first, 1, content=template, create_new_version=True)['success']
+    assert len(PromptService.get_version_history(first)['data']) == 1
+
+    # 修改当前版本内容：旧内容少一个引用，新内容被引用
+    assert PromptService.update_prompt(second, 1, content='完全不同的内容')['success']
+    assert [row['ref_count'] for row in contents()] == [1, 1]
+    assert PromptService.get_prompt(second)['current_version']['content'] == '完全不同的内容'
+
+    # 最后一个引用释放后内容被删除
+    assert PromptService.update_prompt(first, 1, content='也不同的内容')['success']
+    assert len(contents()) == 2
+    assert ContentStore.collect_garbage() == {'success': True, 'corrected': 0, 'deleted': 0}
+
+
+def test_large_content_compressed_transparently(sqlite_db, monkeypatch):
+    """测试大内容压缩保存、服务层透明解压，以及内容接口直接发送压缩数据"""
+    monkeypatch.setattr(config, 'CONTENT_COMPRESS_MIN_BYTES', 1024)
+    examples = ''.join(f'示例{i}：输入“问题{i}”，输出“回答{i}”。\n' for i in range(200))
+    prompt_id = PromptService.create_prompt(1, 1, '少样本', examples)['prompt_id']
+
+    row = database.Database.select_one(
+        "SELECT content, content_zip FROM prompt_contents", cache=False)
+    assert row['content'] == '' and len(row['content_zip']) < len(examples.encode('utf-8')) // 2
+    assert PromptService.get_prompt(prompt_id)['current_version']['content'] == examples
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(prompt_editor_bp)
+    client = app.test_client()
+
+    response = client.get(f'/prompt/api/{prompt_id}/content', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'deflate'
+    assert zlib.decompress(response.data).decode('utf-8') == examples
+
+    response = client.get(f'/prompt/api/{prompt_id}/content')
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True) == examples
+
+
+def test_version_history_route_paginates_with_etags(sqlite_db):
+    """测试版本历史接口：只返回元数据、键集分页、ETag未变化时返回304"""
+    prompt_id = PromptService.create_prompt(1, 1, '历史', '内容0')['prompt_id']
+    for i in range(1, 5):
+        PromptService.update_prompt(prompt_id, 1, content=f'内容{i}', create_new_version=True)
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(prompt_editor_bp)
+    client = app.test_client()
+
+    first = client.get(f'/prompt/api/{prompt_id}/versions?page_size=3')
+    body = first.get_json()
+    assert [v['version'] for v in body['versions']] == ['v1.4', 'v1.3', 'v1.2']
+    assert 'content' not in body['versions'][0]
+    assert body['pagination']['has_next'] and body['pagination']['total'] is None
+    etag = first.headers['ETag']
+
+    second = client.get(f'/prompt/api/{prompt_id}/versions?page_size=3'
+                        f'&cursor={body["pagination"]["next_cursor"]}')
+    assert [v['version'] for v in second.get_json()['versions']] == ['v1.1', 'v1.0']
+    assert second.headers['ETag'] != etag
+
+    assert client.get(f'/prompt/api/{prompt_id}/versions?page_size=3',
+                      headers={'If-None-Match': etag}).status_code == 304
+
+    # 单个版本按需获取内容，同样可以重新验证
+    oldest = second.get_json()['versions'][-1]['id']
+    version = client.get(f'/prompt/api/{prompt_id}/versions/{oldest}')
+    assert version.get_json()['data']['content'] == '内容0'
+    assert client.get(f'/prompt/api/{prompt_id}/versions/{oldest}',
+                      headers={'If-None-Match': version.headers['ETag']}).status_code == 304
+
+    # 创建新版本后历史的ETag变化
+    PromptService.update_prompt(prompt_id, 1, content='内容5', create_new_version=True)
+    refreshed = client.get(f'/prompt/api/{prompt_id}/versions?page_size=3',
+                           headers={'If-None-Match': etag})
+    assert refreshed.status_code == 200
+    assert refreshed.get_json()['versions'][0]['version'] == 'v1.5'
+
+    assert client.get(f'/prompt/api/{prompt_id}/versions?cursor=bad').status_code == 400
+    assert client.get(f'/prompt/api/{prompt_id}/versions/99999').status_code == 404
@@ -0,0 +1,144 @@
+"""
+连接池模块单元测试
+测试溢出连接、获取超时、连接回收和存活检测
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.common.pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    """模拟数据库连接"""
+
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise ConnectionError("连接已断开")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    """创建使用模拟连接的连接池"""
+    created = []
+
+    def creator():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    pool = ConnectionPool(creator=creator, **kwargs)
+    return pool, created
+
+
+def test_reuse_idle_connection():
+    """测试归还的连接被复用"""
+    pool, created = make_pool(pool_size=2, max_overflow=0, timeout=1)
+
+    conn = pool.connection()
+    conn.close()
+    conn = pool.connection()
+    conn.close()
+
+    assert len(created) == 1
+    assert created[0].rollbacks == 2
+    assert pool.status()['idle'] == 1
+
+
+def test_overflow_connections_closed_on_release():
+    """测试溢出连接归还时被关闭"""
+    pool, created = make_pool(pool_size=1, max_overflow=1, timeout=1)
+
+    first = pool.connection()
+    second = pool.connection()
+    assert pool.status()['in_use'] == 2
+
+    first.close()
+    second.close()
+
+    status = pool.status()
+    assert status['in_use'] == 0
+    assert status['idle'] == 1
+    assert sum(1 for c in created if c.closed) == 1
+
+
+def test_checkout_timeout():
+    """测试连接池已满时超时抛出PoolTimeoutError"""
+    pool, _ = make_pool(pool_size=1, max_overflow=0, timeout=0.05)
+
+    conn = pool.connection()
+    with pytest.raises(PoolTimeoutError):
+        pool.connection()
+    conn.close()
+
+    assert pool.status()['timeouts'] == 1
+
+
+def test_waiter_wakes_on_release():
+    """测试等待中的请求在连接归还后获得连接"""
+    pool, _ = make_pool(pool_size=1, max_overflow=0, timeout=2)
+    conn = pool.connection()
+
+    threading.Timer(0.05, conn.close).start()
+    second = pool.connection()
+    second.close()
+
+    assert pool.status()['checkouts'] == 2
+
+
+def test_recycle_expired_connection():
+    """测试超过存活时间的连接被回收重建"""
+    pool, created = make_pool(pool_size=1, max_overflow=0, timeout=1, recycle=1)
+
+    conn = pool.connection()
+    conn.close()
+    pool._idle[0]._created_at -= 5
+
+    conn = pool.connection()
+    conn.close()
+
+    assert len(created) == 2
+    assert created[0].closed
+    assert pool.status()['recycled'] == 1
+
+
+def test_ping_failure_reconnects():
+    """测试存活检测失败时重建连接"""
+    pool, created = make_pool(pool_size=1, max_overflow=0, timeout=1, ping_interval=0)
+
+    conn = pool.connection()
+    conn.close()
+    created[0].alive = False
+
+    conn = pool.connection()
+    conn.close()
+
+    assert len(created) == 2
+    assert pool.status()['ping_failures'] == 1
+
+
+def test_wait_histogram():
+    """测试等待耗时直方图统计"""
+    pool, _ = make_pool(pool_size=1, max_overflow=0, timeout=1)
+
+    for _ in range(3):
+        pool.connection().close()
+
+    histogram = pool.status()['wait_histogram']
+    assert sum(histogram.values()) == 3
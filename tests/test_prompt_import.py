@@ -0,0 +1,101 @@
+"""
+Prompt批量导入单元测试
+"""
+
+import io
+import json
+import sys
+from pathlib import Path
+
+from flask import Flask
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import app.common.database as database
+from app.config import config
+from app.common.deadline import DeadlineExceeded
+from app.services.prompt_service import PromptService
+from app.services.prompt_import_service import PromptImportService
+from app.routes.prompt_editor import import_prompts, prompt_editor_bp
+
+
+def test_parse_csv_and_oversized_lines():
+    """测试CSV解析：带引号的字段跨行、标签按逗号拆分、超长的行报错后继续"""
+    data = ('title,content,tags\n'
+            '客服,"第一行\n第二行","客服, 邮件"\n'
+            f'超长,{"长" * 100},\n'
+            '翻译,请翻译{{text}},\n').encode('utf-8')
+    rows = list(PromptImportService.parse_csv(io.BytesIO(data), max_line_bytes=64))
+
+    assert rows[0] == (2, {'title': '客服', 'content': '第一行\n第二行', 'tags': ['客服', ' 邮件']}, None)
+    assert rows[1][1] is None and '超过64字节' in rows[1][2]
+    assert rows[2][1] == {'title': '翻译', 'content': '请翻译{{text}}'}
+
+
+def test_import_jsonl_route(sqlite_db):
+    """测试批量导入接口：按批写入、逐行返回结果和统计，错误行不影响其他行"""
+    lines = [json.dumps({'title': f'导入{i}', 'content': '共同内容' if i % 2 else f'内容{i}',
+                         'tags': ['导入', f'标签{i % 2}']}, ensure_ascii=False) for i in range(5)]
+    lines.insert(2, '{"content": "没有标题"}')
+    lines.insert(4, '不是JSON')
+    body = '\n'.join(lines).encode('utf-8')
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(prompt_editor_bp)
+    client = app.test_client()
+
+    response = client.post('/prompt/api/import?workspace_id=1&batch_size=2', data=body,
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    summary = results.pop()
+    assert summary['done'] and summary['stats']['rows'] == 7
+    assert summary['stats']['created'] == 5 and summary['stats']['failed'] == 2
+    assert summary['stats']['batches'] == 3
+    assert sorted(r['row'] for r in results if not r['success']) == [3, 5]
+
+    created = [r for r in results if r['success']]
+    prompts = PromptService.get_prompts([r['prompt_id'] for r in created])
+    assert [p['title'] for p in prompts] == [f'导入{i}' for i in range(5)]
+    assert prompts[1]['current_version']['content'] == '共同内容'
+    assert prompts[1]['current_version']['version'] == 'v1.0'
+    assert prompts[4]['tags'] == ['导入', '标签0']
+
+    # 相同内容只保存一份，引用计数等于引用的版本数
+    shared = database.Database.select_one(
+        "SELECT COUNT(*) AS n FROM prompt_contents", cache=False)
+    assert shared['n'] == 4
+    ref = database.Database.select_one(
+        "SELECT MAX(ref_count) AS n FROM prompt_contents", cache=False)
+    assert ref['n'] == 2
+
+    # 导入后的Prompt可以正常更新
+    assert PromptService.update_prompt(created[0]['prompt_id'], 1, content='新内容',
+                                       create_new_version=True)['version'] == 'v1.1'
+
+
+def test_import_stops_at_deadline(monkeypatch):
+    """测试导入超过截止时间时中止并在最后一行报告，而不是把剩余的行逐行报告为写入失败"""
+    calls = []
+
+    def create_prompts_bulk(user_id, workspace_id, records):
+        calls.append(len(records))
+        if len(calls) > 1:
+            raise DeadlineExceeded('请求截止时间已过')
+        return [{'prompt_id': i, 'uuid': str(i)} for i in range(len(records))]
+
+    monkeypatch.setattr(PromptService, 'create_prompts_bulk', staticmethod(create_prompts_bulk))
+    rows = [(i, {'title': f'导入{i}', 'content': ''}, None) for i in range(1, 8)]
+    results = list(PromptImportService.import_prompts(1, 1, iter(rows), batch_size=2))
+
+    assert len(calls) == 2
+    assert [r['row'] for r in results[:-1]] == [1, 2]
+    summary = results[-1]
+    assert summary['done'] and not summary['success'] and '第3行' in summary['error']
+    assert summary['stats']['created'] == 2 and summary['stats']['failed'] == 2
+
+    # 导入接口不使用默认的请求截止时间
+    assert import_prompts.request_deadline == config.IMPORT_DEADLINE_SECONDS
@@ -0,0 +1,112 @@
+"""
+Prompt业务服务单元测试
+在临时SQLite数据库上测试Prompt服务
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import app.common.database as database
+from app.services.prompt_service import PromptService
+from app.services.workspace_service import WorkspaceService
+
+
+def test_get_prompts_batch(sqlite_db):
+    """测试批量获取Prompt：按请求顺序返回，忽略不存在和已删除的ID"""
+    ids = [PromptService.create_prompt(1, 1, f'Prompt {i}', f'内容 {i}', tags=[f'标签{i}'])['prompt_id']
+           for i in range(3)]
+    PromptService.update_prompt(ids[1], 1, status=0)
+
+    prompts = PromptService.get_prompts([ids[2], 99999, ids[1], ids[0], ids[2]])
+
+    assert [p['id'] for p in prompts] == [ids[2], ids[0]]
+    assert prompts[0]['current_version']['content'] == '内容 2'
+    assert prompts[1]['tags'] == ['标签0']
+
+
+def test_version_numbers_allocated_in_transaction(sqlite_db):
+    """测试版本号由计数器分配：同一秒内连续保存按顺序递增，支持升级主版本"""
+    prompt_id = PromptService.create_prompt(1, 1, '计数器', '内容0')['prompt_id']
+
+    labels = []
+    for i in range(1, 4):
+        result = PromptService.update_prompt(prompt_id, 1, content=f'内容{i}', create_new_version=True)
+        labels.append(result['version'])
+    result = PromptService.update_prompt(prompt_id, 1, content='内容4', create_new_version=True,
+                                         major_version=True)
+    labels.append(result['version'])
+    labels.append(PromptService.update_prompt(prompt_id, 1, content='内容5',
+                                              create_new_version=True)['version'])
+
+    assert labels == ['v1.1', 'v1.2', 'v1.3', 'v2.0', 'v2.1']
+    assert PromptService.get_prompt(prompt_id)['current_version']['version'] == 'v2.1'
+
+    # 内容不变时不创建版本，也不消耗版本号
+    assert PromptService.update_prompt(prompt_id, 1, content='内容5', create_new_version=True)['version'] == 'v2.1'
+    assert PromptService.update_prompt(prompt_id, 1, content='内容6', create_new_version=True)['version'] == 'v2.2'
+
+
+def test_tag_dictionary_diff_update(sqlite_db):
+    """测试标签字典：只写入变化的标签关联，按整数标签ID统计"""
+    first = PromptService.create_prompt(1, 1, '标签A', '内容A', tags=['邮件', '营销'])['prompt_id']
+    PromptService.create_prompt(1, 1, '标签B', '内容B', tags=['邮件'])['prompt_id']
+
+    def tag_rows(prompt_id):
+        return {row['tag_id']: row['id'] for row in database.Database.select_all(
+            "SELECT id, tag_id FROM prompt_tags WHERE prompt_id = %s", (prompt_id,), cache=False)}
+
+    before = tag_rows(first)
+    assert PromptService.update_prompt(first, 1, tags=['营销', '客服', ''])['success']
+    after = tag_rows(first)
+
+    # 保留的标签行不被重写，去掉的删除、新增的插入
+    kept = set(before) & set(after)
+    assert len(kept) == 1 and all(before[t] == after[t] for t in kept)
+    assert PromptService.get_prompt(first)['tags'] == ['营销', '客服']
+
+    # 相同标签名共用一个字典项
+    names = database.Database.select_all("SELECT name FROM tags ORDER BY id", cache=False)
+    assert [row['name'] for row in names] == ['邮件', '营销', '客服']
+
+    counts = WorkspaceService.get_workspace_tag_counts(1, 1)
+    assert {row['name']: row['prompt_count'] for row in counts} == {'邮件': 1, '营销': 1, '客服': 1}
+
+
+def test_tag_ids_resolved_by_collation(sqlite_db, monkeypatch):
+    """测试排序规则认为相同的标签名解析到字典中已有的写法，过长或找不到的标签报错"""
+
+    class TagCursor:
+        """模拟utf8mb4_unicode_ci：IN查询只返回字典中的写法'cafe'，逐个查找时'café'也能匹配"""
+
+        def __init__(self):
+            self.rows = []
+
+        def execute(self, sql, params):
+            if 'IN (' in sql:
+                self.rows = [{'id': 7, 'name': 'cafe'}]
+            else:
+                self.rows = [{'id': 7}] if params[0] in ('cafe', 'café', 'CAFE') else []
+
+        def fetchall(self):
+            return self.rows
+
+        def fetchone(self):
+            return self.rows[0] if self.rows else None
+
+    with monkeypatch.context() as patched:
+        patched.setattr(database.Database, 'bulk_insert', staticmethod(lambda *args, **kwargs: 0))
+        assert PromptService._resolve_tag_ids(TagCursor(), ['café', 'CAFE']) == {'café': 7, 'CAFE': 7}
+        with pytest.raises(ValueError, match='tea'):
+            PromptService._resolve_tag_ids(TagCursor(), ['café', 'tea'])
+
+    result = PromptService.create_prompt(1, 1, '长标签', '内容', tags=['x' * 51])
+    assert not result['success'] and '50' in result['error']
+    assert database.Database.select_all("SELECT id FROM tags", cache=False) == []
+    prompt_id = PromptService.create_prompt(1, 1, '标签', '内容', tags=['x' * 50])['prompt_id']
+    assert not PromptService.update_prompt(prompt_id, 1, tags=['y' * 51])['success']
+    assert PromptService.get_prompt(prompt_id)['tags'] == ['x' * 50]
@@ -0,0 +1,118 @@
+"""
+SQL执行统计模块单元测试
+测试SQL指纹、分位数统计、慢查询日志限速和EXPLAIN采集
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.common.query_stats import fingerprint, QueryStats, SlowQueryLog, InstrumentedCursor
+
+
+class SlowCursor:
+    """模拟执行缓慢的游标"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.rowcount = 0
+        self.connection = self
+        self.explained = []
+
+    def execute(self, sql, params=None):
+        if sql.startswith('EXPLAIN'):
+            self.explained.append(sql)
+            return 1
+        time.sleep(self.delay)
+        self.rowcount = 3
+        return 3
+
+    def mogrify(self, sql, params):
+        return sql % tuple(repr(p) for p in params)
+
+    def fetchall(self):
+        return [{'id': 1, 'select_type': 'SIMPLE', 'type': 'ALL', 'rows': 1000}]
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def close(self):
+        pass
+
+
+def test_fingerprint_normalizes_literals():
+    """测试指纹去掉字面量差异"""
+    a = fingerprint("SELECT * FROM prompts WHERE id = 1 AND title = 'abc'")
+    b = fingerprint("select *  from prompts\n WHERE id = 42 AND title = 'x''y'")
+    assert a == b == "select * from prompts where id = ? and title = ?"
+
+    in_list = fingerprint("SELECT * FROM prompts WHERE id IN (%s, %s, %s)")
+    assert in_list == fingerprint("SELECT * FROM prompts WHERE id IN (%s)")
+
+    rows = fingerprint("INSERT INTO prompt_tags (a, b) VALUES (1, 'x'),(2, 'y'),(3, 'z')")
+    assert rows == "insert into prompt_tags (a, b) values (?+)"
+
+
+def test_percentiles():
+    """测试分位数统计"""
+    stats = QueryStats()
+    for ms in range(1, 101):
+        stats.record('select ?', float(ms), 1)
+
+    top = stats.top(1)[0]
+    assert top['count'] == 100
+    assert top['p50_ms'] == 50
+    assert top['p95_ms'] == 95
+    assert top['p99_ms'] == 99
+    assert top['rows'] == 100
+
+
+def test_slow_query_logged_with_explain(monkeypatch):
+    """测试慢查询写入日志并采集EXPLAIN"""
+    messages = []
+
+    class FakeLogger:
+        def info(self, message):
+            messages.append(message)
+
+    slow_log = SlowQueryLog(threshold_ms=1, per_minute=60)
+    slow_log._logger = FakeLogger()
+    raw = SlowCursor(delay=0.01)
+    cursor = InstrumentedCursor(raw, QueryStats(), slow_log)
+
+    cursor.execute("SELECT * FROM prompts WHERE id = %s", (7,))
+    cursor.execute("SELECT * FROM prompts WHERE id = %s", (8,))
+
+    assert len(messages) == 2
+    assert "SELECT * FROM prompts WHERE id = 7" in messages[0]
+    assert "EXPLAIN:" in messages[0]
+    # 同一指纹在间隔内只采集一次EXPLAIN
+    assert len(raw.explained) == 1
+
+
+def test_slow_query_log_rate_limited():
+    """测试慢查询日志限速"""
+    messages = []
+
+    class FakeLogger:
+        def info(self, message):
+            messages.append(message)
+
+    slow_log = SlowQueryLog(threshold_ms=0, per_minute=2, explain=False)
+    slow_log._logger = FakeLogger()
+    cursor = InstrumentedCursor(SlowCursor(), QueryStats(), slow_log)
+
+    for i in range(5):
+        cursor.execute("UPDATE prompts SET title = %s", (str(i),))
+
+    assert len(messages) == 2
+    assert slow_log.stats()['dropped'] == 3
@@ -0,0 +1,110 @@
+"""
+SQLite内嵌数据库后端单元测试
+测试MySQL语法翻译、建表脚本加载，以及服务在SQLite后端上不修改即可运行
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import app.common.database as database
+import app.common.sqlite_backend as sqlite_backend
+from app.common.sqlite_backend import translate_sql, translate_schema, register_on_update_columns, SCHEMA_FILE
+from app.services.prompt_service import PromptService
+from app.services.workspace_service import WorkspaceService
+
+
+def test_translate_sql():
+    """测试运行时SQL翻译，字面量中的内容保持不变"""
+    assert translate_sql("UPDATE t SET a = %s, update_time = NOW() WHERE id = %s") == \
+        "UPDATE t SET a = ?, update_time = datetime('now','localtime') WHERE id = ?"
+    assert translate_sql("INSERT IGNORE INTO t (a) VALUES ('NOW() 100%s')", placeholders=False) == \
+        "INSERT OR IGNORE INTO t (a) VALUES ('NOW() 100%s')"
+    assert translate_sql(
+        "INSERT INTO m (w, u, role) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE role = VALUES(role)"
+    ) == "INSERT INTO m (w, u, role) VALUES (?, ?, ?) ON CONFLICT DO UPDATE SET role = excluded.role"
+    assert translate_sql("SELECT * FROM t WHERE id = %s FOR UPDATE") == "SELECT * FROM t WHERE id = ?"
+
+
+def test_translate_schema(monkeypatch):
+    """测试建表脚本翻译，以及ON UPDATE列的登记"""
+    monkeypatch.setattr(sqlite_backend, '_ON_UPDATE_COLUMNS', {})
+    statements = translate_schema(SCHEMA_FILE.read_text(encoding='utf-8'))
+    joined = '\n'.join(statements)
+
+    assert '`id` INTEGER PRIMARY KEY AUTOINCREMENT' in joined
+    assert 'UNIQUE (`prompt_id`, `tag_id`)' in joined
+    assert 'CREATE INDEX IF NOT EXISTS `prompts_idx_user_id` ON `prompts`' in joined
+    assert 'ON UPDATE' not in joined
+    assert 'COMMENT' not in joined and 'ENGINE' not in joined and 'USE ' not in joined
+
+    # 翻译建表脚本不登记ON UPDATE列，新建和已有的数据库都由register_on_update_columns登记
+    assert sqlite_backend._ON_UPDATE_COLUMNS == {}
+    register_on_update_columns(SCHEMA_FILE.read_text(encoding='utf-8'))
+    assert sqlite_backend._ON_UPDATE_COLUMNS['prompts'] == ['update_time']
+
+
+def test_on_update_timestamp_emulation(sqlite_db):
+    """测试ON UPDATE CURRENT_TIMESTAMP：未赋值时更新为当前时间，update_time = update_time保持原值"""
+    prompt_id = PromptService.create_prompt(1, 1, '时间', '内容')['prompt_id']
+    old = datetime(2020, 1, 1)
+    database.Database.execute("UPDATE prompts SET update_time = %s WHERE id = %s", (old, prompt_id))
+
+    def update_time():
+        return database.Database.select_one(
+            "SELECT update_time FROM prompts WHERE id = %s", (prompt_id,), cache=False)['update_time']
+
+    database.Database.execute("UPDATE prompts SET title = %s, update_time = update_time WHERE id = %s",
+                              ('保持', prompt_id))
+    assert update_time() == old
+    database.Database.execute("UPDATE prompts SET title = %s WHERE id = %s", ('更新', prompt_id))
+    assert update_time() > old
+
+    assert translate_sql("UPDATE prompts SET title = 'a, WHERE b' WHERE id = 1", placeholders=False) == \
+        "UPDATE prompts SET title = 'a, WHERE b', `update_time` = datetime('now','localtime') WHERE id = 1"
+
+
+def test_services_run_on_sqlite(sqlite_db):
+    """测试Prompt和工作空间服务在SQLite后端上运行"""
+    created = PromptService.create_prompt(1, 1, '欢迎邮件', '你好 {{name}}', tags=['邮件', '营销', '邮件'])
+    assert created['success'], created
+    prompt_id = created['prompt_id']
+
+    updated = PromptService.update_prompt(prompt_id, 1, title='欢迎邮件v2', content='您好 {{name}}',
+                                          create_new_version=True, tags=['邮件'])
+    assert updated['success'], updated
+
+    prompt = PromptService.get_prompt(prompt_id)
+    assert prompt['title'] == '欢迎邮件v2'
+    assert prompt['current_version']['content'] == '您好 {{name}}'
+    assert prompt['current_version']['version'] == 'v1.1'
+    assert prompt['tags'] == ['邮件']
+    assert isinstance(prompt['create_time'], datetime)
+
+    # ON DUPLICATE KEY UPDATE 翻译为 ON CONFLICT
+    assert WorkspaceService.add_member(2, 2, 'owner')
+    member = database.Database.select_one(
+        "SELECT role FROM workspace_members WHERE workspace_id = %s AND user_id = %s", (2, 2))
+    assert member['role'] == 'owner'
+
+
+def test_pagination_and_streaming_on_sqlite(sqlite_db):
+    """测试键集分页和流式查询在SQLite后端上运行"""
+    for i in range(5):
+        assert PromptService.create_prompt(1, 1, f'Prompt {i}', f'内容 {i}')['success']
+
+    sql = "SELECT id, title, update_time FROM prompts WHERE workspace_id = %s AND status = 1"
+    keyset = [('update_time', 'DESC'), ('id', 'DESC')]
+    first = database.Database.select_page(sql, (1,), page_size=2, keyset=keyset)
+    assert len(first['data']) == 2
+    assert first['pagination']['total'] == 5
+    second = database.Database.select_page(sql, (1,), page_size=2, keyset=keyset,
+                                           cursor=first['pagination']['next_cursor'])
+    assert not {p['id'] for p in first['data']} & {p['id'] for p in second['data']}
+
+    batches = list(WorkspaceService.iter_workspace_prompts(1, 1, batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
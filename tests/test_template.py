@@ -0,0 +1,83 @@
+"""
+Prompt模板渲染单元测试
+"""
+
+import sys
+from pathlib import Path
+
+from flask import Flask
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.common.template import compile_template
+from app.services.prompt_service import PromptService
+from app.services.prompt_render_service import PromptRenderService
+from app.routes.prompt_editor import prompt_editor_bp
+
+
+def test_compile_and_render_template():
+    """测试字面量花括号保持原样、重复和嵌套变量，以及缺少、类型不对和多余变量的校验"""
+    plan = compile_template('{"a": 1} {{ name }}, {{name}}! {{doc.title}} {{产品}} {0}')
+    assert plan.variables == ['name', 'doc.title', '产品']
+
+    result = plan.render({'name': '小明', 'doc': {'title': 'T'}, '产品': 3})
+    assert result == {'success': True, 'text': '{"a": 1} 小明, 小明! T 3 {0}'}
+    assert plan.render({'name': 'x', 'doc.title': 'flat', '产品': 1.5})['text'].endswith('flat 1.5 {0}')
+
+    failed = plan.render({'name': ['x'], 'doc': {}, '产品': 'p', 'extra': 1}, strict=True)
+    assert not failed['success']
+    assert failed['missing'] == ['doc.title']
+    assert failed['invalid'] == ['name']
+    assert failed['unknown'] == ['extra']
+    assert plan.render({'name': 'x', 'doc.title': 'y', '产品': True})['invalid'] == ['产品']
+    assert not plan.render('not a dict')['success']
+    assert compile_template('').render({}) == {'success': True, 'text': ''}
+
+    # 同一个计划渲染多行，结果互不影响
+    texts = [plan.render({'name': str(i), 'doc': {'title': 't'}, '产品': i})['text'] for i in range(3)]
+    assert texts == ['{"a": 1} 0, 0! t 0 {0}', '{"a": 1} 1, 1! t 1 {0}', '{"a": 1} 2, 2! t 2 {0}']
+
+
+def test_render_routes_cache_plan_per_version(sqlite_db, monkeypatch):
+    """测试渲染接口：按版本渲染，计划缓存到版本内容被修改为止，批量接口逐行返回结果"""
+    PromptRenderService.clear_cache()
+    prompt_id = PromptService.create_prompt(1, 1, '渲染', '你好，{{name}}')['prompt_id']
+    old_version_id = PromptService.get_version_history(prompt_id)['data'][0]['id']
+    PromptService.update_prompt(prompt_id, 1, content='Hi {{name}} from {{city}}', create_new_version=True)
+
+    calls = []
+    original = PromptService._load_versions
+    monkeypatch.setattr(PromptService, '_load_versions',
+                        staticmethod(lambda *args: calls.append(args) or original(*args)))
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(prompt_editor_bp)
+    client = app.test_client()
+    url = f'/prompt/api/{prompt_id}/render'
+
+    response = client.post(url, json={'variables': {'name': 'Ann', 'city': 'Paris'}})
+    assert response.get_json()['data']['text'] == 'Hi Ann from Paris'
+    assert client.post(url, json={'variables': {'name': 'Bob', 'city': 'Rome'}}).get_json()['data']['text'] \
+        == 'Hi Bob from Rome'
+    assert len(calls) == 1
+    old = client.post(url, json={'variables': {'name': 'Ann'}, 'version_id': old_version_id})
+    assert old.get_json()['data']['text'] == '你好，Ann'
+
+    invalid = client.post(url, json={'variables': {'name': 'Ann'}})
+    assert invalid.status_code == 400 and invalid.get_json()['missing'] == ['city']
+
+    # 原地修改当前版本后重新编译
+    PromptService.update_prompt(prompt_id, 1, content='Bye {{name}}')
+    batch = client.post(f'{url}/batch', json={'rows': [{'name': 'A'}, {}, {'name': 'C', 'x': 1}], 'strict': True})
+    data = batch.get_json()['data']
+    assert [r.get('text') for r in data['results']] == ['Bye A', None, None]
+    assert data['results'][2]['unknown'] == ['x']
+    assert data['stats']['rendered'] == 1 and data['stats']['failed'] == 2
+    assert len(calls) == 3
+
+    assert client.post(f'{url}/batch', json={'rows': {}}).status_code == 400
+    assert client.post(url, json={'version_id': 99999}).status_code == 404
+    assert client.post('/prompt/api/99999/render', json={}).status_code == 404
+    PromptRenderService.clear_cache()
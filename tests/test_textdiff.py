@@ -0,0 +1,98 @@
+"""
+文本比较模块单元测试
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+from flask import Flask
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.common.cache import cache
+from app.common.textdiff import diff_sequences, diff_text
+from app.services.prompt_service import PromptService
+from app.routes.prompt_editor import prompt_editor_bp
+
+
+def _lcs_length(a, b):
+    """动态规划计算最长公共子序列长度（用于校验差异最短）"""
+    row = [0] * (len(b) + 1)
+    for x in a:
+        prev = 0
+        for j, y in enumerate(b):
+            prev, row[j + 1] = row[j + 1], prev + 1 if x == y else max(row[j + 1], row[j])
+    return row[-1]
+
+
+def test_diff_sequences_is_minimal():
+    """测试比较结果能还原新序列，且相同部分为最长公共子序列"""
+    rng = random.Random(7)
+    for _ in range(500):
+        a = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 20)))
+        b = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 20)))
+        opcodes, complete = diff_sequences(a, b)
+
+        assert complete
+        assert ''.join(b[j1:j2] for _, _, _, j1, j2 in opcodes) == b
+        assert ''.join(a[i1:i2] for _, i1, i2, _, _ in opcodes) == a
+        assert sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal') == _lcs_length(a, b)
+
+
+def test_diff_text_lines_chars_and_budget():
+    """测试按行和逐字符比较、上下文折叠，以及超出时间预算时仍返回正确的差异"""
+    old = ''.join(f'第{i}行\n' for i in range(10))
+    new = old.replace('第3行', '第三行') + '新增\n'
+    result = diff_text(old, new, context=1)
+
+    assert [op['op'] for op in result['ops']] == ['skip', 'equal', 'replace', 'equal', 'skip', 'equal', 'insert']
+    assert result['ops'][2]['chars'] == [['=', '第'], ['-', '3'], ['+', '三'], ['=', '行\n']]
+    assert result['stats'] == {'lines_added': 2, 'lines_removed': 1, 'chars_added': 4, 'chars_removed': 1}
+
+    rng = random.Random(3)
+    big_old = ''.join(rng.choice('ab') for _ in range(50000))
+    big_new = ''.join(rng.choice('ab') for _ in range(50000))
+    # 截止时间已过：返回不完整但仍覆盖两侧全部内容的结果
+    opcodes, complete = diff_sequences(big_old, big_new, deadline=time.monotonic() - 1)
+    assert complete is False
+    assert ''.join(big_old[i1:i2] for _, i1, i2, _, _ in opcodes) == big_old
+    assert ''.join(big_new[j1:j2] for _, _, _, j1, j2 in opcodes) == big_new
+
+
+def test_diff_route_caches_by_version_pair(sqlite_db, monkeypatch):
+    """测试版本比较接口：结果按版本ID对缓存，当前版本被修改后重新计算"""
+    cache.clear()
+    prompt_id = PromptService.create_prompt(1, 1, '比较', '你好\n世界\n')['prompt_id']
+    PromptService.update_prompt(prompt_id, 1, content='你好\n大家\n', create_new_version=True)
+    history = PromptService.get_version_history(prompt_id)['data']
+    new_id, old_id = history[0]['id'], history[1]['id']
+
+    calls = []
+    original = PromptService._load_versions
+    monkeypatch.setattr(PromptService, '_load_versions',
+                        staticmethod(lambda *args: calls.append(args) or original(*args)))
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(prompt_editor_bp)
+    client = app.test_client()
+    url = f'/prompt/api/{prompt_id}/diff?from={old_id}&to={new_id}'
+
+    first = client.get(url)
+    data = first.get_json()['data']
+    assert data['to_version']['version'] == 'v1.1'
+    assert data['ops'][1]['chars'] == [['-', '世界'], ['+', '大家'], ['=', '\n']]
+    assert client.get(url).get_json()['data'] == data
+    assert len(calls) == 1
+    assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    # 原地修改当前版本后缓存键变化
+    PromptService.update_prompt(prompt_id, 1, content='你好\n朋友\n')
+    assert client.get(url).get_json()['data']['ops'][1]['new'] == '朋友\n'
+    assert len(calls) == 2
+
+    assert client.get(f'/prompt/api/{prompt_id}/diff?from={old_id}').status_code == 400
+    assert client.get(f'/prompt/api/{prompt_id}/diff?from={old_id}&to=99999').status_code == 404